@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react'
+import React, { useState, useEffect, useRef } from 'react'
 import Editor from '@monaco-editor/react'
 import axios from 'axios'
 
@@ -31,6 +31,22 @@ function parseInputPrompts(code) {
   return prompts
 }
 
+const isHighSurrogate = (code) => code >= 0xd800 && code <= 0xdbff
+const isLowSurrogate = (code) => code >= 0xdc00 && code <= 0xdfff
+
+// Single splice turning `prev` into `next` (indexes are JS string indexes, as the draft API expects)
+function draftPatch(prev, next) {
+  let start = 0
+  const limit = Math.min(prev.length, next.length)
+  while (start < limit && prev[start] === next[start]) start++
+  let end = 0
+  while (end < limit - start && prev[prev.length - 1 - end] === next[next.length - 1 - end]) end++
+  // Never split an emoji or other astral character: the server rejects such a splice
+  if (start > 0 && isHighSurrogate(prev.charCodeAt(start - 1))) start--
+  if (end > 0 && isLowSurrogate(prev.charCodeAt(prev.length - end))) end--
+  return [{ offset: start, delete: prev.length - start - end, insert: next.slice(start, next.length - end) }]
+}
+
 export default function EditorPanel({ externalProblemId, setExternalProblemId, question }) {
   const [language, setLanguage] = useState('python')
   const [code, setCode] = useState('x = 5\ny = 3\nprint(x + y)')
@@ -44,6 +60,8 @@ export default function EditorPanel({ externalProblemId, setExternalProblemId, q
   const [userId, setUserId] = useState('user_' + Math.random().toString(36).substr(2, 9))
   const [lastSaved, setLastSaved] = useState(null)
   const [draftLoaded, setDraftLoaded] = useState(false)
+  // Last draft the server acknowledged; autosaves send a patch against it
+  const savedDraft = useRef({ code: null, version: null })
 
   // Auto-populate stdin from problem's sample_input when problem changes
   useEffect(() => {
@@ -64,6 +82,7 @@ export default function EditorPanel({ externalProblemId, setExternalProblemId, q
         const res = await axios.get(`${SUBMISSION_SERVICE_URL}/draft/${userId}/${problemId}`)
         if (res.data.status !== 'no_draft') {
           setCode(res.data.code || '')
+          savedDraft.current = { code: res.data.code || '', version: res.data.version ?? null }
           setLanguage(res.data.language || 'python')
           setOutput(`📝 Draft recovered from ${new Date(res.data.last_saved).toLocaleTimeString()}`)
           setDraftLoaded(true)
@@ -79,16 +98,28 @@ export default function EditorPanel({ externalProblemId, setExternalProblemId, q
   // Auto-save draft every 5 seconds
   useEffect(() => {
     const autoSaveInterval = setInterval(async () => {
-      if (code.trim() && problemId) {
+      if (code.trim() && problemId && code !== savedDraft.current.code) {
         try {
-          await axios.post(`${SUBMISSION_SERVICE_URL}/draft`, {
+          const draft = {
             user_id: userId,
             problem_id: problemId,
             language: language,
-            code: code,
             cursor_position: 0,
             status: 'draft'
-          })
+          }
+          const saved = savedDraft.current
+          let res
+          try {
+            res = saved.version != null
+              ? await axios.post(`${SUBMISSION_SERVICE_URL}/draft`, { ...draft, patch: draftPatch(saved.code, code), base_version: saved.version })
+              : await axios.post(`${SUBMISSION_SERVICE_URL}/draft`, { ...draft, code: code })
+          } catch (err) {
+            // Server has a different version (e.g. saved from another tab) or rejected the
+            // patch: fall back to the full code
+            if (saved.version == null || ![400, 409].includes(err.response?.status)) throw err
+            res = await axios.post(`${SUBMISSION_SERVICE_URL}/draft`, { ...draft, code: code })
+          }
+          savedDraft.current = { code: code, version: res.data.version ?? null }
           setLastSaved(new Date())
           console.log('✓ Draft auto-saved')
         } catch (err) {
@@ -0,0 +1,483 @@
+/*
+ * Persistent Java runner for the execution service.
+ *
+ * One long-lived JVM that compiles submissions in memory with the javax.tools
+ * compiler API and runs each one in its own classloader, so a run costs a
+ * compile + class load instead of two JVM start-ups (javac, then java).
+ *
+ * Driven by java_runner.py over stdin/stdout, one request at a time:
+ *
+ *   request : int timeoutMs, int outputLimit, str className, str source,
+ *             str stdin, classes
+ *   response: int exitCode, byte flags, int compileMicros, int runMicros,
+ *             int cpuMicros, long peakHeapBytes, bytes stdout, bytes stderr,
+ *             classes
+ *
+ * where str/bytes are an int length followed by UTF-8 bytes, classes is an
+ * int count followed by (str name, bytes classfile) pairs and flags is a
+ * bitmask of FLAG_* below. Classes in a request come from the service's
+ * compile cache and skip compilation; a response carries the classes it
+ * just compiled so the service can cache them. cpuMicros is the CPU time
+ * of the submission's main thread and peakHeapBytes the JVM's peak heap use
+ * during the run (pools are reset before each run).
+ *
+ * A run that cannot be cleaned up (timeout, OOM, threads still running,
+ * daemon or not) sets FLAG_TAINTED and the runner exits after replying so
+ * it gets replaced.
+ */
+
+import java.io.*;
+import java.lang.management.ManagementFactory;
+import java.lang.management.MemoryPoolMXBean;
+import java.lang.management.MemoryType;
+import java.lang.management.ThreadMXBean;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.lang.reflect.Modifier;
+import java.net.URI;
+import java.nio.charset.StandardCharsets;
+import java.security.Permission;
+import java.util.*;
+import javax.tools.*;
+
+public class JavaRunner {
+
+    static final int FLAG_TIMED_OUT = 1;
+    static final int FLAG_COMPILE_ERROR = 2;
+    static final int FLAG_TAINTED = 4;
+    static final int FLAG_OUTPUT_LIMIT = 8;
+
+    static final ThreadMXBean THREADS = ManagementFactory.getThreadMXBean();
+
+    static final JavaCompiler COMPILER = ToolProvider.getSystemJavaCompiler();
+    static final StandardJavaFileManager STANDARD_FILES =
+            COMPILER == null ? null : COMPILER.getStandardFileManager(null, null, StandardCharsets.UTF_8);
+    static final List<String> COMPILE_OPTIONS = Arrays.asList("-proc:none", "-nowarn", "-g");
+
+    // ========================= COMPILATION =========================
+
+    static class SourceFile extends SimpleJavaFileObject {
+        final String source;
+
+        SourceFile(String className, String source) {
+            super(URI.create("string:///" + className + Kind.SOURCE.extension), Kind.SOURCE);
+            this.source = source;
+        }
+
+        @Override
+        public CharSequence getCharContent(boolean ignoreEncodingErrors) {
+            return source;
+        }
+    }
+
+    static class ClassFile extends SimpleJavaFileObject {
+        final ByteArrayOutputStream bytes = new ByteArrayOutputStream();
+
+        ClassFile(String className) {
+            super(URI.create("bytes:///" + className.replace('.', '/') + Kind.CLASS.extension), Kind.CLASS);
+        }
+
+        @Override
+        public OutputStream openOutputStream() {
+            return bytes;
+        }
+    }
+
+    /** Collects compiler output in memory instead of writing .class files. */
+    static class MemoryFileManager extends ForwardingJavaFileManager<StandardJavaFileManager> {
+        final Map<String, ClassFile> classes = new LinkedHashMap<>();
+
+        MemoryFileManager(StandardJavaFileManager fileManager) {
+            super(fileManager);
+        }
+
+        @Override
+        public JavaFileObject getJavaFileForOutput(Location location, String className,
+                                                   JavaFileObject.Kind kind, FileObject sibling) {
+            ClassFile file = new ClassFile(className);
+            classes.put(className, file);
+            return file;
+        }
+
+        @Override
+        public void close() {
+            // The standard file manager is shared across compilations
+        }
+    }
+
+    /** Class loader for one submission; its parent never sees the runner's own classes. */
+    static class SubmissionClassLoader extends ClassLoader {
+        final Map<String, byte[]> classes;
+
+        SubmissionClassLoader(Map<String, byte[]> classes) {
+            super(ClassLoader.getPlatformClassLoader());
+            this.classes = classes;
+        }
+
+        @Override
+        protected Class<?> findClass(String name) throws ClassNotFoundException {
+            byte[] bytes = classes.get(name);
+            if (bytes == null) {
+                throw new ClassNotFoundException(name);
+            }
+            return defineClass(name, bytes, 0, bytes.length);
+        }
+    }
+
+    /** Returns the compiled classes, or null with javac-style errors written to `errors`. */
+    static Map<String, byte[]> compile(String className, String source, StringBuilder errors) {
+        DiagnosticCollector<JavaFileObject> diagnostics = new DiagnosticCollector<>();
+        MemoryFileManager fileManager = new MemoryFileManager(STANDARD_FILES);
+        boolean ok = COMPILER.getTask(null, fileManager, diagnostics, COMPILE_OPTIONS, null,
+                Collections.singletonList(new SourceFile(className, source))).call();
+        if (!ok) {
+            String[] lines = source.split("\n", -1);
+            int count = 0;
+            for (Diagnostic<? extends JavaFileObject> d : diagnostics.getDiagnostics()) {
+                if (d.getKind() != Diagnostic.Kind.ERROR) {
+                    continue;
+                }
+                count++;
+                errors.append(className).append(".java:").append(d.getLineNumber())
+                        .append(": error: ").append(d.getMessage(Locale.ROOT)).append('\n');
+                long line = d.getLineNumber();
+                if (line >= 1 && line <= lines.length) {
+                    String text = lines[(int) line - 1].replace("\r", "");
+                    errors.append(text).append('\n');
+                    long column = d.getColumnNumber();
+                    if (column >= 1) {
+                        errors.append(" ".repeat((int) Math.min(column - 1, text.length()))).append("^\n");
+                    }
+                }
+            }
+            errors.append(count).append(count == 1 ? " error\n" : " errors\n");
+            return null;
+        }
+        Map<String, byte[]> classes = new HashMap<>();
+        for (Map.Entry<String, ClassFile> entry : fileManager.classes.entrySet()) {
+            classes.put(entry.getKey(), entry.getValue().bytes.toByteArray());
+        }
+        return classes;
+    }
+
+    // ========================= EXECUTION =========================
+
+    /** Thrown from System.exit() inside a submission instead of stopping the runner. */
+    static class ExitTrap extends SecurityException {
+        final int status;
+
+        ExitTrap(int status) {
+            super("System.exit(" + status + ")");
+            this.status = status;
+        }
+    }
+
+    static volatile ThreadGroup currentRun;
+    static volatile Integer exitStatus;
+
+    static boolean installExitTrap() {
+        try {
+            System.setSecurityManager(new SecurityManager() {
+                @Override
+                public void checkExit(int status) {
+                    ThreadGroup run = currentRun;
+                    if (run != null && run.parentOf(Thread.currentThread().getThreadGroup())) {
+                        if (exitStatus == null) {
+                            exitStatus = status;
+                        }
+                        throw new ExitTrap(status);
+                    }
+                }
+
+                @Override
+                public void checkPermission(Permission perm) {
+                }
+
+                @Override
+                public void checkPermission(Permission perm, Object context) {
+                }
+            });
+            return true;
+        } catch (UnsupportedOperationException | SecurityException e) {
+            // JDKs without SecurityManager support: System.exit() in a submission ends
+            // the runner and java_runner.py falls back to a one-off JVM for that run.
+            return false;
+        }
+    }
+
+    /** Cut the reflective frames the runner adds below the submission's main(). */
+    static void trimRunnerFrames(Throwable t) {
+        StackTraceElement[] trace = t.getStackTrace();
+        for (int i = 0; i < trace.length; i++) {
+            String cls = trace[i].getClassName();
+            if (cls.startsWith("jdk.internal.reflect.") || cls.startsWith("java.lang.reflect.")) {
+                t.setStackTrace(Arrays.copyOf(trace, i));
+                return;
+            }
+        }
+    }
+
+    /** Whether the run still has live threads; daemon threads only count when `includeDaemons` is set. */
+    static boolean hasLiveThreads(ThreadGroup group, boolean includeDaemons) {
+        Thread[] threads = new Thread[group.activeCount() + 8];
+        int n = group.enumerate(threads, true);
+        for (int i = 0; i < n; i++) {
+            if (threads[i].isAlive() && (includeDaemons || !threads[i].isDaemon())) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    /** Keeps the first `limit` bytes written and drops the rest. */
+    static class CappedOutputStream extends OutputStream {
+        final ByteArrayOutputStream bytes = new ByteArrayOutputStream();
+        final int limit;
+        boolean exceeded;
+
+        CappedOutputStream(int limit) {
+            this.limit = limit;
+        }
+
+        @Override
+        public synchronized void write(int b) {
+            write(new byte[]{(byte) b}, 0, 1);
+        }
+
+        @Override
+        public synchronized void write(byte[] b, int off, int len) {
+            int room = limit - bytes.size();
+            if (len > room) {
+                exceeded = true;
+            }
+            if (room > 0) {
+                bytes.write(b, off, Math.min(len, room));
+            }
+        }
+    }
+
+    static List<MemoryPoolMXBean> heapPools() {
+        List<MemoryPoolMXBean> pools = new ArrayList<>();
+        for (MemoryPoolMXBean pool : ManagementFactory.getMemoryPoolMXBeans()) {
+            if (pool.getType() == MemoryType.HEAP && pool.isValid()) {
+                pools.add(pool);
+            }
+        }
+        return pools;
+    }
+
+    static class Result {
+        int exitCode;
+        int flags;
+        long compileMicros;
+        long runMicros;
+        long cpuMicros;
+        long peakHeapBytes;
+        byte[] stdout = new byte[0];
+        byte[] stderr = new byte[0];
+        Map<String, byte[]> compiled = Collections.emptyMap();
+    }
+
+    static Result handle(String className, String source, String stdin, int timeoutMs, int outputLimit,
+                         Map<String, byte[]> cached) throws InterruptedException {
+        Result result = new Result();
+
+        long started = System.nanoTime();
+        Map<String, byte[]> classes = cached;
+        if (classes.isEmpty()) {
+            StringBuilder errors = new StringBuilder();
+            classes = compile(className, source, errors);
+            result.compileMicros = (System.nanoTime() - started) / 1000;
+            if (classes == null) {
+                result.exitCode = 1;
+                result.flags = FLAG_COMPILE_ERROR;
+                result.stderr = errors.toString().getBytes(StandardCharsets.UTF_8);
+                return result;
+            }
+            result.compiled = classes;
+        }
+        final Map<String, byte[]> runClasses = classes;
+
+        CappedOutputStream out = new CappedOutputStream(outputLimit);
+        CappedOutputStream err = new CappedOutputStream(outputLimit);
+        PrintStream runOut = new PrintStream(out, true, StandardCharsets.UTF_8);
+        PrintStream runErr = new PrintStream(err, true, StandardCharsets.UTF_8);
+        InputStream savedIn = System.in;
+        PrintStream savedOut = System.out;
+        PrintStream savedErr = System.err;
+
+        ThreadGroup group = new ThreadGroup("submission");
+        final int[] exitCode = {0};
+        final boolean[] fatal = {false};
+        final long[] cpuNanos = {0};
+        Thread main = new Thread(group, () -> {
+            try {
+                Class<?> cls = new SubmissionClassLoader(runClasses).loadClass(className);
+                Method entry = cls.getMethod("main", String[].class);
+                if (!Modifier.isStatic(entry.getModifiers())) {
+                    throw new NoSuchMethodException(className + ".main(String[]) is not static");
+                }
+                entry.setAccessible(true);
+                entry.invoke(null, (Object) new String[0]);
+            } catch (InvocationTargetException e) {
+                Throwable cause = e.getCause();
+                if (cause instanceof ExitTrap) {
+                    return;
+                }
+                if (cause instanceof VirtualMachineError) {
+                    fatal[0] = true;
+                }
+                trimRunnerFrames(cause);
+                System.err.print("Exception in thread \"main\" ");
+                cause.printStackTrace();
+                exitCode[0] = 1;
+            } catch (ClassNotFoundException | NoSuchMethodException e) {
+                System.err.println("Error: Main method not found in class " + className
+                        + ", please define the main method as:\n   public static void main(String[] args)");
+                exitCode[0] = 1;
+            } catch (Throwable e) {
+                fatal[0] = fatal[0] || e instanceof VirtualMachineError;
+                e.printStackTrace();
+                exitCode[0] = 1;
+            } finally {
+                cpuNanos[0] = Math.max(0, THREADS.getCurrentThreadCpuTime());
+            }
+        }, "main");
+
+        exitStatus = null;
+        currentRun = group;
+        System.setIn(new ByteArrayInputStream(stdin.getBytes(StandardCharsets.UTF_8)));
+        System.setOut(runOut);
+        System.setErr(runErr);
+        long deadline = System.currentTimeMillis() + timeoutMs;
+        List<MemoryPoolMXBean> pools = heapPools();
+        for (MemoryPoolMXBean pool : pools) {
+            pool.resetPeakUsage();
+        }
+        started = System.nanoTime();
+        try {
+            main.start();
+            main.join(timeoutMs);
+            // Like a real JVM, the run lasts until its last non-daemon thread ends
+            while (exitStatus == null && hasLiveThreads(group, false) && System.currentTimeMillis() < deadline) {
+                Thread.sleep(5);
+            }
+        } finally {
+            result.runMicros = (System.nanoTime() - started) / 1000;
+            for (MemoryPoolMXBean pool : pools) {
+                result.peakHeapBytes += pool.getPeakUsage().getUsed();
+            }
+            currentRun = null;
+            runOut.flush();
+            runErr.flush();
+            System.setIn(savedIn);
+            System.setOut(savedOut);
+            System.setErr(savedErr);
+        }
+
+        // Threads cannot be stopped safely, so any left running retire this JVM. That
+        // includes daemon threads: stdin/stdout are JVM-wide, so one left behind
+        // could read or write the next candidate's streams.
+        boolean leftovers = hasLiveThreads(group, true);
+        if (exitStatus == null && hasLiveThreads(group, false)) {
+            result.exitCode = -1;
+            result.flags = FLAG_TIMED_OUT | FLAG_TAINTED;
+            return result;
+        }
+        result.exitCode = exitStatus != null ? exitStatus : exitCode[0];
+        if (fatal[0] || leftovers) {
+            result.flags |= FLAG_TAINTED;
+        }
+        if (out.exceeded || err.exceeded) {
+            result.flags |= FLAG_OUTPUT_LIMIT;
+        }
+        result.cpuMicros = cpuNanos[0] / 1000;
+        result.stdout = out.bytes.toByteArray();
+        result.stderr = err.bytes.toByteArray();
+        return result;
+    }
+
+    // ========================= PROTOCOL =========================
+
+    static String readString(DataInputStream in) throws IOException {
+        return new String(readBytes(in), StandardCharsets.UTF_8);
+    }
+
+    static byte[] readBytes(DataInputStream in) throws IOException {
+        byte[] bytes = new byte[in.readInt()];
+        in.readFully(bytes);
+        return bytes;
+    }
+
+    static void writeBytes(DataOutputStream out, byte[] bytes) throws IOException {
+        out.writeInt(bytes.length);
+        out.write(bytes);
+    }
+
+    static Map<String, byte[]> readClasses(DataInputStream in) throws IOException {
+        int count = in.readInt();
+        Map<String, byte[]> classes = new HashMap<>();
+        for (int i = 0; i < count; i++) {
+            classes.put(readString(in), readBytes(in));
+        }
+        return classes;
+    }
+
+    static void writeClasses(DataOutputStream out, Map<String, byte[]> classes) throws IOException {
+        out.writeInt(classes.size());
+        for (Map.Entry<String, byte[]> entry : classes.entrySet()) {
+            writeBytes(out, entry.getKey().getBytes(StandardCharsets.UTF_8));
+            writeBytes(out, entry.getValue());
+        }
+    }
+
+    public static void main(String[] args) throws Exception {
+        // Keep the protocol channel private; anything else printed goes nowhere
+        DataInputStream in = new DataInputStream(new BufferedInputStream(new FileInputStream(FileDescriptor.in)));
+        DataOutputStream out = new DataOutputStream(new BufferedOutputStream(new FileOutputStream(FileDescriptor.out)));
+        PrintStream sink = new PrintStream(OutputStream.nullOutputStream());
+        System.setOut(sink);
+        System.setIn(InputStream.nullInputStream());
+
+        if (COMPILER == null) {
+            System.err.println("JavaRunner: no system Java compiler (a JDK is required)");
+            System.exit(2);
+        }
+        installExitTrap();
+
+        // Warm up javac and the class loading path before taking requests
+        handle("Warmup", "public class Warmup { public static void main(String[] a) { System.out.println(a.length); } }", "", 10000,
+                1024, Collections.emptyMap());
+
+        while (true) {
+            int timeoutMs;
+            try {
+                timeoutMs = in.readInt();
+            } catch (EOFException e) {
+                return;
+            }
+            int outputLimit = in.readInt();
+            String className = readString(in);
+            String source = readString(in);
+            String stdin = readString(in);
+            Map<String, byte[]> cached = readClasses(in);
+
+            Result result = handle(className, source, stdin, timeoutMs, outputLimit, cached);
+
+            out.writeInt(result.exitCode);
+            out.writeByte(result.flags);
+            out.writeInt((int) Math.min(Integer.MAX_VALUE, result.compileMicros));
+            out.writeInt((int) Math.min(Integer.MAX_VALUE, result.runMicros));
+            out.writeInt((int) Math.min(Integer.MAX_VALUE, result.cpuMicros));
+            out.writeLong(result.peakHeapBytes);
+            writeBytes(out, result.stdout);
+            writeBytes(out, result.stderr);
+            writeClasses(out, result.compiled);
+            out.flush();
+
+            if ((result.flags & FLAG_TAINTED) != 0) {
+                Runtime.getRuntime().halt(0);
+            }
+        }
+    }
+}
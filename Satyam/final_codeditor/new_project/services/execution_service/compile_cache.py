@@ -0,0 +1,157 @@
+"""
+Java Compilation Cache
+Content-addressed store of compiled .class files on local disk, keyed by
+SHA-256 of (JDK version, main class name, source). Candidates re-run the same
+code against different stdin all the time; on a hit only the run step repeats.
+
+One file per entry, evicted least-recently-used once the total size passes
+JAVA_COMPILE_CACHE_MAX_MB. Recency survives restarts through file mtimes.
+"""
+
+import hashlib
+import os
+import struct
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+_INT = struct.Struct(">i")
+
+
+def detect_jdk_version() -> str:
+    """First line of `java -version`, e.g. 'openjdk version "17.0.9" 2023-10-17'."""
+    try:
+        result = subprocess.run(["java", "-version"], capture_output=True, timeout=30)
+        lines = result.stderr.decode("utf-8", errors="replace").strip().splitlines()
+        return lines[0] if lines else "unknown"
+    except (OSError, subprocess.TimeoutExpired):
+        return "unknown"
+
+
+def pack_classes(classes: Dict[str, bytes]) -> bytes:
+    parts = [_INT.pack(len(classes))]
+    for name, data in classes.items():
+        encoded = name.encode("utf-8")
+        parts += [_INT.pack(len(encoded)), encoded, _INT.pack(len(data)), data]
+    return b"".join(parts)
+
+
+def unpack_classes(blob: bytes) -> Dict[str, bytes]:
+    classes = {}
+    (count,), offset = _INT.unpack_from(blob, 0), _INT.size
+    for _ in range(count):
+        (length,) = _INT.unpack_from(blob, offset)
+        offset += _INT.size
+        name = blob[offset:offset + length].decode("utf-8")
+        offset += length
+        (length,) = _INT.unpack_from(blob, offset)
+        offset += _INT.size
+        classes[name] = blob[offset:offset + length]
+        offset += length
+    return classes
+
+
+class CompileCache:
+    def __init__(self, directory: str, max_bytes: int, jdk_version: str = "unknown"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.jdk_version = jdk_version
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> size, oldest first
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".classes"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name[:-len(".classes")], st.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.classes")
+
+    def key(self, class_name: str, source: str) -> str:
+        digest = hashlib.sha256()
+        for part in (self.jdk_version, class_name, source):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, bytes]]:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(self._path(key), "rb") as f:
+                classes = unpack_classes(f.read())
+            os.utime(self._path(key))
+        except (OSError, struct.error, UnicodeDecodeError):
+            with self._lock:
+                self._drop(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return classes
+
+    def put(self, key: str, classes: Dict[str, bytes]):
+        blob = pack_classes(classes)
+        if len(blob) > self.max_bytes:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(blob)
+            self._total_bytes += len(blob)
+            self._evict()
+
+    def _drop(self, key: str):
+        self._total_bytes -= self._entries.pop(key, 0)
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "jdk_version": self.jdk_version,
+            "entries": len(self._entries),
+            "size_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
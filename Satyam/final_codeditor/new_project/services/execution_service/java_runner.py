@@ -0,0 +1,225 @@
+"""
+Persistent Java Runner Pool
+Keeps long-lived JVMs running JavaRunner.java, which compiles submissions in
+memory (javax.tools) and runs each in its own classloader, so a Java /run
+pays a compile + class load instead of starting javac and java every time.
+
+Each JVM handles one run at a time over its stdin/stdout. A JVM that reports
+a run it could not clean up (timeout, OutOfMemoryError, leftover threads) or
+that reaches JAVA_RUNNER_MAX_RUNS is replaced in the background.
+
+With a CompileCache attached, previously compiled classes are sent along
+with the source and the JVM skips compilation.
+"""
+
+import asyncio
+import os
+import shutil
+import struct
+import subprocess
+from typing import Dict, Optional
+
+from compile_cache import CompileCache, pack_classes
+
+RUNNER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "JavaRunner.java")
+RUNNER_CLASSES = os.getenv("JAVA_RUNNER_CLASSES", os.path.join(os.path.dirname(RUNNER_SOURCE), "java_runner_classes"))
+
+FLAG_TIMED_OUT = 1
+FLAG_COMPILE_ERROR = 2
+FLAG_TAINTED = 4
+FLAG_OUTPUT_LIMIT = 8
+
+_INT = struct.Struct(">i")
+_RESPONSE_HEADER = struct.Struct(">iBiiiq")
+
+
+class JavaRunnerError(Exception):
+    """The runner JVM died or stopped responding mid-run."""
+
+
+def ensure_runner_compiled() -> str:
+    """Compile JavaRunner.java unless an up-to-date class is already there (e.g. from the image build)."""
+    runner_class = os.path.join(RUNNER_CLASSES, "JavaRunner.class")
+    if os.path.exists(runner_class) and os.path.getmtime(runner_class) >= os.path.getmtime(RUNNER_SOURCE):
+        return RUNNER_CLASSES
+    os.makedirs(RUNNER_CLASSES, exist_ok=True)
+    result = subprocess.run(["javac", "-d", RUNNER_CLASSES, RUNNER_SOURCE], capture_output=True, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to compile JavaRunner: {result.stderr.decode('utf-8', errors='replace')}")
+    return RUNNER_CLASSES
+
+
+def _pack_string(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return _INT.pack(len(data)) + data
+
+
+class JavaRunnerWorker:
+    """Service-side handle for one runner JVM."""
+
+    def __init__(self, proc: asyncio.subprocess.Process):
+        self.proc = proc
+        self.runs = 0
+        self.tainted = False
+
+    @classmethod
+    async def spawn(cls, heap_mb: int) -> "JavaRunnerWorker":
+        proc = await asyncio.create_subprocess_exec(
+            "java",
+            f"-Xmx{heap_mb}m",
+            "-Xss8m",
+            "-XX:+UseSerialGC",
+            # Lets the runner trap System.exit() in submissions (JDK 17+)
+            "-Djava.security.manager=allow",
+            "-cp", RUNNER_CLASSES,
+            "JavaRunner",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        return cls(proc)
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.returncode is None and not self.tainted
+
+    async def _read_bytes(self) -> bytes:
+        (length,) = _INT.unpack(await self.proc.stdout.readexactly(_INT.size))
+        return await self.proc.stdout.readexactly(length)
+
+    async def request(self, class_name: str, source: str, stdin: str, timeout_s: float, output_limit_bytes: int,
+                      classes: Optional[Dict[str, bytes]] = None) -> dict:
+        self.proc.stdin.write(
+            _INT.pack(int(timeout_s * 1000)) + _INT.pack(output_limit_bytes)
+            + _pack_string(class_name) + _pack_string(source) + _pack_string(stdin)
+            + pack_classes(classes or {})
+        )
+        await self.proc.stdin.drain()
+        header = await self.proc.stdout.readexactly(_RESPONSE_HEADER.size)
+        exit_code, flags, compile_us, run_us, cpu_us, peak_heap = _RESPONSE_HEADER.unpack(header)
+        stdout = await self._read_bytes()
+        stderr = await self._read_bytes()
+        (count,) = _INT.unpack(await self.proc.stdout.readexactly(_INT.size))
+        compiled = {}
+        for _ in range(count):
+            name = (await self._read_bytes()).decode("utf-8")
+            compiled[name] = await self._read_bytes()
+        self.runs += 1
+        self.tainted = bool(flags & FLAG_TAINTED)
+        return {
+            "stdout": stdout.decode("utf-8", errors="replace"),
+            "stderr": stderr.decode("utf-8", errors="replace"),
+            "exit_code": exit_code,
+            "timed_out": bool(flags & FLAG_TIMED_OUT),
+            "compile_error": bool(flags & FLAG_COMPILE_ERROR),
+            "limit_exceeded": "output" if flags & FLAG_OUTPUT_LIMIT else None,
+            "compile_time_ms": round(compile_us / 1000, 3),
+            "cpu_time_ms": round(cpu_us / 1000, 3),
+            "wall_time_ms": round(run_us / 1000, 3),
+            # Peak heap of the runner JVM during the run (includes its small baseline)
+            "memory_used_mb": round(peak_heap / (1024 * 1024), 3),
+            "compiled_classes": compiled,
+        }
+
+    async def close(self):
+        if self.proc.returncode is None:
+            try:
+                self.proc.stdin.close()
+                await asyncio.wait_for(self.proc.wait(), timeout=2)
+            except (asyncio.TimeoutError, ConnectionError):
+                self.proc.kill()
+                await self.proc.wait()
+
+
+class JavaRunnerPool:
+    """Fixed-size pool of warm runner JVMs; each run borrows one exclusively."""
+
+    def __init__(self, size: int, max_runs_per_worker: int = 200, timeout_s: float = 10, heap_mb: int = 256,
+                 compile_cache: Optional[CompileCache] = None, output_limit_bytes: int = 1024 * 1024):
+        self.size = size
+        self.output_limit_bytes = output_limit_bytes
+        self.compile_cache = compile_cache
+        self.max_runs_per_worker = max_runs_per_worker
+        self.timeout_s = timeout_s
+        self.heap_mb = heap_mb
+        self._idle: asyncio.Queue = None
+        self._workers: set = set()
+        self.runs_total = 0
+        self.recycled_total = 0
+        self.failures_total = 0
+
+    @staticmethod
+    def available() -> bool:
+        return bool(shutil.which("java") and (shutil.which("javac") or os.path.exists(
+            os.path.join(RUNNER_CLASSES, "JavaRunner.class"))))
+
+    async def start(self):
+        await asyncio.get_running_loop().run_in_executor(None, ensure_runner_compiled)
+        self._idle = asyncio.Queue()
+        workers = await asyncio.gather(*(JavaRunnerWorker.spawn(self.heap_mb) for _ in range(self.size)))
+        for worker in workers:
+            self._workers.add(worker)
+            self._idle.put_nowait(worker)
+
+    async def stop(self):
+        workers, self._workers = list(self._workers), set()
+        await asyncio.gather(*(w.close() for w in workers), return_exceptions=True)
+
+    async def _add_worker(self):
+        worker = await JavaRunnerWorker.spawn(self.heap_mb)
+        self._workers.add(worker)
+        self._idle.put_nowait(worker)
+
+    def _recycle(self, worker: JavaRunnerWorker):
+        """Retire `worker` and start its replacement off the request path."""
+        self._workers.discard(worker)
+        self.recycled_total += 1
+        asyncio.ensure_future(worker.close())
+        asyncio.ensure_future(self._add_worker())
+
+    async def _checkout(self) -> JavaRunnerWorker:
+        while True:
+            worker = await self._idle.get()
+            if worker.alive:
+                return worker
+            self._recycle(worker)
+
+    async def run(self, class_name: str, source: str, stdin: str = "", timeout_s: float = None) -> dict:
+        """Compile and run `source` in a warm JVM; raises JavaRunnerError if the JVM is lost."""
+        timeout_s = timeout_s or self.timeout_s
+        cache_key = self.compile_cache.key(class_name, source) if self.compile_cache else None
+        cached = self.compile_cache.get(cache_key) if cache_key else None
+        worker = await self._checkout()
+        try:
+            try:
+                # The runner enforces the timeout itself; this only guards
+                # against a wedged JVM (compile time counts here too).
+                result = await asyncio.wait_for(worker.request(class_name, source, stdin, timeout_s,
+                                                               self.output_limit_bytes, cached),
+                                                timeout=timeout_s + 20)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError) as e:
+                if worker.proc.returncode is None:
+                    worker.proc.kill()
+                self.failures_total += 1
+                raise JavaRunnerError(f"Java runner failed: {e!r}") from e
+            self.runs_total += 1
+            compiled = result.pop("compiled_classes")
+            if cache_key and compiled:
+                self.compile_cache.put(cache_key, compiled)
+            result["cache_hit"] = cached is not None
+            return result
+        finally:
+            if worker.alive and worker.runs < self.max_runs_per_worker:
+                self._idle.put_nowait(worker)
+            else:
+                self._recycle(worker)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.size,
+            "idle": self._idle.qsize() if self._idle else 0,
+            "runs_total": self.runs_total,
+            "recycled_total": self.recycled_total,
+            "failures_total": self.failures_total,
+            "max_runs_per_worker": self.max_runs_per_worker,
+        }
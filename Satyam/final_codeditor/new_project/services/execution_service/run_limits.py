@@ -0,0 +1,168 @@
+"""
+Run Limits & Accounting
+Resource limits and per-run usage figures shared by the executors.
+
+Every child process gets RLIMIT_CPU, RLIMIT_FSIZE (stdout/stderr go to temp
+files, so this is the output cap) and, where the runtime tolerates it,
+RLIMIT_AS. It is reaped with wait4(), which yields its CPU time and peak RSS
+alongside the exit status.
+
+run_process() is called from threadpool threads, where preexec_fn is unsafe,
+so the limits are applied by exec'ing the command through `prlimit` (or a
+minimal Python shim where util-linux is missing); the new session comes from
+start_new_session, which needs no Python code in the child.
+"""
+
+import os
+import resource
+import select
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+PRLIMIT = shutil.which("prlimit")
+
+# argv: cpu seconds, memory MB, output bytes (0 = no limit), then the command
+_LIMIT_SHIM = """
+import os, resource, sys
+cpu, mem, out = (int(a) for a in sys.argv[1:4])
+if cpu:
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+if mem:
+    resource.setrlimit(resource.RLIMIT_AS, (mem * 1024 * 1024,) * 2)
+if out:
+    resource.setrlimit(resource.RLIMIT_FSIZE, (out, out))
+os.execvp(sys.argv[4], sys.argv[4:])
+"""
+
+
+def apply_rlimits(cpu_limit_s: Optional[int] = None, memory_limit_mb: Optional[int] = None,
+                  output_limit_bytes: Optional[int] = None):
+    """Called in the child before it runs candidate code."""
+    if cpu_limit_s:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit_s, cpu_limit_s + 1))
+    if memory_limit_mb:
+        mem = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
+    if output_limit_bytes:
+        resource.setrlimit(resource.RLIMIT_FSIZE, (output_limit_bytes, output_limit_bytes))
+
+
+def limited_command(cmd: list, cpu_limit_s: Optional[int] = None, memory_limit_mb: Optional[int] = None,
+                    output_limit_bytes: Optional[int] = None) -> list:
+    """`cmd` wrapped so it execs with the same limits apply_rlimits() sets."""
+    if not (cpu_limit_s or memory_limit_mb or output_limit_bytes):
+        return list(cmd)
+    if PRLIMIT:
+        wrapper = [PRLIMIT]
+        if cpu_limit_s:
+            wrapper.append(f"--cpu={cpu_limit_s}:{cpu_limit_s + 1}")
+        if memory_limit_mb:
+            wrapper.append(f"--as={memory_limit_mb * 1024 * 1024}")
+        if output_limit_bytes:
+            wrapper.append(f"--fsize={output_limit_bytes}")
+        return wrapper + ["--", *cmd]
+    return [sys.executable, "-I", "-S", "-c", _LIMIT_SHIM,
+            str(cpu_limit_s or 0), str(memory_limit_mb or 0), str(output_limit_bytes or 0), *cmd]
+
+
+def wait_child(pid: int, timeout: float):
+    """Wait for `pid` up to `timeout` seconds; kill its process group on expiry.
+
+    Returns (wait_status, rusage, timed_out).
+    """
+    timed_out = False
+    if hasattr(os, "pidfd_open"):
+        pidfd = os.pidfd_open(pid)
+        try:
+            ready, _, _ = select.select([pidfd], [], [], timeout)
+        finally:
+            os.close(pidfd)
+        timed_out = not ready
+    else:
+        deadline = time.monotonic() + timeout
+        while True:
+            done, status, rusage = os.wait4(pid, os.WNOHANG)
+            if done:
+                return status, rusage, False
+            if time.monotonic() >= deadline:
+                timed_out = True
+                break
+            time.sleep(0.002)
+
+    if timed_out:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+    _, status, rusage = os.wait4(pid, 0)
+    return status, rusage, timed_out
+
+
+def exceeded_limit(status: int, rusage, cpu_limit_s: Optional[int], output_bytes: int,
+                   output_limit_bytes: Optional[int]) -> Optional[str]:
+    """Name the limit a run hit ("cpu" or "output"), if any."""
+    if cpu_limit_s and os.WIFSIGNALED(status):
+        # SIGXCPU at the soft limit, SIGKILL at the hard one
+        if os.WTERMSIG(status) == signal.SIGXCPU or (
+                os.WTERMSIG(status) == signal.SIGKILL and rusage.ru_utime + rusage.ru_stime >= cpu_limit_s):
+            return "cpu"
+    if output_limit_bytes and output_bytes >= output_limit_bytes:
+        return "output"
+    return None
+
+
+def usage(rusage, wall_ms: float) -> dict:
+    """CPU time, wall time and peak RSS of a reaped child (ru_maxrss is KiB on Linux)."""
+    return {
+        "cpu_time_ms": round((rusage.ru_utime + rusage.ru_stime) * 1000, 3),
+        "wall_time_ms": round(wall_ms, 3),
+        "memory_used_mb": round(rusage.ru_maxrss / 1024, 3),
+    }
+
+
+def read_output(f, limit: Optional[int]) -> str:
+    f.seek(0)
+    data = f.read(limit) if limit else f.read()
+    return data.decode("utf-8", errors="replace")
+
+
+def run_process(cmd: list, stdin_data: str = "", timeout_s: float = 10, cwd: Optional[str] = None,
+                env: Optional[dict] = None, cpu_limit_s: Optional[int] = None,
+                memory_limit_mb: Optional[int] = None, output_limit_bytes: Optional[int] = None) -> dict:
+    """subprocess.run() replacement that enforces limits and reports usage.
+
+    Returns stdout, stderr, exit_code, timed_out, limit_exceeded plus the
+    figures from usage().
+    """
+    with tempfile.TemporaryFile() as fin, tempfile.TemporaryFile() as fout, tempfile.TemporaryFile() as ferr:
+        fin.write((stdin_data or "").encode())
+        fin.flush()
+        fin.seek(0)
+
+        started = time.perf_counter()
+        # Own session, so a timeout kills the whole process group
+        proc = subprocess.Popen(limited_command(cmd, cpu_limit_s, memory_limit_mb, output_limit_bytes),
+                                stdin=fin, stdout=fout, stderr=ferr, cwd=cwd, env=env, start_new_session=True)
+        status, rusage, timed_out = wait_child(proc.pid, timeout_s)
+        # Reaped by wait4 above; stop Popen from trying again
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        wall_ms = (time.perf_counter() - started) * 1000
+
+        output_bytes = os.fstat(fout.fileno()).st_size
+        limit = None if timed_out else exceeded_limit(status, rusage, cpu_limit_s, output_bytes, output_limit_bytes)
+        return {
+            "stdout": read_output(fout, output_limit_bytes),
+            "stderr": read_output(ferr, output_limit_bytes),
+            "exit_code": -1 if timed_out else proc.returncode,
+            "timed_out": timed_out,
+            "limit_exceeded": limit,
+            **usage(rusage, wall_ms),
+        }
@@ -0,0 +1,312 @@
+"""
+Warm Python Sandbox Pool
+Keeps pre-started Python worker processes ("zygotes") that fork one child per
+run, so a /run pays a fork instead of interpreter startup + imports.
+
+Each run happens in a freshly forked child with its own process group,
+working directory and resource limits (see run_limits.py), reaped with
+wait4() so its CPU time and peak RSS are reported; the zygote itself never
+executes candidate code. Zygotes are recycled after SANDBOX_MAX_RUNS_PER_WORKER runs.
+
+The same file is the zygote entry point: `python sandbox_pool.py --worker`.
+"""
+
+import asyncio
+import json
+import os
+import struct
+import sys
+import time
+
+from run_limits import apply_rlimits, exceeded_limit, read_output, usage, wait_child
+
+# Modules imported once in every zygote so candidate code finds them warm
+DEFAULT_PREIMPORTS = "collections,itertools,functools,math,heapq,bisect,re,string,json,random,datetime"
+
+_HEADER = struct.Struct(">I")
+
+
+# ========================= ZYGOTE (worker process) =========================
+
+def _read_exact(fd: int, n: int) -> bytes:
+    chunks = []
+    while n:
+        chunk = os.read(fd, n)
+        if not chunk:
+            return b""
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+
+def _read_message(fd: int):
+    header = _read_exact(fd, _HEADER.size)
+    if not header:
+        return None
+    (length,) = _HEADER.unpack(header)
+    return json.loads(_read_exact(fd, length))
+
+
+def _write_message(fd: int, message: dict):
+    payload = json.dumps(message).encode()
+    data = _HEADER.pack(len(payload)) + payload
+    while data:
+        written = os.write(fd, data)
+        data = data[written:]
+
+
+def _run_child(req: dict, stdin_fd: int, stdout_fd: int, stderr_fd: int, workdir: str, proto_fds: tuple):
+    """Body of the forked child; never returns."""
+    import builtins
+    import io
+    import linecache
+    import traceback
+
+    code = 1
+    try:
+        os.setsid()
+        os.chdir(workdir)
+        apply_rlimits(int(req["cpu_limit_s"]), int(req["memory_limit_mb"]), req.get("output_limit_bytes"))
+
+        os.dup2(stdin_fd, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        for fd in proto_fds:
+            os.close(fd)
+
+        sys.stdin = io.TextIOWrapper(io.BufferedReader(io.FileIO(0, "r", closefd=False)), encoding="utf-8")
+        sys.stdout = io.TextIOWrapper(io.BufferedWriter(io.FileIO(1, "w", closefd=False)), encoding="utf-8")
+        sys.stderr = io.TextIOWrapper(io.BufferedWriter(io.FileIO(2, "w", closefd=False)), encoding="utf-8", line_buffering=True)
+        sys.argv = ["main.py"]
+        # Let tracebacks show the candidate's own source lines
+        source = req["code"]
+        linecache.cache["main.py"] = (len(source), None, source.splitlines(True), "main.py")
+
+        try:
+            exec(compile(source, "main.py", "exec"), {"__name__": "__main__", "__builtins__": builtins})
+            code = 0
+        except SystemExit as e:
+            if e.code is None:
+                code = 0
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            etype, value, tb = sys.exc_info()
+            # Drop this frame so the traceback starts at the candidate's code
+            traceback.print_exception(etype, value, tb.tb_next)
+            code = 1
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            except Exception:
+                pass
+    finally:
+        os._exit(code)
+
+
+def _execute(req: dict, proto_fds: tuple) -> dict:
+    import shutil
+    import tempfile
+
+    workdir = tempfile.mkdtemp(prefix="sandbox-")
+    try:
+        with tempfile.TemporaryFile(dir=workdir) as fin, \
+                tempfile.TemporaryFile(dir=workdir) as fout, \
+                tempfile.TemporaryFile(dir=workdir) as ferr:
+            fin.write((req.get("stdin") or "").encode())
+            fin.flush()
+            fin.seek(0)
+
+            started = time.perf_counter()
+            pid = os.fork()
+            if pid == 0:
+                _run_child(req, fin.fileno(), fout.fileno(), ferr.fileno(), workdir, proto_fds)
+            status, rusage, timed_out = wait_child(pid, float(req["timeout_s"]))
+            wall_ms = (time.perf_counter() - started) * 1000
+
+            output_limit = req.get("output_limit_bytes")
+            output_bytes = os.fstat(fout.fileno()).st_size
+            return {
+                "stdout": read_output(fout, output_limit),
+                "stderr": read_output(ferr, output_limit),
+                "exit_code": -1 if timed_out else os.waitstatus_to_exitcode(status),
+                "timed_out": timed_out,
+                "limit_exceeded": None if timed_out else exceeded_limit(
+                    status, rusage, int(req["cpu_limit_s"]), output_bytes, output_limit),
+                **usage(rusage, wall_ms),
+            }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def worker_main():
+    # Keep the protocol channel on private fds and point 0/1 at /dev/null so
+    # nothing the zygote (or a child) prints can corrupt the framing.
+    proto_in = os.dup(0)
+    proto_out = os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    for name in os.getenv("SANDBOX_PREIMPORTS", DEFAULT_PREIMPORTS).split(","):
+        name = name.strip()
+        if name:
+            try:
+                __import__(name)
+            except ImportError:
+                pass
+
+    while True:
+        req = _read_message(proto_in)
+        if req is None:
+            break
+        try:
+            resp = _execute(req, (proto_in, proto_out))
+        except Exception as e:
+            resp = {"stdout": "", "stderr": f"Sandbox error: {e}", "exit_code": 1, "timed_out": False,
+                    "limit_exceeded": None, "cpu_time_ms": None, "wall_time_ms": None, "memory_used_mb": None}
+        _write_message(proto_out, resp)
+
+
+# ========================= POOL (service side) =========================
+
+class SandboxWorker:
+    """Service-side handle for one zygote process."""
+
+    def __init__(self, proc: asyncio.subprocess.Process):
+        self.proc = proc
+        self.runs = 0
+
+    @classmethod
+    async def spawn(cls) -> "SandboxWorker":
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-u", os.path.abspath(__file__), "--worker",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        return cls(proc)
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.returncode is None
+
+    async def request(self, message: dict) -> dict:
+        payload = json.dumps(message).encode()
+        self.proc.stdin.write(_HEADER.pack(len(payload)) + payload)
+        await self.proc.stdin.drain()
+        header = await self.proc.stdout.readexactly(_HEADER.size)
+        (length,) = _HEADER.unpack(header)
+        body = await self.proc.stdout.readexactly(length)
+        self.runs += 1
+        return json.loads(body)
+
+    async def close(self):
+        if self.alive:
+            try:
+                self.proc.stdin.close()
+                await asyncio.wait_for(self.proc.wait(), timeout=2)
+            except (asyncio.TimeoutError, ConnectionError):
+                self.proc.kill()
+                await self.proc.wait()
+
+
+class SandboxPool:
+    """Fixed-size pool of warm zygotes; each run borrows one exclusively."""
+
+    def __init__(self, size: int, max_runs_per_worker: int = 100, timeout_s: float = 10,
+                 cpu_limit_s: int = 10, memory_limit_mb: int = 512, output_limit_bytes: int = None):
+        self.size = size
+        self.max_runs_per_worker = max_runs_per_worker
+        self.timeout_s = timeout_s
+        self.cpu_limit_s = cpu_limit_s
+        self.memory_limit_mb = memory_limit_mb
+        self.output_limit_bytes = output_limit_bytes
+        self._idle: asyncio.Queue = None
+        self._workers: set = set()
+        self.runs_total = 0
+        self.recycled_total = 0
+
+    async def start(self):
+        self._idle = asyncio.Queue()
+        workers = await asyncio.gather(*(SandboxWorker.spawn() for _ in range(self.size)))
+        for worker in workers:
+            self._workers.add(worker)
+            self._idle.put_nowait(worker)
+
+    async def stop(self):
+        workers, self._workers = list(self._workers), set()
+        await asyncio.gather(*(w.close() for w in workers), return_exceptions=True)
+
+    async def _add_worker(self):
+        worker = await SandboxWorker.spawn()
+        self._workers.add(worker)
+        self._idle.put_nowait(worker)
+
+    def _recycle(self, worker: SandboxWorker):
+        """Retire `worker` and start its replacement off the request path."""
+        self._workers.discard(worker)
+        self.recycled_total += 1
+        asyncio.ensure_future(worker.close())
+        asyncio.ensure_future(self._add_worker())
+
+    async def _checkout(self) -> SandboxWorker:
+        while True:
+            worker = await self._idle.get()
+            if worker.alive:
+                return worker
+            self._recycle(worker)
+
+    async def run(self, code: str, stdin: str = "", timeout_s: float = None) -> dict:
+        """Run `code` in a forked sandbox child and return its raw result."""
+        timeout_s = timeout_s or self.timeout_s
+        worker = await self._checkout()
+        # Until a reply is read the zygote's pipe may hold half a message;
+        # `alive` stays true after kill() until the child watcher reaps it
+        failed = True
+        try:
+            message = {
+                "code": code,
+                "stdin": stdin,
+                "timeout_s": timeout_s,
+                "cpu_limit_s": min(self.cpu_limit_s, int(timeout_s) + 1),
+                "memory_limit_mb": self.memory_limit_mb,
+                "output_limit_bytes": self.output_limit_bytes,
+            }
+            try:
+                # The zygote enforces the timeout itself; this only guards
+                # against a wedged zygote.
+                result = await asyncio.wait_for(worker.request(message), timeout=timeout_s + 5)
+                failed = False
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError) as e:
+                worker.proc.kill()
+                result = {"stdout": "", "stderr": f"Sandbox worker failed: {e!r}", "exit_code": 1,
+                          "timed_out": False, "limit_exceeded": None, "cpu_time_ms": None,
+                          "wall_time_ms": None, "memory_used_mb": None}
+            self.runs_total += 1
+            return result
+        finally:
+            if not failed and worker.alive and worker.runs < self.max_runs_per_worker:
+                self._idle.put_nowait(worker)
+            else:
+                if failed and worker.proc.returncode is None:
+                    worker.proc.kill()
+                self._recycle(worker)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.size,
+            "idle": self._idle.qsize() if self._idle else 0,
+            "runs_total": self.runs_total,
+            "recycled_total": self.recycled_total,
+            "max_runs_per_worker": self.max_runs_per_worker,
+        }
+
+
+if __name__ == "__main__" and "--worker" in sys.argv:
+    worker_main()
@@ -0,0 +1,133 @@
+"""
+Execution Scheduler
+Bounded job queue in front of the language executors.
+
+/run submits a job and awaits its result. A fixed set of executor tasks
+drains the queue; each language additionally has its own concurrency cap
+(e.g. only a couple of JVMs at once). Jobs whose language is at its cap are
+parked and resumed as soon as a slot frees up, so a burst of Java runs
+never blocks Python runs queued behind it.
+
+When queued + parked jobs reach the limit, submit() raises QueueFullError
+carrying a Retry-After estimate for the 429 response.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict
+
+
+class QueueFullError(Exception):
+    def __init__(self, retry_after_s: int):
+        super().__init__(f"Execution queue is full, retry after {retry_after_s}s")
+        self.retry_after_s = retry_after_s
+
+
+class _Job:
+    __slots__ = ("language", "run", "future", "enqueued_at")
+
+    def __init__(self, language: str, run: Callable[[], Awaitable], future: asyncio.Future):
+        self.language = language
+        self.run = run
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class ExecutionScheduler:
+    def __init__(self, executors: int, max_queue: int, language_limits: Dict[str, int]):
+        self.executors = executors
+        self.max_queue = max_queue
+        self.language_limits = dict(language_limits)
+        self._queue: asyncio.Queue = None
+        self._tasks = []
+        self._parked = {lang: deque() for lang in self.language_limits}
+        self._running = {lang: 0 for lang in self.language_limits}
+        # Metrics
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.run_ms_total = 0.0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._executor()) for _ in range(self.executors)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def depth(self) -> int:
+        """Jobs accepted but not yet running."""
+        queued = self._queue.qsize() if self._queue else 0
+        return queued + sum(len(q) for q in self._parked.values())
+
+    def retry_after(self) -> int:
+        avg_run_s = (self.run_ms_total / self.completed / 1000) if self.completed else 1.0
+        return max(1, math.ceil(self.depth * avg_run_s / max(self.executors, 1)))
+
+    async def submit(self, language: str, run: Callable[[], Awaitable]):
+        """Queue `run` (a zero-arg coroutine function) and return its result."""
+        if language not in self.language_limits:
+            raise ValueError(f"Unsupported language: {language}")
+        if self.depth >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(self.retry_after())
+        job = _Job(language, run, asyncio.get_running_loop().create_future())
+        self.submitted += 1
+        self._queue.put_nowait(job)
+        return await job.future
+
+    async def _executor(self):
+        while True:
+            job = await self._queue.get()
+            if self._running[job.language] >= self.language_limits[job.language]:
+                self._parked[job.language].append(job)
+                continue
+            await self._execute(job)
+
+    async def _execute(self, job: _Job):
+        language = job.language
+        while job is not None:
+            self._running[language] += 1
+            started = time.perf_counter()
+            wait_ms = (started - job.enqueued_at) * 1000
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+            try:
+                if not job.future.cancelled():
+                    result = await job.run()
+                    if not job.future.cancelled():
+                        job.future.set_result(result)
+            except Exception as e:
+                if not job.future.cancelled():
+                    job.future.set_exception(e)
+            finally:
+                self._running[language] -= 1
+                self.completed += 1
+                self.run_ms_total += (time.perf_counter() - started) * 1000
+            # Resume a job that was parked while this language was at its cap
+            parked = self._parked[language]
+            job = parked.popleft() if parked and self._running[language] < self.language_limits[language] else None
+
+    def stats(self) -> dict:
+        return {
+            "executors": self.executors,
+            "max_queue": self.max_queue,
+            "queue_depth": self.depth,
+            "running": dict(self._running),
+            "parked": {lang: len(q) for lang, q in self._parked.items()},
+            "language_limits": dict(self.language_limits),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_ms_total / self.completed, 2) if self.completed else 0.0,
+            "max_wait_ms": round(self.wait_ms_max, 2),
+            "avg_run_ms": round(self.run_ms_total / self.completed, 2) if self.completed else 0.0,
+        }
@@ -0,0 +1,512 @@
+"""
+Resident PySpark Worker Pool
+Keeps worker processes that each hold a warm local SparkSession, so a PySpark
+/run skips JVM startup and SparkContext init (10-20 s) and only pays for its
+own jobs.
+
+Each run executes in a fresh namespace with its own SparkSession from
+`newSession()`: temp views, SQL conf and UDFs start empty while the
+SparkContext is shared. `SparkSession.builder.getOrCreate()` in submitted code
+returns that per-run session, and `spark.stop()` is a no-op. A worker whose
+run timed out or stopped the SparkContext is replaced, as is one that reaches
+PYSPARK_MAX_RUNS runs.
+
+Candidate code runs inside the worker, so the worker itself is confined:
+once Spark's JVM is up (it keeps its own limits) the worker takes RLIMIT_AS
+and RLIMIT_FSIZE, and RLIMIT_CPU is moved to "CPU used so far + the per-run
+limit" before every run. A run that changed interpreter-wide state (signal
+handlers, sys hooks, sys.modules, builtins, module functions, threads, cwd/env)
+or even names `signal`, `importlib`, `ctypes`, ... retires the worker, so the
+next candidate never sees it. The in-process alarm only keeps timeouts cheap;
+the service kills the worker's process group PYSPARK_KILL_GRACE_S after the
+timeout whatever the worker does.
+
+The same file is the worker entry point: `python spark_pool.py --worker`.
+"""
+
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+
+from run_limits import apply_rlimits
+from sandbox_pool import DEFAULT_PREIMPORTS, _HEADER, _read_message, _write_message
+
+# Imported at start-up so common imports don't count as a change to sys.modules
+SPARK_PREIMPORTS = DEFAULT_PREIMPORTS + ",pyspark.sql.functions,pyspark.sql.types,pyspark.sql.window"
+
+# Names that reach interpreter-wide state; a run whose code uses any of them retires the worker.
+# `sys` and `threading` are left out: submissions read sys.stdin all the time, and what
+# they could change through them (hooks, sys.modules, limits, threads) is in _interpreter_state()
+SENSITIVE_NAMES = frozenset({
+    "signal", "importlib", "builtins", "__builtins__", "__import__", "ctypes", "gc", "resource",
+    "faulthandler", "atexit", "_thread", "__subclasses__", "__globals__", "__code__",
+})
+
+
+# ========================= WORKER (resident process) =========================
+
+class _RunTimeout(BaseException):
+    """Raised by SIGALRM; a BaseException so submitted code cannot swallow it with `except Exception`."""
+
+
+class _CappedWriter:
+    """Text sink that keeps the first `limit` bytes (UTF-8) written to it."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+        self.exceeded = False
+
+    def write(self, text: str) -> int:
+        data = text.encode("utf-8", errors="replace")
+        room = self.limit - self.size
+        if len(data) > room:
+            self.exceeded = True
+            data = data[:max(room, 0)]
+        if data:
+            self.parts.append(data)
+            self.size += len(data)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def getvalue(self) -> str:
+        return b"".join(self.parts).decode("utf-8", errors="replace")
+
+
+def _create_session():
+    from pyspark.sql import SparkSession
+
+    builder = (
+        SparkSession.builder
+        .master(f"local[{os.getenv('PYSPARK_WORKER_CORES', '2')}]")
+        .appName("codeplay-pyspark-worker")
+        .config("spark.ui.enabled", "false")
+        .config("spark.ui.showConsoleProgress", "false")
+        # Submissions work on small data; the default 200 partitions is pure overhead
+        .config("spark.sql.shuffle.partitions", os.getenv("PYSPARK_SHUFFLE_PARTITIONS", "4"))
+        .config("spark.driver.memory", os.getenv("PYSPARK_DRIVER_MEMORY", "1g"))
+    )
+    spark = builder.getOrCreate()
+    spark.sparkContext.setLogLevel("ERROR")
+    # Warm up the planner and task launch path
+    spark.range(10).selectExpr("sum(id)").collect()
+    return spark
+
+
+def _activate(session):
+    """Make `session` what SparkSession.builder.getOrCreate() hands out."""
+    from pyspark.sql import SparkSession
+
+    SparkSession._instantiatedSession = session
+    SparkSession._activeSession = session
+    jvm_session = session._jvm.org.apache.spark.sql.SparkSession
+    jvm_session.setActiveSession(session._jsparkSession)
+    jvm_session.setDefaultSession(session._jsparkSession)
+
+
+def _code_names(code) -> set:
+    """Every name and string constant used by a code object and the ones nested in it."""
+    names = set(code.co_names) | set(code.co_varnames)
+    for const in code.co_consts:
+        if isinstance(const, str):
+            names.add(const)
+        elif hasattr(const, "co_names"):
+            names |= _code_names(const)
+    return names
+
+
+def _callables(obj) -> dict:
+    # Only callables: monkey-patching replaces functions and classes, while
+    # module bookkeeping (pyspark's active session, caches, counters) is plain data
+    return {name: id(value) for name, value in list(vars(obj).items()) if callable(value)}
+
+
+def _interpreter_state() -> dict:
+    """Fingerprint of the state a run could leave behind for the next one."""
+    import builtins
+    import threading
+
+    handlers = {}
+    for signum in signal.valid_signals():
+        try:
+            handlers[signum] = signal.getsignal(signum)
+        except (OSError, ValueError):
+            pass
+    patchable = {}
+    for name, module in list(sys.modules.items()):
+        if module is None or name == "__main__":
+            continue
+        patchable[name] = _callables(module)
+        for attr, value in list(vars(module).items()):
+            if isinstance(value, type) and value.__module__ == name:
+                patchable[f"{name}.{attr}"] = _callables(value)
+    return {
+        "modules": {name: id(module) for name, module in sys.modules.items()},
+        "signals": handlers,
+        "sigmask": signal.pthread_sigmask(signal.SIG_BLOCK, []),
+        "sys": (sys.gettrace(), sys.getprofile(), sys.excepthook, sys.displayhook, sys.unraisablehook,
+                sys.breakpointhook, sys.getrecursionlimit(), sys.getswitchinterval(),
+                tuple(sys.path), tuple(sys.meta_path), tuple(sys.path_hooks), sys.dont_write_bytecode,
+                sys.get_int_max_str_digits() if hasattr(sys, "get_int_max_str_digits") else None),
+        "threading": (threading.gettrace(), threading.getprofile(), threading.excepthook),
+        # A thread the run left behind would keep running during the next one
+        "threads": frozenset(thread.ident for thread in threading.enumerate()),
+        "builtins": {name: id(value) for name, value in vars(builtins).items()},
+        "os": (os.getcwd(), dict(os.environ)),
+        "functions": patchable,
+    }
+
+
+def _limit_cpu(cpu_limit_s: int):
+    """Let this run use `cpu_limit_s` more seconds of CPU than the worker has used so far."""
+    import resource
+
+    used = resource.getrusage(resource.RUSAGE_SELF)
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    target = int(used.ru_utime + used.ru_stime) + cpu_limit_s
+    if hard != resource.RLIM_INFINITY:
+        target = min(target, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (target, hard))
+
+
+def _execute(base_session, req: dict) -> dict:
+    import io
+    import linecache
+    import traceback
+
+    source = req["code"]
+    try:
+        code = compile(source, "main.py", "exec")
+        touches_interpreter = bool(_code_names(code) & SENSITIVE_NAMES)
+    except SyntaxError:
+        code, touches_interpreter = None, False
+
+    session = base_session.newSession()
+    session.stop = lambda: None
+    _activate(session)
+
+    limit = int(req["output_limit_bytes"])
+    out, err = _CappedWriter(limit), _CappedWriter(limit)
+    saved = sys.stdin, sys.stdout, sys.stderr
+    sys.stdin, sys.stdout, sys.stderr = io.StringIO(req.get("stdin") or ""), out, err
+
+    linecache.cache["main.py"] = (len(source), None, source.splitlines(True), "main.py")
+    timed_out = False
+
+    def on_timeout(signum, frame):
+        base_session.sparkContext.cancelAllJobs()
+        raise _RunTimeout()
+
+    exit_code = 1
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    signal.signal(signal.SIGALRM, on_timeout)
+    before = _interpreter_state()
+    if req.get("cpu_limit_s"):
+        _limit_cpu(int(req["cpu_limit_s"]))
+    signal.setitimer(signal.ITIMER_REAL, float(req["timeout_s"]))
+    try:
+        try:
+            if code is None:
+                # Report the SyntaxError like any other exception
+                code = compile(source, "main.py", "exec")
+            exec(code, {"__name__": "__main__"})
+            exit_code = 0
+        except SystemExit as e:
+            if e.code is None:
+                exit_code = 0
+            elif isinstance(e.code, int):
+                exit_code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+        except _RunTimeout:
+            timed_out = True
+        except BaseException:
+            etype, value, tb = sys.exc_info()
+            traceback.print_exception(etype, value, tb.tb_next)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        sys.stdin, sys.stdout, sys.stderr = saved
+        linecache.cache.pop("main.py", None)
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    stopped = base_session.sparkContext._jsc is None
+    changed = [key for key, value in _interpreter_state().items() if value != before[key]]
+    if not stopped:
+        session.catalog.clearCache()
+        _activate(base_session)
+    return {
+        "stdout": "" if timed_out else out.getvalue(),
+        "stderr": "" if timed_out else err.getvalue(),
+        "exit_code": -1 if timed_out else exit_code,
+        "timed_out": timed_out,
+        "limit_exceeded": "output" if out.exceeded or err.exceeded else None,
+        # Driver-side Python CPU only; executor work happens in the shared JVM
+        "cpu_time_ms": round((time.process_time() - cpu_started) * 1000, 3),
+        "wall_time_ms": round(wall_ms, 3),
+        "memory_used_mb": None,
+        "tainted": timed_out or stopped or touches_interpreter or bool(changed),
+    }
+
+
+def _vm_size_mb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmSize:"):
+                return int(line.split()[1]) // 1024
+    return 0
+
+
+def _confine_worker(limits: dict):
+    """Apply the worker's own limits once the JVM (which must not inherit them) is running."""
+    for name in SPARK_PREIMPORTS.split(","):
+        try:
+            __import__(name.strip())
+        except ImportError:
+            pass
+    memory_limit_mb = limits.get("memory_limit_mb")
+    if memory_limit_mb:
+        # On top of what the warm driver already maps (py4j, pyspark, thread stacks)
+        try:
+            memory_limit_mb += _vm_size_mb()
+        except OSError:
+            memory_limit_mb = None
+    apply_rlimits(None, memory_limit_mb, limits.get("file_limit_bytes"))
+    if limits.get("cpu_budget_s"):
+        import resource
+
+        # Hard cap for the worker's whole life; each run gets a soft limit below it
+        used = resource.getrusage(resource.RUSAGE_SELF)
+        hard = int(used.ru_utime + used.ru_stime) + int(limits["cpu_budget_s"])
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def worker_main():
+    # Keep the protocol channel on private fds; Spark's JVM inherits 0/1 and
+    # must not be able to write into the framing.
+    proto_in = os.dup(0)
+    proto_out = os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    args = sys.argv[sys.argv.index("--worker") + 1:]
+    limits = json.loads(args[0]) if args else {}
+    try:
+        base_session = _create_session()
+        _confine_worker(limits)
+    except Exception as e:
+        _write_message(proto_out, {"ready": False, "error": str(e)})
+        return
+    _write_message(proto_out, {"ready": True})
+
+    while True:
+        req = _read_message(proto_in)
+        if req is None:
+            break
+        try:
+            resp = _execute(base_session, req)
+        except Exception as e:
+            resp = {"stdout": "", "stderr": f"PySpark worker error: {e}", "exit_code": 1, "timed_out": False,
+                    "limit_exceeded": None, "cpu_time_ms": None, "wall_time_ms": None, "memory_used_mb": None,
+                    "tainted": True}
+        _write_message(proto_out, resp)
+        if resp["tainted"]:
+            break
+
+
+# ========================= POOL (service side) =========================
+
+class SparkWorker:
+    """Service-side handle for one resident PySpark worker."""
+
+    def __init__(self, proc: asyncio.subprocess.Process):
+        self.proc = proc
+        self.runs = 0
+        self.tainted = False
+
+    @classmethod
+    async def spawn(cls, env: dict, startup_timeout_s: float, limits: dict = None) -> "SparkWorker":
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-u", os.path.abspath(__file__), "--worker", json.dumps(limits or {}),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            env=env,
+            # Own process group, so a kill also takes down its Spark JVM
+            start_new_session=True,
+        )
+        worker = cls(proc)
+        try:
+            ready = await asyncio.wait_for(worker._read(), timeout=startup_timeout_s)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+            await worker.close()
+            raise RuntimeError(f"PySpark worker did not start: {e!r}") from e
+        if not ready.get("ready"):
+            await worker.close()
+            raise RuntimeError(f"PySpark worker did not start: {ready.get('error')}")
+        return worker
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.returncode is None and not self.tainted
+
+    async def _read(self) -> dict:
+        header = await self.proc.stdout.readexactly(_HEADER.size)
+        (length,) = _HEADER.unpack(header)
+        return json.loads(await self.proc.stdout.readexactly(length))
+
+    async def request(self, message: dict) -> dict:
+        payload = json.dumps(message).encode()
+        self.proc.stdin.write(_HEADER.pack(len(payload)) + payload)
+        await self.proc.stdin.drain()
+        result = await self._read()
+        self.runs += 1
+        self.tainted = result.pop("tainted", False)
+        return result
+
+    def kill(self):
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    async def close(self):
+        if self.proc.returncode is None:
+            try:
+                self.proc.stdin.close()
+                await asyncio.wait_for(self.proc.wait(), timeout=10)
+            except (asyncio.TimeoutError, ConnectionError):
+                self.kill()
+                await self.proc.wait()
+
+
+class SparkPool:
+    """Small pool of warm PySpark workers; each run borrows one exclusively."""
+
+    def __init__(self, size: int, max_runs_per_worker: int = 50, timeout_s: float = 30,
+                 output_limit_bytes: int = 1024 * 1024, env: dict = None, startup_timeout_s: float = 120,
+                 cpu_limit_s: int = None, memory_limit_mb: int = None, file_limit_mb: int = None,
+                 kill_grace_s: float = 5):
+        self.size = size
+        self.max_runs_per_worker = max_runs_per_worker
+        self.timeout_s = timeout_s
+        self.output_limit_bytes = output_limit_bytes
+        self.env = env
+        self.startup_timeout_s = startup_timeout_s
+        self.cpu_limit_s = cpu_limit_s
+        self.kill_grace_s = kill_grace_s
+        self.limits = {
+            "memory_limit_mb": memory_limit_mb,
+            "file_limit_bytes": file_limit_mb * 1024 * 1024 if file_limit_mb else None,
+            "cpu_budget_s": cpu_limit_s * max_runs_per_worker if cpu_limit_s else None,
+        }
+        self._idle: asyncio.Queue = None
+        self._workers: set = set()
+        self.runs_total = 0
+        self.recycled_total = 0
+
+    async def start(self):
+        self._idle = asyncio.Queue()
+        workers = await asyncio.gather(*(SparkWorker.spawn(self.env, self.startup_timeout_s, self.limits) for _ in range(self.size)))
+        for worker in workers:
+            self._workers.add(worker)
+            self._idle.put_nowait(worker)
+
+    async def stop(self):
+        workers, self._workers = list(self._workers), set()
+        await asyncio.gather(*(w.close() for w in workers), return_exceptions=True)
+
+    async def _add_worker(self):
+        # Retry until a replacement starts so the pool never shrinks for good
+        while True:
+            try:
+                worker = await SparkWorker.spawn(self.env, self.startup_timeout_s, self.limits)
+                break
+            except RuntimeError as e:
+                print(f"⚠️  {e}; retrying")
+                await asyncio.sleep(5)
+        self._workers.add(worker)
+        self._idle.put_nowait(worker)
+
+    def _recycle(self, worker: SparkWorker):
+        """Retire `worker` and start its replacement off the request path."""
+        self._workers.discard(worker)
+        self.recycled_total += 1
+        asyncio.ensure_future(worker.close())
+        asyncio.ensure_future(self._add_worker())
+
+    async def _checkout(self) -> SparkWorker:
+        while True:
+            worker = await self._idle.get()
+            if worker.alive:
+                return worker
+            self._recycle(worker)
+
+    async def run(self, code: str, stdin: str = "", timeout_s: float = None) -> dict:
+        """Run `code` against a warm SparkSession and return its raw result."""
+        timeout_s = timeout_s or self.timeout_s
+        worker = await self._checkout()
+        try:
+            message = {
+                "code": code,
+                "stdin": stdin,
+                "timeout_s": timeout_s,
+                "cpu_limit_s": self.cpu_limit_s,
+                "output_limit_bytes": self.output_limit_bytes,
+            }
+            try:
+                # The worker's own alarm can be blocked by the code it runs;
+                # past the grace period the worker is killed from here.
+                result = await asyncio.wait_for(worker.request(message), timeout=timeout_s + self.kill_grace_s)
+            except asyncio.TimeoutError:
+                worker.tainted = True
+                worker.kill()
+                result = {"stdout": "", "stderr": "", "exit_code": -1, "timed_out": True, "limit_exceeded": None,
+                          "cpu_time_ms": None, "wall_time_ms": None, "memory_used_mb": None}
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                worker.tainted = True
+                try:
+                    returncode = await asyncio.wait_for(worker.proc.wait(), timeout=self.kill_grace_s)
+                except asyncio.TimeoutError:
+                    returncode = None
+                # Takes its Spark JVM down too
+                worker.kill()
+                if returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+                    # Past RLIMIT_CPU (soft limit, then the hard one)
+                    result = {"stdout": "", "stderr": "", "exit_code": -1, "timed_out": False,
+                              "limit_exceeded": "cpu", "cpu_time_ms": None, "wall_time_ms": None,
+                              "memory_used_mb": None}
+                else:
+                    result = {"stdout": "", "stderr": f"PySpark worker failed: {e!r}", "exit_code": 1,
+                              "timed_out": False, "limit_exceeded": None, "cpu_time_ms": None,
+                              "wall_time_ms": None, "memory_used_mb": None}
+            self.runs_total += 1
+            return result
+        finally:
+            if worker.alive and worker.runs < self.max_runs_per_worker:
+                self._idle.put_nowait(worker)
+            else:
+                if worker.proc.returncode is None and worker.tainted:
+                    worker.kill()
+                self._recycle(worker)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.size,
+            "idle": self._idle.qsize() if self._idle else 0,
+            "runs_total": self.runs_total,
+            "recycled_total": self.recycled_total,
+            "max_runs_per_worker": self.max_runs_per_worker,
+        }
+
+
+if __name__ == "__main__" and "--worker" in sys.argv:
+    worker_main()
@@ -0,0 +1,188 @@
+"""
+SQL Execution Engine
+Runs SQL submissions against per-problem fixture data on SQLite.
+
+Each problem's fixture script (fixtures/<problem_id>.sql) is loaded once into
+a template in-memory database; every run gets its own copy through the sqlite
+backup API, so candidates can modify data freely. Submissions may hold several
+statements: setup statements run through executescript(), queries run one by
+one and their rows are streamed into the output. A progress handler aborts
+runs that pass the statement timeout.
+"""
+
+import io
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Statements whose rows are shown; everything else is batched into executescript()
+_QUERY_RE = re.compile(r"^\s*(?:--[^\n]*\n\s*|/\*.*?\*/\s*)*(SELECT|WITH|VALUES|PRAGMA|EXPLAIN)\b", re.I | re.S)
+
+# VM instructions between progress handler calls
+_PROGRESS_STEPS = 10000
+_FETCH_SIZE = 500
+
+
+def split_statements(code: str) -> List[str]:
+    """Split a script into complete statements (sqlite3.complete_statement handles quotes and comments)."""
+    statements, start = [], 0
+    for i, ch in enumerate(code):
+        # Only a ';' can end a statement; complete_statement rules out ones inside literals or comments
+        if ch == ";" and sqlite3.complete_statement(code[start:i + 1]):
+            statements.append(code[start:i + 1].strip())
+            start = i + 1
+    if code[start:].strip():
+        statements.append(code[start:].strip())
+    return [s for s in statements if s.strip(" ;\n\t")]
+
+
+def is_query(statement: str) -> bool:
+    return bool(_QUERY_RE.match(statement))
+
+
+class SqlEngine:
+    def __init__(self, fixtures_dir: str = DEFAULT_FIXTURES_DIR):
+        self.fixtures_dir = fixtures_dir
+        self._templates: Dict[str, sqlite3.Connection] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self.runs_total = 0
+
+    def load_fixtures(self):
+        """Build one template database per fixtures/<problem_id>.sql file."""
+        if not os.path.isdir(self.fixtures_dir):
+            return
+        for name in sorted(os.listdir(self.fixtures_dir)):
+            if not name.endswith(".sql"):
+                continue
+            problem_id = name[:-len(".sql")]
+            with open(os.path.join(self.fixtures_dir, name), encoding="utf-8") as f:
+                script = f.read()
+            template = sqlite3.connect(":memory:", check_same_thread=False)
+            template.executescript(script)
+            template.commit()
+            self._templates[problem_id] = template
+            self._locks[problem_id] = threading.Lock()
+
+    @property
+    def problems(self) -> List[str]:
+        return sorted(self._templates)
+
+    def connect(self, problem_id: Optional[str] = None) -> sqlite3.Connection:
+        """A private in-memory database, pre-filled with the problem's fixture if it has one."""
+        conn = sqlite3.connect(":memory:")
+        template = self._templates.get(str(problem_id)) if problem_id is not None else None
+        if template is not None:
+            with self._locks[str(problem_id)]:
+                template.backup(conn)
+        return conn
+
+    @staticmethod
+    def with_deadline(conn: sqlite3.Connection, timeout_s: float):
+        deadline = time.monotonic() + timeout_s
+        # Non-zero return makes sqlite abort the running statement
+        conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, _PROGRESS_STEPS)
+
+    @staticmethod
+    def _execute(conn: sqlite3.Connection, statements: List[str]) -> Iterator[sqlite3.Cursor]:
+        """Run `statements` in order, yielding a cursor per query.
+
+        Consecutive non-queries are batched into one executescript(). Each
+        cursor must be consumed before the generator is advanced.
+        """
+        pending: List[str] = []
+        for statement in statements:
+            if not is_query(statement):
+                pending.append(statement if statement.rstrip().endswith(";") else statement + ";")
+                continue
+            if pending:
+                conn.executescript("\n".join(pending))
+                pending = []
+            yield conn.execute(statement)
+        if pending:
+            conn.executescript("\n".join(pending))
+
+    def execute_last_query(self, conn: sqlite3.Connection, code: str) -> Optional[sqlite3.Cursor]:
+        """Run the setup part of `code` and return the cursor of its last query.
+
+        Statements after the last query cannot change its rows and are not run.
+        Returns None when `code` holds no query.
+        """
+        statements = split_statements(code)
+        queries = [i for i, statement in enumerate(statements) if is_query(statement)]
+        if not queries:
+            for _ in self._execute(conn, statements):
+                pass
+            return None
+        for cursor in self._execute(conn, statements[:queries[-1]]):
+            cursor.close()
+        return conn.execute(statements[queries[-1]])
+
+    @staticmethod
+    def _write_rows(cursor: sqlite3.Cursor, out: io.StringIO, limit: int) -> Tuple[bool, bool]:
+        """Stream `cursor`'s rows as pipe-separated lines. Returns (had_rows, truncated)."""
+        rows = cursor.fetchmany(_FETCH_SIZE)
+        if not rows:
+            return False, False
+        out.write("|".join(d[0] for d in cursor.description) + "\n")
+        while rows:
+            for row in rows:
+                out.write("|".join(str(x) for x in row) + "\n")
+            if out.tell() > limit:
+                return True, True
+            rows = cursor.fetchmany(_FETCH_SIZE)
+        return True, False
+
+    def run(self, code: str, problem_id: Optional[str] = None, timeout_s: float = 10,
+            output_limit_bytes: int = 1024 * 1024) -> dict:
+        """Execute `code` on a fresh copy of the problem's fixture database.
+
+        Returns stdout, stderr, exit_code, timed_out and limit_exceeded in the
+        shape the executors share.
+        """
+        self.runs_total += 1
+        conn = self.connect(problem_id)
+        out = io.StringIO()
+        truncated = False
+        try:
+            self.with_deadline(conn, timeout_s)
+            showed_query = False
+            for cursor in self._execute(conn, split_statements(code)):
+                if showed_query:
+                    out.write("\n")
+                had_rows, truncated = self._write_rows(cursor, out, output_limit_bytes)
+                if not had_rows:
+                    out.write("No results")
+                showed_query = True
+                if truncated:
+                    break
+            if not showed_query:
+                out.write("Query executed successfully")
+            stdout = out.getvalue()
+            return {
+                "stdout": stdout[:output_limit_bytes],
+                "stderr": "",
+                "exit_code": 0,
+                "timed_out": False,
+                "limit_exceeded": "output" if truncated else None,
+            }
+        except sqlite3.OperationalError as e:
+            if str(e) == "interrupted":
+                return {"stdout": "", "stderr": "", "exit_code": -1, "timed_out": True, "limit_exceeded": None}
+            return {"stdout": out.getvalue()[:output_limit_bytes], "stderr": str(e), "exit_code": 1,
+                    "timed_out": False, "limit_exceeded": None}
+        except sqlite3.Error as e:
+            return {"stdout": out.getvalue()[:output_limit_bytes], "stderr": str(e), "exit_code": 1,
+                    "timed_out": False, "limit_exceeded": None}
+        finally:
+            conn.close()
+
+    def stats(self) -> dict:
+        return {
+            "fixtures": self.problems,
+            "runs_total": self.runs_total,
+        }
@@ -0,0 +1,281 @@
+"""
+SQL Result-Set Grader
+Grades a SQL answer by running it and the reference query on copies of the
+same fixture database and comparing the result sets themselves, not their
+printed form.
+
+Columns are matched by name when both sides use the same names, else by
+position. Numbers compare within a tolerance, so 55000 equals 55000.0.
+Ordered comparison walks both cursors in step. Unordered comparison sorts
+up to `max_rows_in_memory` rows per side; past that it falls back to an
+order-independent hash (sum of row digests), so large results are never
+materialized.
+"""
+
+import hashlib
+import math
+import re
+import sqlite3
+from typing import List, Optional, Tuple
+
+from sql_engine import SqlEngine
+
+_FETCH_SIZE = 500
+_HASH_MOD = 1 << 256
+_ORDER_BY_RE = re.compile(r"ORDER\s+BY\b", re.I)
+
+
+class ReferenceQueryError(Exception):
+    """The reference query itself failed; the question is misconfigured."""
+
+
+class _SideError(Exception):
+    def __init__(self, side: str, error: sqlite3.Error):
+        super().__init__(str(error))
+        self.side = side
+        self.error = error
+
+
+def has_top_level_order_by(sql: str) -> bool:
+    """True if `sql` sorts its final result (ORDER BY outside parentheses and literals)."""
+    depth, i = 0, 0
+    while i < len(sql):
+        ch = sql[i]
+        if ch in "'\"`":
+            end = sql.find(ch, i + 1)
+            i = len(sql) if end < 0 else end + 1
+            continue
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = len(sql) if end < 0 else end + 1
+            continue
+        if sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = len(sql) if end < 0 else end + 2
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0 and _ORDER_BY_RE.match(sql, i) and (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] == "_")):
+            return True
+        i += 1
+    return False
+
+
+def _canonical(value, tolerance: float):
+    """Sort/hash key for one value: numbers snap to the tolerance grid, other types keep their own rank."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and math.isnan(value):
+            return (4, 0)
+        if tolerance > 0 and not math.isinf(value):
+            return (1, round(value / tolerance))
+        return (1, value)
+    if isinstance(value, bytes):
+        return (3, value)
+    return (2, str(value))
+
+
+def _row_key(row: tuple, tolerance: float) -> tuple:
+    return tuple(_canonical(v, tolerance) for v in row)
+
+
+def _row_digest(row: tuple, tolerance: float) -> int:
+    return int.from_bytes(hashlib.sha256(repr(_row_key(row, tolerance)).encode("utf-8")).digest(), "big")
+
+
+def values_equal(expected, actual, tolerance: float) -> bool:
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        if isinstance(expected, float) and isinstance(actual, float) and math.isnan(expected) and math.isnan(actual):
+            return True
+        return math.isclose(expected, actual, rel_tol=tolerance, abs_tol=tolerance)
+    return expected == actual
+
+
+def rows_equal(expected: tuple, actual: tuple, tolerance: float) -> bool:
+    return len(expected) == len(actual) and all(values_equal(e, a, tolerance) for e, a in zip(expected, actual))
+
+
+def column_mapping(expected: List[str], actual: List[str]) -> Optional[List[int]]:
+    """Index into the actual row for each expected column, or None if the column counts differ."""
+    if len(expected) != len(actual):
+        return None
+    wanted = [name.lower() for name in expected]
+    given = [name.lower() for name in actual]
+    if len(set(wanted)) == len(wanted) and sorted(wanted) == sorted(given):
+        return [given.index(name) for name in wanted]
+    return list(range(len(expected)))
+
+
+class _Side:
+    """One query's cursor, fetched in chunks and with columns reordered."""
+
+    def __init__(self, name: str, cursor: sqlite3.Cursor, mapping: Optional[List[int]] = None):
+        self.name = name
+        self.cursor = cursor
+        self.mapping = mapping
+        self.rows = 0
+
+    def fetch(self) -> List[tuple]:
+        try:
+            rows = self.cursor.fetchmany(_FETCH_SIZE)
+        except sqlite3.Error as e:
+            raise _SideError(self.name, e) from e
+        self.rows += len(rows)
+        if self.mapping is not None:
+            rows = [tuple(row[i] for i in self.mapping) for row in rows]
+        return rows
+
+
+def _mismatch(index: Optional[int], expected, actual) -> dict:
+    return {"row": index, "expected": list(expected) if expected is not None else None,
+            "actual": list(actual) if actual is not None else None}
+
+
+def _drain(side: _Side):
+    while side.fetch():
+        pass
+
+
+def _compare_ordered(expected: _Side, actual: _Side, tolerance: float) -> Tuple[bool, Optional[dict]]:
+    index = 0
+    exp_buf, act_buf = [], []
+    while True:
+        if not exp_buf:
+            exp_buf = expected.fetch()
+        if not act_buf:
+            act_buf = actual.fetch()
+        if not exp_buf and not act_buf:
+            return True, None
+        if not exp_buf or not act_buf:
+            mismatch = _mismatch(index, exp_buf[0] if exp_buf else None, act_buf[0] if act_buf else None)
+            break
+        n = min(len(exp_buf), len(act_buf))
+        mismatch = next((_mismatch(index + k, e, a) for k, (e, a) in enumerate(zip(exp_buf[:n], act_buf[:n]))
+                         if not rows_equal(e, a, tolerance)), None)
+        if mismatch:
+            break
+        index += n
+        exp_buf, act_buf = exp_buf[n:], act_buf[n:]
+    # Finish counting both sides for the report
+    _drain(expected)
+    _drain(actual)
+    return False, mismatch
+
+
+def _collect(side: _Side, limit: int) -> Tuple[List[tuple], bool]:
+    """Up to `limit` rows; the flag says whether the cursor is exhausted."""
+    rows: List[tuple] = []
+    while len(rows) <= limit:
+        chunk = side.fetch()
+        if not chunk:
+            return rows, True
+        rows.extend(chunk)
+    return rows, False
+
+
+def _multiset_digest(side: _Side, buffered: List[tuple], tolerance: float) -> int:
+    digest = sum(_row_digest(row, tolerance) for row in buffered) % _HASH_MOD
+    chunk = side.fetch()
+    while chunk:
+        digest = (digest + sum(_row_digest(row, tolerance) for row in chunk)) % _HASH_MOD
+        chunk = side.fetch()
+    return digest
+
+
+def _compare_unordered(expected: _Side, actual: _Side, tolerance: float,
+                       max_rows: int) -> Tuple[bool, Optional[dict], str]:
+    exp_rows, exp_done = _collect(expected, max_rows)
+    act_rows, act_done = _collect(actual, max_rows)
+    if exp_done and act_done:
+        if len(exp_rows) != len(act_rows):
+            return False, None, "rows"
+        exp_rows.sort(key=lambda row: _row_key(row, tolerance))
+        act_rows.sort(key=lambda row: _row_key(row, tolerance))
+        for e, a in zip(exp_rows, act_rows):
+            if not rows_equal(e, a, tolerance):
+                return False, _mismatch(None, e, a), "rows"
+        return True, None, "rows"
+    exp_digest = _multiset_digest(expected, exp_rows, tolerance)
+    act_digest = _multiset_digest(actual, act_rows, tolerance)
+    return expected.rows == actual.rows and exp_digest == act_digest, None, "hash"
+
+
+def grade_sql(engine: SqlEngine, code: str, reference_query: str, problem_id: Optional[str] = None,
+              ordered: Optional[bool] = None, tolerance: float = 1e-6, timeout_s: float = 10,
+              max_rows_in_memory: int = 10000) -> dict:
+    """Compare the last query of `code` with `reference_query` on the problem's fixture.
+
+    `ordered=None` makes row order matter only when the reference query has a
+    top-level ORDER BY. Raises ReferenceQueryError if the reference fails.
+    """
+    if ordered is None:
+        ordered = has_top_level_order_by(reference_query)
+    report = {
+        "verdict": "wrong_answer",
+        "ordered": ordered,
+        "compared_by": "rows",
+        "expected_rows": None,
+        "actual_rows": None,
+        "columns": None,
+        "mismatch": None,
+        "message": "",
+    }
+    expected_conn = engine.connect(problem_id)
+    actual_conn = engine.connect(problem_id)
+    try:
+        engine.with_deadline(expected_conn, timeout_s)
+        engine.with_deadline(actual_conn, timeout_s)
+        try:
+            expected_cursor = engine.execute_last_query(expected_conn, reference_query)
+        except sqlite3.Error as e:
+            raise ReferenceQueryError(str(e)) from e
+        if expected_cursor is None:
+            raise ReferenceQueryError("Reference query returns no result set")
+        try:
+            actual_cursor = engine.execute_last_query(actual_conn, code)
+        except sqlite3.Error as e:
+            raise _SideError("actual", e) from e
+        if actual_cursor is None:
+            report["message"] = "Submission contains no query"
+            return report
+
+        expected_columns = [d[0] for d in expected_cursor.description]
+        actual_columns = [d[0] for d in actual_cursor.description]
+        report["columns"] = expected_columns
+        mapping = column_mapping(expected_columns, actual_columns)
+        if mapping is None:
+            report["message"] = f"Expected {len(expected_columns)} columns, got {len(actual_columns)}"
+            return report
+
+        expected = _Side("expected", expected_cursor)
+        actual = _Side("actual", actual_cursor, mapping)
+        if ordered:
+            passed, mismatch = _compare_ordered(expected, actual, tolerance)
+        else:
+            passed, mismatch, report["compared_by"] = _compare_unordered(expected, actual, tolerance,
+                                                                         max_rows_in_memory)
+        report.update({
+            "verdict": "passed" if passed else "wrong_answer",
+            "expected_rows": expected.rows,
+            "actual_rows": actual.rows,
+            "mismatch": mismatch,
+        })
+        if not passed:
+            report["message"] = (f"Expected {expected.rows} rows, got {actual.rows}"
+                                 if expected.rows != actual.rows else "Rows differ")
+        return report
+    except _SideError as e:
+        timed_out = isinstance(e.error, sqlite3.OperationalError) and str(e.error) == "interrupted"
+        if e.side == "expected":
+            if timed_out:
+                raise ReferenceQueryError(f"Reference query timed out after {timeout_s} seconds") from e
+            raise ReferenceQueryError(str(e.error)) from e
+        report["verdict"] = "timeout" if timed_out else "runtime_error"
+        report["message"] = f"Execution timed out after {timeout_s} seconds" if timed_out else str(e.error)
+        return report
+    finally:
+        expected_conn.close()
+        actual_conn.close()
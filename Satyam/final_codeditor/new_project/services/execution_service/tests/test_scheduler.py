@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from scheduler import ExecutionScheduler, QueueFullError
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_submit_returns_the_result_and_counts_it():
+    async def main():
+        scheduler = ExecutionScheduler(executors=2, max_queue=10, language_limits={"python": 2})
+        await scheduler.start()
+
+        async def job():
+            return 42
+
+        try:
+            assert await scheduler.submit("python", job) == 42
+            return scheduler.stats()
+        finally:
+            await scheduler.stop()
+
+    stats = run(main())
+    assert stats["submitted"] == 1 and stats["completed"] == 1 and stats["queue_depth"] == 0
+
+
+def test_job_exceptions_reach_the_caller():
+    async def main():
+        scheduler = ExecutionScheduler(executors=1, max_queue=10, language_limits={"python": 1})
+        await scheduler.start()
+
+        async def job():
+            raise RuntimeError("boom")
+
+        try:
+            with pytest.raises(RuntimeError, match="boom"):
+                await scheduler.submit("python", job)
+            with pytest.raises(ValueError):
+                await scheduler.submit("cobol", job)
+        finally:
+            await scheduler.stop()
+
+    run(main())
+
+
+def test_language_cap_does_not_block_other_languages():
+    async def main():
+        scheduler = ExecutionScheduler(executors=3, max_queue=10, language_limits={"java": 1, "python": 2})
+        await scheduler.start()
+        release = asyncio.Event()
+        running = {"java": 0, "java_max": 0}
+
+        async def java():
+            running["java"] += 1
+            running["java_max"] = max(running["java_max"], running["java"])
+            await release.wait()
+            running["java"] -= 1
+            return "java"
+
+        async def python():
+            return "python"
+
+        try:
+            javas = [asyncio.create_task(scheduler.submit("java", java)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            # Two Java jobs are parked behind the cap; Python still runs at once
+            assert await asyncio.wait_for(scheduler.submit("python", python), 1) == "python"
+            assert scheduler.stats()["parked"]["java"] == 2
+            release.set()
+            assert await asyncio.gather(*javas) == ["java"] * 3
+            return running["java_max"]
+        finally:
+            await scheduler.stop()
+
+    assert run(main()) == 1
+
+
+def test_full_queue_raises_with_retry_after():
+    async def main():
+        scheduler = ExecutionScheduler(executors=1, max_queue=2, language_limits={"python": 1})
+        await scheduler.start()
+        release = asyncio.Event()
+
+        async def job():
+            await release.wait()
+
+        try:
+            tasks = [asyncio.create_task(scheduler.submit("python", job))]
+            await asyncio.sleep(0.01)
+            # One running, two waiting: the queue is at its limit
+            tasks += [asyncio.create_task(scheduler.submit("python", job)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            assert scheduler.depth == 2
+            with pytest.raises(QueueFullError) as excinfo:
+                await scheduler.submit("python", job)
+            assert excinfo.value.retry_after_s >= 1
+            assert scheduler.rejected == 1
+            release.set()
+            await asyncio.gather(*tasks)
+        finally:
+            await scheduler.stop()
+
+    run(main())
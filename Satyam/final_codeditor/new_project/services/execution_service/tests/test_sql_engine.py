@@ -0,0 +1,66 @@
+from sql_engine import SqlEngine, is_query, split_statements
+
+FIXTURE = """
+CREATE TABLE employees (id INTEGER PRIMARY KEY, name TEXT, salary REAL);
+INSERT INTO employees VALUES (1, 'Ann', 55000), (2, 'Bob', 48000.5), (3, 'Cy', 61000);
+"""
+
+
+def make_engine(tmp_path):
+    (tmp_path / "emp.sql").write_text(FIXTURE, encoding="utf-8")
+    engine = SqlEngine(str(tmp_path))
+    engine.load_fixtures()
+    return engine
+
+
+def test_split_statements_keeps_semicolons_in_literals_and_comments():
+    code = "SELECT 'a;b';\n-- note; here\nSELECT 2 /* x; y */;\nSELECT 3"
+    assert split_statements(code) == ["SELECT 'a;b';", "-- note; here\nSELECT 2 /* x; y */;", "SELECT 3"]
+
+
+def test_is_query_skips_leading_comments():
+    assert is_query("-- top\n/* block */ WITH t AS (SELECT 1) SELECT * FROM t")
+    assert not is_query("INSERT INTO t VALUES (1)")
+
+
+def test_run_uses_a_private_copy_of_the_fixture(tmp_path):
+    engine = make_engine(tmp_path)
+    result = engine.run("DELETE FROM employees; SELECT COUNT(*) AS n FROM employees;", "emp")
+    assert result["exit_code"] == 0
+    assert result["stdout"] == "n\n0\n"
+    assert engine.run("SELECT COUNT(*) AS n FROM employees", "emp")["stdout"] == "n\n3\n"
+
+
+def test_run_reports_empty_results_and_plain_statements(tmp_path):
+    engine = make_engine(tmp_path)
+    assert engine.run("SELECT * FROM employees WHERE id = 99", "emp")["stdout"] == "No results"
+    assert engine.run("CREATE TABLE t (x INTEGER)", "emp")["stdout"] == "Query executed successfully"
+
+
+def test_run_caps_output(tmp_path):
+    engine = make_engine(tmp_path)
+    code = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5000) SELECT i FROM n"
+    result = engine.run(code, "emp", output_limit_bytes=100)
+    assert result["limit_exceeded"] == "output"
+    assert len(result["stdout"]) == 100
+
+
+def test_run_reports_errors_and_timeouts(tmp_path):
+    engine = make_engine(tmp_path)
+    error = engine.run("SELECT * FROM missing", "emp")
+    assert error["exit_code"] == 1 and "no such table" in error["stderr"]
+
+    endless = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+    timeout = engine.run(endless, "emp", timeout_s=0.05)
+    assert timeout["timed_out"] and timeout["exit_code"] == -1
+
+
+def test_execute_last_query_runs_setup_only(tmp_path):
+    engine = make_engine(tmp_path)
+    conn = engine.connect("emp")
+    try:
+        cursor = engine.execute_last_query(conn, "UPDATE employees SET salary = 1; SELECT SUM(salary) FROM employees")
+        assert cursor.fetchall() == [(3.0,)]
+        assert engine.execute_last_query(conn, "DELETE FROM employees") is None
+    finally:
+        conn.close()
@@ -0,0 +1,99 @@
+import pytest
+
+from sql_engine import SqlEngine
+from sql_grader import ReferenceQueryError, column_mapping, grade_sql, has_top_level_order_by
+
+FIXTURE = """
+CREATE TABLE employees (id INTEGER PRIMARY KEY, name TEXT, dept TEXT, salary REAL);
+INSERT INTO employees VALUES
+    (1, 'Ann', 'eng', 55000), (2, 'Bob', 'ops', 48000.5), (3, 'Cy', 'eng', 61000), (4, 'Di', 'ops', 52000);
+"""
+
+
+@pytest.fixture
+def engine(tmp_path):
+    (tmp_path / "emp.sql").write_text(FIXTURE, encoding="utf-8")
+    engine = SqlEngine(str(tmp_path))
+    engine.load_fixtures()
+    return engine
+
+
+def grade(engine, code, reference, **kwargs):
+    return grade_sql(engine, code, reference, problem_id="emp", **kwargs)
+
+
+def test_has_top_level_order_by_ignores_subqueries_literals_and_comments():
+    assert has_top_level_order_by("SELECT * FROM t ORDER BY id")
+    assert not has_top_level_order_by("SELECT * FROM (SELECT * FROM t ORDER BY id)")
+    assert not has_top_level_order_by("SELECT 'ORDER BY' FROM t -- ORDER BY id")
+    assert not has_top_level_order_by("SELECT reorder_by FROM t")
+
+
+def test_column_mapping_by_name_then_position():
+    assert column_mapping(["id", "name"], ["NAME", "ID"]) == [1, 0]
+    assert column_mapping(["id", "name"], ["a", "b"]) == [0, 1]
+    assert column_mapping(["id"], ["id", "name"]) is None
+
+
+def test_unordered_reference_accepts_any_row_order(engine):
+    report = grade(engine, "SELECT name FROM employees ORDER BY name DESC", "SELECT name FROM employees")
+    assert report["verdict"] == "passed"
+    assert report["ordered"] is False and report["compared_by"] == "rows"
+
+
+def test_ordered_reference_requires_the_same_order(engine):
+    reference = "SELECT name FROM employees ORDER BY salary"
+    assert grade(engine, "SELECT name FROM employees ORDER BY salary", reference)["verdict"] == "passed"
+    report = grade(engine, "SELECT name FROM employees ORDER BY salary DESC", reference)
+    assert report["verdict"] == "wrong_answer"
+    assert report["mismatch"] == {"row": 0, "expected": ["Bob"], "actual": ["Cy"]}
+
+
+def test_columns_match_by_name_in_any_order(engine):
+    report = grade(engine, "SELECT name, id FROM employees", "SELECT id, name FROM employees")
+    assert report["verdict"] == "passed"
+
+
+def test_numbers_compare_within_tolerance(engine):
+    reference = "SELECT id, salary FROM employees"
+    assert grade(engine, "SELECT id, CAST(salary AS INTEGER) + 0.0000001 FROM employees WHERE id <> 2 "
+                         "UNION ALL SELECT id, salary FROM employees WHERE id = 2", reference)["verdict"] == "passed"
+    assert grade(engine, "SELECT id, salary + 1 FROM employees", reference)["verdict"] == "wrong_answer"
+    assert grade(engine, "SELECT id, salary + 1 FROM employees", reference, tolerance=2)["verdict"] == "passed"
+
+
+def test_row_count_and_column_count_mismatches(engine):
+    report = grade(engine, "SELECT name FROM employees WHERE dept = 'eng'", "SELECT name FROM employees")
+    assert report["verdict"] == "wrong_answer"
+    assert (report["expected_rows"], report["actual_rows"]) == (4, 2)
+    report = grade(engine, "SELECT id, name FROM employees", "SELECT name FROM employees")
+    assert report["message"] == "Expected 1 columns, got 2"
+
+
+def test_large_unordered_results_fall_back_to_hash(engine):
+    reference = "SELECT id, name FROM employees"
+    report = grade(engine, "SELECT id, name FROM employees ORDER BY id DESC", reference, max_rows_in_memory=2)
+    assert report["verdict"] == "passed" and report["compared_by"] == "hash"
+    report = grade(engine, "SELECT id, name || '!' FROM employees", reference, max_rows_in_memory=2)
+    assert report["verdict"] == "wrong_answer" and report["compared_by"] == "hash"
+
+
+def test_runtime_error_and_timeout_in_the_submission(engine):
+    report = grade(engine, "SELECT * FROM missing", "SELECT name FROM employees")
+    assert report["verdict"] == "runtime_error" and "no such table" in report["message"]
+
+    endless = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+    report = grade(engine, endless, "SELECT COUNT(*) FROM employees", timeout_s=0.05)
+    assert report["verdict"] == "timeout"
+
+
+def test_submission_without_a_query(engine):
+    report = grade(engine, "DELETE FROM employees", "SELECT name FROM employees")
+    assert report["verdict"] == "wrong_answer" and report["message"] == "Submission contains no query"
+
+
+def test_broken_reference_raises(engine):
+    with pytest.raises(ReferenceQueryError):
+        grade(engine, "SELECT 1", "SELECT * FROM missing")
+    with pytest.raises(ReferenceQueryError):
+        grade(engine, "SELECT 1", "DELETE FROM employees")
@@ -24,6 +24,8 @@ CREATE INDEX idx_problem_id ON test_answer(problem_id);
 CREATE INDEX idx_candidate_problem ON test_answer(candidate_id, problem_id);
 CREATE INDEX idx_timestamp ON test_answer(timestamp);
 CREATE INDEX idx_status ON test_answer(status);
+-- Keyset pagination of a candidate's history: ORDER BY timestamp DESC, id DESC
+CREATE INDEX idx_candidate_timestamp_id ON test_answer(candidate_id, timestamp, id);
 
 -- Add comments
 COMMENT ON TABLE test_answer IS 'Stores test submissions from candidates with code, execution results, and pass/fail status';
@@ -0,0 +1,133 @@
+"""
+Benchmark: problem fetching for /candidate/problems
+===================================================
+
+Seeds a scratch collection with one test's worth of problems and times how long
+a request spends fetching them from MongoDB:
+
+  before      one MongoClient + ping + find_one + close per problem (the old N+1 loop)
+  cold cache  get_problems_from_mongo: one $in query on the shared client
+  warm cache  get_problems_from_mongo with every problem cached
+
+With --url/--test-id/--token it also times the live endpoint end to end
+(Postgres resolution included). Run that once against the old build and once
+against the new one to compare.
+
+Needs a reachable MongoDB configured through MONGODB_URI / MONGODB_DB.
+
+Usage:
+    cd services/problem_service
+    python bench_candidate_problems.py --questions 20 --requests 50
+    python bench_candidate_problems.py --url http://localhost:8002 --test-id T1 --token candidate_student_001
+"""
+
+import argparse
+import os
+import statistics
+import time
+import urllib.request
+
+from pymongo import MongoClient
+
+import main
+
+
+def summarize(latencies: list) -> dict:
+    latencies = sorted(latencies)
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+    return {
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "max_ms": latencies[-1],
+    }
+
+
+def timed(fn, requests: int) -> dict:
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return summarize(latencies)
+
+
+def fetch_one_per_client(coll_name: str, source_ids: list):
+    """The old per-problem loop, kept here as the baseline"""
+    for source_id in source_ids:
+        client = MongoClient(main.MONGO_URI, serverSelectionTimeoutMS=5000)
+        client.admin.command('ping')
+        coll = client[main.MONGO_DB][coll_name]
+        coll.find_one({"id": source_id}) or coll.find_one({"_id": source_id})
+        client.close()
+
+
+def bench_mongo(args) -> dict:
+    coll_name = f"bench_problems_{os.getpid()}"
+    source_ids = [f"bench-{i}" for i in range(args.questions)]
+    main.mongo_client = MongoClient(main.MONGO_URI, serverSelectionTimeoutMS=5000)
+    main.MONGO_COLLECTION = coll_name
+    coll = main.get_problem_collection()
+    coll.insert_many([
+        {"id": source_id, "title": f"Problem {source_id}", "description": "x" * args.description_bytes,
+         "difficulty": "Easy", "labels": ["bench"], "sample_input": "1", "sample_output": "1", "constraints": ""}
+        for source_id in source_ids
+    ])
+    try:
+        def cold():
+            main.problem_cache.clear()
+            assert len(main.get_problems_from_mongo(source_ids)) == len(source_ids)
+
+        def warm():
+            main.get_problems_from_mongo(source_ids)
+
+        return {
+            "before": timed(lambda: fetch_one_per_client(coll_name, source_ids), args.requests),
+            "cold cache": timed(cold, args.requests),
+            "warm cache": timed(warm, args.requests),
+        }
+    finally:
+        coll.drop()
+        main.mongo_client.close()
+
+
+def bench_endpoint(args) -> dict:
+    url = f"{args.url.rstrip('/')}/candidate/problems?test_id={args.test_id}"
+    headers = {"Authorization": f"Bearer {args.token}"}
+
+    def call():
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as resp:
+            resp.read()
+
+    call()
+    return {"endpoint": timed(call, args.requests)}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=20, help="coding questions in the test")
+    parser.add_argument("--requests", type=int, default=50, help="timed requests per variant")
+    parser.add_argument("--description-bytes", type=int, default=2000)
+    parser.add_argument("--url", help="time GET /candidate/problems on a running service instead")
+    parser.add_argument("--test-id")
+    parser.add_argument("--token")
+    args = parser.parse_args()
+
+    if args.url:
+        if not (args.test_id and args.token):
+            parser.error("--url needs --test-id and --token")
+        results = bench_endpoint(args)
+    else:
+        results = bench_mongo(args)
+
+    print(f"{args.requests} requests per variant" + ("" if args.url else f", {args.questions} questions") + "\n")
+    print(f"{'variant':<12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<12}{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['max_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main_cli()
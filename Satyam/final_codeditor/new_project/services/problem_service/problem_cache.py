@@ -0,0 +1,166 @@
+"""
+Problem Cache
+Normalized problem payloads kept in memory, so viewing a problem during an
+exam does not go to MongoDB. Entries expire after PROBLEM_CACHE_TTL_S and the
+least recently used ones are evicted past PROBLEM_CACHE_MAX_ENTRIES.
+
+Edits made in MongoDB are picked up by a background thread. It follows a
+change stream on the problem collection, which needs a replica set. On a
+standalone server it falls back to polling for documents whose `updated_at`
+moved past the newest one seen. Deleted problems only show up in the change
+stream; with polling they age out with the TTL.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+
+class ProblemCache:
+    def __init__(self, ttl_s: float = 300, max_entries: int = 2000):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        # key -> (expires_at, Mongo _id, payload)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped on every invalidation, so a load that raced with one is not cached
+        self.generation = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        """A copy of the cached payload, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[2])
+
+    def put(self, key: str, doc_id, payload: dict, generation: Optional[int] = None):
+        """Cache `payload`; pass the `generation` read before loading it from MongoDB"""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_s, doc_id, dict(payload))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, doc_ids: Iterable) -> int:
+        """Drop every entry loaded from one of the Mongo `_id`s"""
+        doc_ids = set(doc_ids)
+        with self._lock:
+            stale = [key for key, (_, doc_id, _) in self._entries.items() if doc_id in doc_ids]
+            for key in stale:
+                del self._entries[key]
+            self.generation += 1
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "entries": size,
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class CacheInvalidator:
+    """Background thread that drops cache entries for problems edited in MongoDB"""
+
+    def __init__(self, cache: ProblemCache, get_collection: Callable, poll_interval_s: float = 10):
+        self.cache = cache
+        self.get_collection = get_collection
+        self.poll_interval_s = poll_interval_s
+        self.mode = "stopped"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="problem-cache-invalidator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.mode = "stopped"
+
+    def _run(self):
+        polling = False
+        while not self._stop.is_set():
+            coll = self.get_collection()
+            if coll is None:
+                self._stop.wait(self.poll_interval_s)
+                continue
+            try:
+                if polling:
+                    self._poll(coll)
+                else:
+                    self._watch(coll)
+            except PyMongoError as e:
+                if isinstance(e, OperationFailure) and not polling:
+                    # Change streams need a replica set or sharded cluster
+                    print(f"✓ Problem cache: change streams unavailable ({e}), polling updated_at")
+                    polling = True
+                    continue
+                # Changes may have been missed while disconnected
+                print(f"✗ Problem cache invalidation interrupted: {e}")
+                self.cache.clear()
+                self._stop.wait(self.poll_interval_s)
+
+    def _watch(self, coll):
+        with coll.watch(max_await_time_ms=1000) as stream:
+            self.mode = "change_stream"
+            while not self._stop.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is None:
+                    continue
+                if change["operationType"] in ("drop", "rename", "dropDatabase", "invalidate"):
+                    self.cache.clear()
+                    return
+                self.cache.invalidate([change["documentKey"]["_id"]])
+
+    def _poll(self, coll):
+        self.mode = "polling"
+        # Start from the newest stored value so comparisons use whatever type updated_at is stored as
+        newest = coll.find_one({"updated_at": {"$exists": True}}, {"updated_at": 1}, sort=[("updated_at", -1)])
+        last_seen = newest["updated_at"] if newest else None
+        while not self._stop.wait(self.poll_interval_s):
+            query = {"updated_at": {"$gt": last_seen}} if last_seen is not None else {"updated_at": {"$exists": True}}
+            changed = list(coll.find(query, {"_id": 1, "updated_at": 1}))
+            if changed:
+                self.cache.invalidate(doc["_id"] for doc in changed)
+                last_seen = max(doc["updated_at"] for doc in changed)
@@ -0,0 +1,182 @@
+"""
+Bulk test_answer Ingestion
+Loads many test answers into PostgreSQL with COPY instead of one INSERT (and
+one commit) per row. Used by POST /test-answers/bulk, and runnable as a CLI
+that streams a file to that endpoint.
+
+Rows are validated one by one. Bad rows are reported with their line number
+and skipped, and good rows are sent with COPY FROM STDIN in chunks of
+`chunk_rows`. Ids are reserved from the table's sequence before each chunk,
+so the response can list them in input order. The caller commits once at the
+end, so an import is a single transaction.
+
+Usage:
+    python bulk_ingest.py answers.ndjson
+    python bulk_ingest.py answers.json --url http://localhost:8003 --all-or-nothing
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+from typing import List, Optional
+
+COPY_COLUMNS = ("id", "candidate_id", "problem_id", "language", "code",
+                "stdin", "stdout", "output", "status", "is_passed")
+REQUIRED_FIELDS = ("candidate_id", "problem_id", "language", "code")
+TEXT_FIELDS = ("candidate_id", "problem_id", "language", "code", "stdin", "stdout", "output", "status")
+# VARCHAR sizes from test_answer; longer values would abort the whole COPY
+MAX_LENGTHS = {"candidate_id": 255, "problem_id": 255, "language": 50, "status": 50}
+DEFAULTS = {"stdin": "", "stdout": "", "output": "", "status": "pending"}
+
+
+def validate_row(obj) -> tuple:
+    """The row's COPY values (without id); raises ValueError with a readable reason."""
+    if not isinstance(obj, dict):
+        raise ValueError("row must be a JSON object")
+    missing = [field for field in REQUIRED_FIELDS if obj.get(field) in (None, "")]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    values = []
+    for field in TEXT_FIELDS:
+        value = obj.get(field, DEFAULTS.get(field))
+        if value is None:
+            value = DEFAULTS.get(field, "")
+        if not isinstance(value, str):
+            raise ValueError(f"{field} must be a string")
+        if "\x00" in value:
+            raise ValueError(f"{field} contains a NUL character")
+        if field in MAX_LENGTHS and len(value) > MAX_LENGTHS[field]:
+            raise ValueError(f"{field} is longer than {MAX_LENGTHS[field]} characters")
+        values.append(value)
+    is_passed = obj.get("is_passed", False)
+    if not isinstance(is_passed, bool):
+        raise ValueError("is_passed must be true or false")
+    values.append(is_passed)
+    return tuple(values)
+
+
+def _copy_value(value) -> str:
+    """COPY text format: escape the delimiter, row separator and backslash."""
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, int):
+        return str(value)
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def copy_rows(conn, rows: List[tuple]) -> List[int]:
+    """COPY `rows` into test_answer and return their ids, in order. Does not commit."""
+    if not rows:
+        return []
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence('test_answer', 'id')) FROM generate_series(1, %s)",
+            (len(rows),)
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        buf = io.StringIO()
+        for answer_id, row in zip(ids, rows):
+            buf.write("\t".join(_copy_value(v) for v in (answer_id,) + row))
+            buf.write("\n")
+        buf.seek(0)
+        cursor.copy_expert(f"COPY test_answer ({', '.join(COPY_COLUMNS)}) FROM STDIN", buf)
+        return ids
+    finally:
+        cursor.close()
+
+
+class BulkIngest:
+    """Collects validated rows and COPYs them a chunk at a time on one connection."""
+
+    def __init__(self, conn, chunk_rows: int = 5000):
+        self.conn = conn
+        self.chunk_rows = chunk_rows
+        self.ids: List[int] = []
+        self.errors: List[dict] = []
+        self.rows_seen = 0
+        self._rows: List[tuple] = []
+
+    @property
+    def ready(self) -> bool:
+        return len(self._rows) >= self.chunk_rows
+
+    def add(self, line: int, obj):
+        self.rows_seen += 1
+        try:
+            self._rows.append(validate_row(obj))
+        except ValueError as e:
+            self.errors.append({"line": line, "error": str(e)})
+
+    def add_line(self, line: int, text: str):
+        """One NDJSON line; blank lines are skipped."""
+        if not text.strip():
+            return
+        try:
+            obj = json.loads(text)
+        except ValueError as e:
+            self.rows_seen += 1
+            self.errors.append({"line": line, "error": f"invalid JSON: {e}"})
+            return
+        self.add(line, obj)
+
+    def flush(self):
+        rows, self._rows = self._rows, []
+        self.ids.extend(copy_rows(self.conn, rows))
+
+
+async def iter_lines(chunks):
+    """(line number, text) for each line of an async byte stream."""
+    buffered = b""
+    line = 0
+    async for chunk in chunks:
+        buffered += chunk
+        *complete, buffered = buffered.split(b"\n")
+        for raw in complete:
+            line += 1
+            yield line, raw.decode("utf-8", errors="replace")
+    if buffered:
+        yield line + 1, buffered.decode("utf-8", errors="replace")
+
+
+# ========================= CLI =========================
+
+def upload(path: str, base_url: str, all_or_nothing: bool) -> dict:
+    ndjson = not path.endswith(".json")
+    url = f"{base_url.rstrip('/')}/test-answers/bulk" + ("?all_or_nothing=true" if all_or_nothing else "")
+    with open(path, "rb") as f:
+        request = urllib.request.Request(url, data=f, method="POST", headers={
+            "Content-Type": "application/x-ndjson" if ndjson else "application/json",
+            "Content-Length": str(os.path.getsize(path)),
+        })
+        try:
+            with urllib.request.urlopen(request) as resp:
+                return json.load(resp)
+        except urllib.error.HTTPError as e:
+            body = e.read().decode("utf-8", errors="replace")
+            raise SystemExit(f"Upload failed ({e.code}): {body}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk-load test answers (NDJSON or a JSON array) into test_answer")
+    parser.add_argument("path", help="answers file; .json is read as an array, anything else as NDJSON")
+    parser.add_argument("--url", default="http://localhost:8003", help="submission service base URL")
+    parser.add_argument("--all-or-nothing", action="store_true", help="insert nothing if any row is invalid")
+    args = parser.parse_args(argv)
+
+    result = upload(args.path, args.url, args.all_or_nothing)
+    print(f"Inserted {result['inserted']} of {result['rows']} rows in {result['elapsed_ms']} ms "
+          f"({result['rows_per_second']} rows/s)")
+    for error in result["errors"][:50]:
+        print(f"  line {error['line']}: {error['error']}")
+    if len(result["errors"]) > 50:
+        print(f"  ... and {len(result['errors']) - 50} more errors")
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+Write-Behind Draft Buffer
+Autosaves land here instead of going straight to MongoDB. Writes are
+coalesced per draft_id (last write wins) and flushed as bulk_writes every
+DRAFT_FLUSH_INTERVAL_MS, or sooner once DRAFT_FLUSH_MAX_ENTRIES drafts are
+pending. Deletes are buffered the same way, so a flush can never bring back a
+draft that was deleted after it was saved.
+
+Each pending save carries the patch ops since the last flushed version, and
+coalesced saves concatenate their ops. A flush writes one delta record per
+draft (see draft_delta.py), or a full snapshot when the draft is new, when a
+save came without a usable diff, or once DRAFT_SNAPSHOT_EVERY deltas or a
+snapshot's worth of delta bytes have piled up since the last one.
+
+The latest state of recently used drafts, DRAFT_CACHE_SIZE of them, stays in
+memory. GET /draft and patch application read it without touching MongoDB, and
+a candidate always sees their latest autosave from the same process. A failed
+flush puts its drafts back, merged in front of anything buffered since. The
+remaining drafts are flushed on shutdown.
+"""
+
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pymongo import DeleteMany, DeleteOne, UpdateOne
+
+from draft_delta import DELTAS_COLLECTION, patch_bytes
+
+# Marks a deleted draft
+_DELETED = object()
+
+# Bookkeeping kept on the snapshot document only
+_SNAPSHOT_FIELDS = ("code", "snapshot_version", "delta_records", "delta_bytes")
+
+
+def _merge(older: dict, newer: dict) -> dict:
+    """One pending write that has the effect of `older` followed by `newer`."""
+    if newer["state"] is _DELETED or older["state"] is _DELETED:
+        return newer
+    ops = None if older["ops"] is None or newer["ops"] is None else older["ops"] + newer["ops"]
+    return {"state": newer["state"], "ops": ops, "from_version": older["from_version"]}
+
+
+class DraftBuffer:
+    def __init__(self, get_database: Callable, flush_interval_ms: int = 500, max_entries: int = 500,
+                 snapshot_every: int = 50, cache_size: int = 5000):
+        self.get_database = get_database
+        self.flush_interval_s = flush_interval_ms / 1000
+        self.max_entries = max_entries
+        self.snapshot_every = snapshot_every
+        self.cache_size = cache_size
+        self._states: "OrderedDict[str, object]" = OrderedDict()
+        self._pending: Dict[str, dict] = {}
+        self._inflight: Dict[str, dict] = {}
+        self._flush_lock: asyncio.Lock = None
+        self._full: asyncio.Event = None
+        self._task: Optional[asyncio.Task] = None
+        self.writes_total = 0
+        self.coalesced_total = 0
+        self.flushed_total = 0
+        self.flushes_total = 0
+        self.flush_failures = 0
+        self.snapshots_written = 0
+        self.deltas_written = 0
+        self.bytes_written = 0
+        self.bytes_as_snapshots = 0
+
+    async def start(self):
+        self._flush_lock = asyncio.Lock()
+        self._full = asyncio.Event()
+        self._task = asyncio.ensure_future(self._flush_loop())
+
+    async def stop(self, attempts: int = 3):
+        """Stop the flush loop and write out everything still pending."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for _ in range(attempts):
+            await self.flush()
+            if not self._pending:
+                return
+            await asyncio.sleep(1)
+        print(f"✗ {len(self._pending)} drafts could not be flushed on shutdown")
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    def _remember(self, draft_id: str, state):
+        self._states[draft_id] = state
+        self._states.move_to_end(draft_id)
+        while len(self._states) > self.cache_size:
+            oldest = next(iter(self._states))
+            if oldest in self._pending or oldest in self._inflight:
+                break
+            del self._states[oldest]
+
+    def _buffer(self, draft_id: str, entry: dict):
+        self.writes_total += 1
+        self._remember(draft_id, entry["state"])
+        if draft_id in self._pending:
+            self.coalesced_total += 1
+            entry = _merge(self._pending[draft_id], entry)
+        self._pending[draft_id] = entry
+        if len(self._pending) >= self.max_entries and self._full:
+            self._full.set()
+
+    def put(self, draft_id: str, state: dict, ops: Optional[List[dict]], from_version: int):
+        """Buffer `state`; `ops` turn version `from_version` into it (None forces a snapshot)."""
+        self._buffer(draft_id, {"state": state, "ops": ops, "from_version": from_version})
+
+    def delete(self, draft_id: str):
+        self._buffer(draft_id, {"state": _DELETED, "ops": None, "from_version": None})
+
+    def get(self, draft_id: str) -> Tuple[bool, Optional[dict]]:
+        """(True, state) or (True, None) if the latest state is known here; (False, None) if MongoDB has it."""
+        if draft_id in self._states:
+            self._states.move_to_end(draft_id)
+            state = self._states[draft_id]
+            return True, None if state is _DELETED else state
+        return False, None
+
+    def remember(self, draft_id: str, state: dict):
+        """Cache a draft loaded from MongoDB so the next patch applies without another read."""
+        if draft_id not in self._states:
+            self._remember(draft_id, state)
+
+    def _writes_for(self, draft_id: str, entry: dict):
+        """Delta ops, draft ops, cleanup ops, bookkeeping for the cached state, and
+        (bytes written, bytes a snapshot would have taken)."""
+        state = entry["state"]
+        if state is _DELETED:
+            return [], [DeleteOne({"draft_id": draft_id})], [DeleteMany({"draft_id": draft_id})], None, (0, 0)
+
+        code_bytes = len(state["code"].encode("utf-8"))
+        ops = entry["ops"]
+        if ops is not None:
+            size = patch_bytes(ops)
+            records, total = state["delta_records"] + 1, state["delta_bytes"] + size
+            if records < self.snapshot_every and total < code_bytes:
+                meta = {k: v for k, v in state.items() if k not in _SNAPSHOT_FIELDS}
+                meta.update(delta_records=records, delta_bytes=total)
+                delta = UpdateOne(
+                    {"draft_id": draft_id, "from_version": entry["from_version"]},
+                    {"$set": {"to_version": state["version"], "ops": ops, "created_at": datetime.utcnow()}},
+                    upsert=True,
+                )
+                return ([delta], [UpdateOne({"draft_id": draft_id}, {"$set": meta}, upsert=True)], [],
+                        {"delta_records": records, "delta_bytes": total}, (size, code_bytes))
+
+        snapshot = dict(state, snapshot_version=state["version"], delta_records=0, delta_bytes=0)
+        # A draft started from scratch may follow a deleted one; none of the old chain applies
+        stale = {} if entry["from_version"] == 0 else {"to_version": {"$lte": state["version"]}}
+        cleanup = DeleteMany({"draft_id": draft_id, **stale})
+        return ([], [UpdateOne({"draft_id": draft_id}, {"$set": snapshot}, upsert=True)], [cleanup],
+                {"snapshot_version": state["version"], "delta_records": 0, "delta_bytes": 0}, (code_bytes, code_bytes))
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            db = self.get_database()
+            if db is None:
+                return
+            batch, self._pending = self._pending, {}
+            self._inflight = batch
+            delta_ops, draft_ops, cleanup_ops, bookkeeping = [], [], [], {}
+            written = as_snapshots = 0
+            for draft_id, entry in batch.items():
+                deltas, drafts, cleanup, applied, (size, full_size) = self._writes_for(draft_id, entry)
+                delta_ops += deltas
+                draft_ops += drafts
+                cleanup_ops += cleanup
+                bookkeeping[draft_id] = applied
+                written += size
+                as_snapshots += full_size
+            try:
+                # Deltas before the documents that point at them, stale deltas only
+                # once the snapshot replacing them is written
+                if delta_ops:
+                    await asyncio.to_thread(db[DELTAS_COLLECTION].bulk_write, delta_ops, ordered=False)
+                await asyncio.to_thread(db.code_drafts.bulk_write, draft_ops, ordered=False)
+                if cleanup_ops:
+                    await asyncio.to_thread(db[DELTAS_COLLECTION].bulk_write, cleanup_ops, ordered=False)
+                self.flushed_total += len(batch)
+                self.flushes_total += 1
+                self.deltas_written += len(delta_ops)
+                self.bytes_written += written
+                self.bytes_as_snapshots += as_snapshots
+                self.snapshots_written += sum(1 for applied in bookkeeping.values() if applied and "snapshot_version" in applied)
+                for draft_id, applied in bookkeeping.items():
+                    state = self._states.get(draft_id)
+                    if applied and isinstance(state, dict):
+                        state.update(applied)
+            except Exception as e:
+                self.flush_failures += 1
+                print(f"Error flushing {len(batch)} drafts to MongoDB: {e}")
+                for draft_id, entry in batch.items():
+                    newer = self._pending.get(draft_id)
+                    self._pending[draft_id] = _merge(entry, newer) if newer else entry
+            finally:
+                self._inflight = {}
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "inflight": len(self._inflight),
+            "cached": len(self._states),
+            "writes_total": self.writes_total,
+            "coalesced_total": self.coalesced_total,
+            "flushed_total": self.flushed_total,
+            "flushes_total": self.flushes_total,
+            "flush_failures": self.flush_failures,
+            "snapshots_written": self.snapshots_written,
+            "deltas_written": self.deltas_written,
+            # Bytes of code/patch text written vs. what full snapshots would have cost
+            "bytes_written": self.bytes_written,
+            "bytes_as_snapshots": self.bytes_as_snapshots,
+            "flush_interval_ms": int(self.flush_interval_s * 1000),
+            "max_entries": self.max_entries,
+            "snapshot_every": self.snapshot_every,
+        }
@@ -8,18 +8,27 @@ Database Structure:
 - PostgreSQL: test_answer table (primary storage for test submissions)
 """
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from pymongo import MongoClient
 from bson import ObjectId
-from typing import Optional, List
+from typing import Iterator, Optional, List
 from datetime import datetime
+import asyncio
 import os
+import time
 import uuid
 import json
+import threading
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from draft_buffer import DraftBuffer
+from draft_delta import PatchError, apply_patch, diff_ops, load_draft
+from bulk_ingest import BulkIngest, iter_lines
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, parse_include, prefetch, stream_page
 
 app = FastAPI(title="Submission Service", version="1.0.0")
 
@@ -44,6 +53,40 @@ POSTGRES_CONFIG = {
     "database": os.getenv("POSTGRES_DB", "codeplay_db")
 }
 
+# Connections are shared for the life of the process: one MongoClient (it pools
+# its own sockets) and a psycopg2 pool, instead of connecting per request
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+POSTGRES_POOL_MIN = int(os.getenv("POSTGRES_POOL_MIN", "1"))
+POSTGRES_POOL_MAX = int(os.getenv("POSTGRES_POOL_MAX", "10"))
+
+mongo_client: Optional[MongoClient] = None
+postgres_pool: Optional[ThreadedConnectionPool] = None
+_postgres_pool_lock = threading.Lock()
+
+# Draft autosaves are buffered and written to MongoDB in batches (see draft_buffer.py)
+DRAFT_FLUSH_INTERVAL_MS = int(os.getenv("DRAFT_FLUSH_INTERVAL_MS", "500"))
+DRAFT_FLUSH_MAX_ENTRIES = int(os.getenv("DRAFT_FLUSH_MAX_ENTRIES", "500"))
+# Drafts are stored as snapshots plus deltas (see draft_delta.py); a new snapshot
+# is written after this many deltas
+DRAFT_SNAPSHOT_EVERY = int(os.getenv("DRAFT_SNAPSHOT_EVERY", "50"))
+DRAFT_CACHE_SIZE = int(os.getenv("DRAFT_CACHE_SIZE", "5000"))
+
+draft_buffer = DraftBuffer(
+    get_database=lambda: mongo_client.codeplay if mongo_client else None,
+    flush_interval_ms=DRAFT_FLUSH_INTERVAL_MS,
+    max_entries=DRAFT_FLUSH_MAX_ENTRIES,
+    snapshot_every=DRAFT_SNAPSHOT_EVERY,
+    cache_size=DRAFT_CACHE_SIZE,
+)
+
+# Rows per COPY chunk for /test-answers/bulk
+TEST_ANSWER_BULK_CHUNK_ROWS = int(os.getenv("TEST_ANSWER_BULK_CHUNK_ROWS", "5000"))
+
+# History lists leave out the large text fields unless ?include= asks for them
+TEST_ANSWER_LIST_COLUMNS = ("id", "candidate_id", "problem_id", "language", "status", "is_passed", "timestamp")
+TEST_ANSWER_HEAVY_FIELDS = ("code", "stdin", "stdout", "output")
+SUBMISSION_HEAVY_FIELDS = ("code", "stdin")
+
 # ======================= REQUEST MODELS =======================
 
 # Request Models
@@ -69,24 +112,42 @@ class TestAnswerRequest(BaseModel):
     is_passed: bool = False
     expected_output: str = ""
 
+class DraftPatchOp(BaseModel):
+    """Replace `delete` characters at `offset` with `insert` (UTF-16 units, i.e. JS string indexes)"""
+    offset: int
+    delete: int = 0
+    insert: str = ""
+
 class DraftRequest(BaseModel):
     candidate_id: str  # Changed from user_id
     problem_id: str
     language: str
-    code: str
+    # Either the full code, or a patch against the version the last save returned
+    code: Optional[str] = None
+    patch: Optional[List[DraftPatchOp]] = None
+    base_version: Optional[int] = None
     cursor_position: Optional[int] = 0
     status: str = "draft"
 
 def get_mongodb_client():
-    """Get MongoDB connection"""
+    """Get the shared MongoDB client (None until startup has created it)"""
+    return mongo_client
+
+def mongodb_reachable() -> bool:
+    if not mongo_client:
+        return False
     try:
-        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-        client.admin.command('ping')
-        print("✓ MongoDB connected")
-        return client
-    except Exception as e:
-        print(f"✗ MongoDB connection failed: {e} - Running in MOCK_MODE")
-        return None
+        mongo_client.admin.command('ping')
+        return True
+    except Exception:
+        return False
+
+def draft_response(draft: dict) -> dict:
+    """A draft as returned by GET /draft, without the snapshot bookkeeping"""
+    doc = convert_mongo_doc(draft)
+    for key in ("snapshot_version", "delta_records", "delta_bytes"):
+        doc.pop(key, None)
+    return doc
 
 def convert_mongo_doc(doc: dict) -> dict:
     """Convert MongoDB document to JSON-serializable dict"""
@@ -104,23 +165,50 @@ def convert_mongo_doc(doc: dict) -> dict:
 
 # ======================= POSTGRESQL FUNCTIONS =======================
 
+def get_postgres_pool() -> Optional[ThreadedConnectionPool]:
+    """Create the PostgreSQL pool on first use, so the service still starts while Postgres is down"""
+    global postgres_pool
+    if postgres_pool is None:
+        with _postgres_pool_lock:
+            if postgres_pool is None:
+                try:
+                    postgres_pool = ThreadedConnectionPool(
+                        POSTGRES_POOL_MIN,
+                        POSTGRES_POOL_MAX,
+                        host=POSTGRES_CONFIG["host"],
+                        port=POSTGRES_CONFIG["port"],
+                        user=POSTGRES_CONFIG["user"],
+                        password=POSTGRES_CONFIG["password"],
+                        database=POSTGRES_CONFIG["database"],
+                        connect_timeout=5
+                    )
+                    print(f"✓ PostgreSQL pool ready (min={POSTGRES_POOL_MIN}, max={POSTGRES_POOL_MAX})")
+                except Exception as e:
+                    print(f"✗ PostgreSQL connection failed: {e}")
+                    return None
+    return postgres_pool
+
 def get_postgres_connection():
-    """Get PostgreSQL connection"""
+    """Borrow a PostgreSQL connection from the pool; hand it back with release_postgres_connection()"""
+    pool = get_postgres_pool()
+    if not pool:
+        return None
     try:
-        conn = psycopg2.connect(
-            host=POSTGRES_CONFIG["host"],
-            port=POSTGRES_CONFIG["port"],
-            user=POSTGRES_CONFIG["user"],
-            password=POSTGRES_CONFIG["password"],
-            database=POSTGRES_CONFIG["database"],
-            connect_timeout=5
-        )
-        print("✓ PostgreSQL connected")
+        conn = pool.getconn()
+        if conn.closed:
+            # Dropped since it was last used (e.g. Postgres restarted)
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
         return conn
-    except Exception as e:
+    except (PoolError, psycopg2.Error) as e:
         print(f"✗ PostgreSQL connection failed: {e}")
         return None
 
+def release_postgres_connection(conn):
+    """Return a borrowed connection; the pool rolls back anything left open and drops broken ones"""
+    if conn is not None and postgres_pool is not None:
+        postgres_pool.putconn(conn, close=bool(conn.closed))
+
 def save_test_answer_to_postgres(test_answer: TestAnswerRequest) -> dict:
     """
     Save test answer to PostgreSQL test_answer table
@@ -188,51 +276,48 @@ def save_test_answer_to_postgres(test_answer: TestAnswerRequest) -> dict:
         }
     finally:
         cursor.close()
-        conn.close()
+        release_postgres_connection(conn)
 
-def get_test_answers_postgres(candidate_id: str) -> List[dict]:
-    """Fetch all test answers for a candidate from PostgreSQL"""
+def iter_test_answers_postgres(candidate_id: str, limit: int, after: Optional[tuple], include: List[str]) -> Iterator[tuple]:
+    """Yield (answer, (timestamp, id)) for one page of a candidate's test answers, newest first.
+
+    Keyset pagination on (timestamp, id) via idx_candidate_timestamp_id. A
+    server-side cursor streams the rows so a page of large answers is never
+    held in memory at once. Heavy columns are read only when `include` names
+    them.
+    """
     conn = get_postgres_connection()
     if not conn:
-        return []
+        return
     
+    cursor = None
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor(name=f"test_answers_{uuid.uuid4().hex}", cursor_factory=RealDictCursor)
+        cursor.itersize = 100
         
-        select_query = """
-            SELECT * FROM test_answer 
-            WHERE candidate_id = %s 
-            ORDER BY timestamp DESC
+        columns = ", ".join(TEST_ANSWER_LIST_COLUMNS + tuple(include))
+        keyset = "AND (timestamp, id) < (%s::timestamp, %s)" if after else ""
+        select_query = f"""
+            SELECT {columns} FROM test_answer
+            WHERE candidate_id = %s {keyset}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT %s
         """
         
-        cursor.execute(select_query, (candidate_id,))
-        results = cursor.fetchall()
-        
-        # Convert to list of dicts
-        answers = []
-        for row in results:
-            answers.append({
-                "id": row["id"],
-                "candidate_id": row["candidate_id"],
-                "problem_id": row["problem_id"],
-                "language": row["language"],
-                "code": row["code"],
-                "stdin": row["stdin"],
-                "stdout": row["stdout"],
-                "output": row["output"],
-                "status": row["status"],
-                "is_passed": row["is_passed"],
-                "timestamp": row["timestamp"].isoformat() if row["timestamp"] else None
-            })
-        
-        return answers
+        cursor.execute(select_query, (candidate_id, *(after or ()), limit))
+        for row in cursor:
+            answer = dict(row)
+            answer["timestamp"] = row["timestamp"].isoformat() if row["timestamp"] else None
+            yield answer, (row["timestamp"], row["id"])
         
     except Exception as e:
+        # Re-raised: swallowing it would end the page as if it were complete
         print(f"Error fetching from PostgreSQL: {e}")
-        return []
+        raise
     finally:
-        cursor.close()
-        conn.close()
+        if cursor is not None:
+            cursor.close()
+        release_postgres_connection(conn)
 
 def get_test_answer_postgres(answer_id: int) -> Optional[dict]:
     """Fetch specific test answer from PostgreSQL"""
@@ -269,34 +354,62 @@ def get_test_answer_postgres(answer_id: int) -> Optional[dict]:
         return None
     finally:
         cursor.close()
-        conn.close()
+        release_postgres_connection(conn)
+
+# ========================= LIFECYCLE =========================
+
+@app.on_event("startup")
+async def open_connections():
+    global mongo_client
+    # MongoClient connects lazily and reconnects on its own, so this never blocks startup
+    mongo_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000, maxPoolSize=MONGO_MAX_POOL_SIZE)
+    if await run_in_threadpool(mongodb_reachable):
+        print("✓ MongoDB connected")
+    else:
+        print("✗ MongoDB connection failed - Running in MOCK_MODE")
+    await run_in_threadpool(get_postgres_pool)
+    await draft_buffer.start()
+    # In the background: with MongoDB down this waits out the server selection timeout
+    asyncio.ensure_future(asyncio.to_thread(ensure_submission_indexes))
+
+@app.on_event("shutdown")
+async def close_connections():
+    global mongo_client, postgres_pool
+    # Pending drafts go out before the client they need is closed
+    await draft_buffer.stop()
+    if mongo_client:
+        mongo_client.close()
+        mongo_client = None
+    if postgres_pool:
+        postgres_pool.closeall()
+        postgres_pool = None
 
 # ========================= API ENDPOINTS =========================
 
+# Handlers that call pymongo/psycopg2 directly are plain `def`, so FastAPI runs
+# them in its threadpool instead of blocking the event loop
+
 @app.get("/health")
-async def health():
+def health():
     """Health check endpoint - check both databases"""
-    mongo_client = get_mongodb_client()
     postgres_conn = get_postgres_connection()
     
-    mongodb_status = "connected" if mongo_client else "disconnected"
+    mongodb_status = "connected" if mongodb_reachable() else "disconnected"
     postgres_status = "connected" if postgres_conn else "disconnected"
     
-    if mongo_client:
-        mongo_client.close()
-    if postgres_conn:
-        postgres_conn.close()
+    release_postgres_connection(postgres_conn)
     
     return {
         "status": "healthy",
         "service": "Submission Service",
         "port": 8003,
         "mongodb": mongodb_status,
-        "postgresql": postgres_status
+        "postgresql": postgres_status,
+        "draft_buffer": draft_buffer.stats()
     }
 
 @app.post("/submission")
-async def submit_code(req: SubmissionRequest):
+def submit_code(req: SubmissionRequest):
     """
     Save code submission to both MongoDB and PostgreSQL
     
@@ -320,12 +433,9 @@ async def submit_code(req: SubmissionRequest):
         try:
             db = client.codeplay
             result = db.code_submissions.insert_one(submission)
-            client.close()
             print(f"✓ Submission saved to MongoDB: {result.inserted_id}")
         except Exception as e:
             print(f"Error saving to MongoDB: {e}")
-            if client:
-                client.close()
     
     return {
         "submission_id": submission.get("submission_id"),
@@ -337,7 +447,7 @@ async def submit_code(req: SubmissionRequest):
     }
 
 @app.post("/test-answer")
-async def save_test_answer(req: TestAnswerRequest):
+def save_test_answer(req: TestAnswerRequest):
     """
     Save test answer with output comparison to PostgreSQL
     
@@ -352,32 +462,127 @@ async def save_test_answer(req: TestAnswerRequest):
     result = save_test_answer_to_postgres(req)
     return result
 
-@app.get("/submissions/{candidate_id}")
-async def get_submissions(candidate_id: str):
-    """Fetch all submissions for a candidate"""
+@app.post("/test-answers/bulk")
+async def save_test_answers_bulk(request: Request, all_or_nothing: bool = False):
+    """
+    Bulk-load test answers with COPY, in one transaction
     
-    submissions = await get_user_submissions(candidate_id)
+    Body: NDJSON (Content-Type: application/x-ndjson, streamed) or a JSON array.
+    Each row has the TestAnswerRequest fields.
     
-    return {
-        "candidate_id": candidate_id,
-        "count": len(submissions),
-        "submissions": submissions
-    }
-
-@app.get("/test-answers/{candidate_id}")
-async def get_test_answers(candidate_id: str):
-    """Fetch all test answers for a candidate from PostgreSQL"""
+    Response includes:
+    - ids: new test_answer ids, in input order (invalid rows excluded)
+    - errors: [{line, error}] for rows that were skipped
+    - with all_or_nothing=true, any invalid row rolls back everything (422)
+    """
     
-    answers = get_test_answers_postgres(candidate_id)
+    # Every psycopg2 call goes to the threadpool: the handler stays async to stream the body
+    conn = await run_in_threadpool(get_postgres_connection)
+    if not conn:
+        raise HTTPException(status_code=503, detail="PostgreSQL connection failed")
+    
+    started = time.perf_counter()
+    ingest = BulkIngest(conn, TEST_ANSWER_BULK_CHUNK_ROWS)
+    try:
+        content_type = request.headers.get("content-type", "")
+        if "ndjson" in content_type or "jsonl" in content_type:
+            async for line, text in iter_lines(request.stream()):
+                ingest.add_line(line, text)
+                if ingest.ready:
+                    await run_in_threadpool(ingest.flush)
+        else:
+            try:
+                rows = json.loads(await request.body())
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+            if not isinstance(rows, list):
+                raise HTTPException(status_code=400, detail="Expected a JSON array or NDJSON")
+            for line, obj in enumerate(rows, start=1):
+                ingest.add(line, obj)
+                if ingest.ready:
+                    await run_in_threadpool(ingest.flush)
+        
+        if all_or_nothing and ingest.errors:
+            await run_in_threadpool(conn.rollback)
+            raise HTTPException(status_code=422, detail={"message": "Invalid rows, nothing inserted",
+                                                         "errors": ingest.errors})
+        await run_in_threadpool(ingest.flush)
+        await run_in_threadpool(conn.commit)
+    except HTTPException:
+        await run_in_threadpool(conn.rollback)
+        raise
+    except Exception as e:
+        print(f"Error bulk-loading test answers: {e}")
+        await run_in_threadpool(conn.rollback)
+        raise HTTPException(status_code=500, detail=f"Bulk load failed, nothing inserted: {e}")
+    finally:
+        await run_in_threadpool(release_postgres_connection, conn)
+    
+    elapsed = time.perf_counter() - started
+    print(f"✓ Bulk-loaded {len(ingest.ids)} test answers in {elapsed:.2f}s")
     
     return {
-        "candidate_id": candidate_id,
-        "count": len(answers),
-        "test_answers": answers
+        "status": "success" if not ingest.errors else "partial",
+        "rows": ingest.rows_seen,
+        "inserted": len(ingest.ids),
+        "ids": ingest.ids,
+        "errors": ingest.errors,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "rows_per_second": round(len(ingest.ids) / elapsed) if elapsed > 0 else None
     }
 
+def page_params(cursor: Optional[str], include: Optional[str], allowed: tuple) -> tuple:
+    """Decoded keyset cursor and included heavy fields; 400 if either is malformed"""
+    try:
+        fields = parse_include(include, allowed)
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return after, fields
+
+async def page_rows(rows: Iterator[tuple]) -> Iterator[tuple]:
+    """`rows` with the query already run: 503 if it fails before the first row, instead of a broken stream"""
+    try:
+        return await run_in_threadpool(prefetch, rows)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Could not load history: {e}")
+
+@app.get("/submissions/{candidate_id}")
+async def get_submissions(
+    candidate_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include: Optional[str] = Query(None, description="Comma-separated heavy fields to return: code, stdin"),
+):
+    """Fetch one page of a candidate's submissions, newest first; pass next_cursor back as cursor for the next"""
+    
+    after, fields = page_params(cursor, include, SUBMISSION_HEAVY_FIELDS)
+    if after and not (isinstance(after[0], str) and ObjectId.is_valid(after[1])):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    rows = await page_rows(iter_user_submissions(candidate_id, limit + 1, after, fields))
+    return StreamingResponse(stream_page({"candidate_id": candidate_id}, "submissions", rows, limit),
+                             media_type="application/json")
+
+@app.get("/test-answers/{candidate_id}")
+async def get_test_answers(
+    candidate_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include: Optional[str] = Query(None, description="Comma-separated heavy fields to return: code, stdin, stdout, output"),
+):
+    """Fetch one page of a candidate's test answers from PostgreSQL, newest first"""
+    
+    after, fields = page_params(cursor, include, TEST_ANSWER_HEAVY_FIELDS)
+    if after and not (isinstance(after[0], str) and isinstance(after[1], int)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    rows = await page_rows(iter_test_answers_postgres(candidate_id, limit + 1, after, fields))
+    return StreamingResponse(stream_page({"candidate_id": candidate_id}, "test_answers", rows, limit),
+                             media_type="application/json")
+
 @app.get("/test-answer/{answer_id}")
-async def get_test_answer(answer_id: int):
+def get_test_answer(answer_id: int):
     """Fetch specific test answer from PostgreSQL"""
     
     answer = get_test_answer_postgres(answer_id)
@@ -388,7 +593,7 @@ async def get_test_answer(answer_id: int):
     return answer
 
 @app.get("/submission/{submission_id}")
-async def get_submission(submission_id: str):
+def get_submission(submission_id: str):
     """Fetch specific submission from MongoDB"""
     
     client = get_mongodb_client()
@@ -396,67 +601,124 @@ async def get_submission(submission_id: str):
         try:
             db = client.codeplay
             submission = db.code_submissions.find_one({"submission_id": submission_id})
-            client.close()
             
             if submission:
                 return convert_mongo_doc(submission)
         except Exception as e:
             print(f"Error fetching from MongoDB: {e}")
-            client.close() if client else None
     
     raise HTTPException(status_code=404, detail="Submission not found")
 
 # ======================= DRAFT FUNCTIONS =======================
 
-async def get_user_submissions(candidate_id: str) -> List[dict]:
-    """Fetch user submissions from MongoDB"""
+def iter_user_submissions(candidate_id: str, limit: int, after: Optional[tuple], include: List[str]) -> Iterator[tuple]:
+    """Yield (submission, (timestamp, _id)) for one page of a candidate's submissions from MongoDB, newest first"""
     
     client = get_mongodb_client()
-    if client:
-        try:
-            db = client.codeplay
-            submissions = list(db.code_submissions.find({"candidate_id": candidate_id}))
-            client.close()
-            
-            return [convert_mongo_doc(sub) for sub in submissions]
-        except Exception as e:
-            print(f"Error fetching from MongoDB: {e}")
-    
-    return []
+    if not client:
+        return
+    
+    query = {"candidate_id": candidate_id}
+    if after:
+        timestamp, last_id = after
+        query["$or"] = [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": ObjectId(last_id)}},
+        ]
+    projection = {field: 0 for field in SUBMISSION_HEAVY_FIELDS if field not in include}
+    try:
+        db = client.codeplay
+        docs = (db.code_submissions.find(query, projection or None)
+                .sort([("timestamp", -1), ("_id", -1)])
+                .limit(limit)
+                .batch_size(100))
+        for doc in docs:
+            yield convert_mongo_doc(doc), (doc.get("timestamp"), str(doc["_id"]))
+    except Exception as e:
+        # Re-raised: swallowing it would end the page as if it were complete
+        print(f"Error fetching from MongoDB: {e}")
+        raise
+
+def ensure_submission_indexes():
+    """Index backing the keyset-paginated GET /submissions/{candidate_id}"""
+    try:
+        mongo_client.codeplay.code_submissions.create_index(
+            [("candidate_id", 1), ("timestamp", -1), ("_id", -1)], name="candidate_timestamp_id"
+        )
+    except Exception as e:
+        print(f"✗ Could not create submission indexes: {e}")
 
 @app.post("/draft")
 async def save_draft(req: DraftRequest):
-    """Auto-save draft for session recovery"""
+    """
+    Auto-save draft for session recovery (buffered, written to MongoDB in batches)
+    
+    Send `code`, or `patch` + `base_version` (the `version` returned by the last
+    save or GET). A stale base_version gets 409 with the current version; resend
+    the full code then.
+    """
     
+    if req.code is None and (req.patch is None or req.base_version is None):
+        raise HTTPException(status_code=400, detail="Send code, or patch with base_version")
+    
+    client = get_mongodb_client()
+    if not client:
+        return {"status": "error", "message": "Failed to save draft"}
+    
+    draft_id = f"{req.candidate_id}_{req.problem_id}_draft"
+    known, current = draft_buffer.get(draft_id)
+    if not known:
+        # The buffer lives on the event loop; only the MongoDB read goes to a thread
+        try:
+            loaded = await run_in_threadpool(load_draft, client.codeplay, draft_id)
+        except Exception as e:
+            print(f"Error fetching draft: {e}")
+            loaded = None
+        # A save for the same draft may have been buffered while this one waited
+        known, current = draft_buffer.get(draft_id)
+        if not known:
+            current = loaded
+            if current:
+                draft_buffer.remember(draft_id, current)
+    
+    if req.code is not None:
+        code = req.code
+        # Old text known: store only what changed; otherwise a full snapshot
+        ops = diff_ops(current["code"], code) if current else None
+    else:
+        if not current or current["version"] != req.base_version:
+            raise HTTPException(
+                status_code=409,
+                detail={"message": "Draft version mismatch, send full code",
+                        "version": current["version"] if current else None}
+            )
+        ops = [op.model_dump() for op in req.patch]
+        try:
+            code = apply_patch(current["code"], ops)
+        except PatchError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    if current and not ops and current.get("language") == req.language:
+        return {"status": "saved", "draft_id": draft_id, "version": current["version"]}
+    
+    version = current["version"] + 1 if current else 1
     draft = {
+        "draft_id": draft_id,
         "candidate_id": req.candidate_id,
         "problem_id": req.problem_id,
         "language": req.language,
-        "code": req.code,
+        "code": code,
+        "version": version,
+        "snapshot_version": current["snapshot_version"] if current else version,
+        "delta_records": current["delta_records"] if current else 0,
+        "delta_bytes": current["delta_bytes"] if current else 0,
         "cursor_position": req.cursor_position,
         "status": "draft",
         "timestamp": datetime.utcnow().isoformat(),
         "last_saved": datetime.utcnow().isoformat()
     }
-    
-    client = get_mongodb_client()
-    if client:
-        try:
-            db = client.codeplay
-            draft_id = f"{req.candidate_id}_{req.problem_id}_draft"
-            result = db.code_drafts.update_one(
-                {"draft_id": draft_id},
-                {"$set": draft},
-                upsert=True
-            )
-            client.close()
-            print(f"✓ Draft saved: {draft_id}")
-            return {"status": "saved", "draft_id": draft_id}
-        except Exception as e:
-            print(f"Error saving draft to MongoDB: {e}")
-            client.close() if client else None
-    
-    return {"status": "error", "message": "Failed to save draft"}
+    draft_buffer.put(draft_id, draft, ops if current else None, current["version"] if current else 0)
+    return {"status": "saved", "draft_id": draft_id, "version": version}
 
 @app.get("/draft/{candidate_id}/{problem_id}")
 async def get_draft(candidate_id: str, problem_id: str):
@@ -464,18 +726,28 @@ async def get_draft(candidate_id: str, problem_id: str):
     
     draft_id = f"{candidate_id}_{problem_id}_draft"
     
+    # Autosaves not yet flushed to MongoDB are newer than what it holds
+    buffered, draft = draft_buffer.get(draft_id)
+    if buffered:
+        if draft:
+            return draft_response(draft)
+        return {"status": "no_draft", "message": "No saved draft for this problem"}
+    
     client = get_mongodb_client()
     if client:
         try:
-            db = client.codeplay
-            draft = db.code_drafts.find_one({"draft_id": draft_id})
-            client.close()
+            draft = await run_in_threadpool(load_draft, client.codeplay, draft_id)
             
+            # Buffered while the read was in flight, so newer than what was read
+            buffered, newer = draft_buffer.get(draft_id)
+            if buffered:
+                draft = newer
+            elif draft:
+                draft_buffer.remember(draft_id, draft)
             if draft:
-                return convert_mongo_doc(draft)
+                return draft_response(draft)
         except Exception as e:
             print(f"Error fetching draft: {e}")
-            client.close() if client else None
     
     return {"status": "no_draft", "message": "No saved draft for this problem"}
 
@@ -487,15 +759,9 @@ async def delete_draft(candidate_id: str, problem_id: str):
     
     client = get_mongodb_client()
     if client:
-        try:
-            db = client.codeplay
-            result = db.code_drafts.delete_one({"draft_id": draft_id})
-            client.close()
-            print(f"✓ Draft deleted: {draft_id}")
-            return {"status": "deleted"}
-        except Exception as e:
-            print(f"Error deleting draft: {e}")
-            client.close() if client else None
+        # Buffered like saves, so a pending autosave cannot recreate it
+        draft_buffer.delete(draft_id)
+        return {"status": "deleted"}
     
     return {"status": "error", "message": "Failed to delete draft"}
 
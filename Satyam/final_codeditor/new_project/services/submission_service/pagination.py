@@ -0,0 +1,78 @@
+"""
+Keyset Pagination & Streaming JSON
+Helpers for the candidate history endpoints. Pages are ordered newest first
+on (timestamp, id), and the next page starts strictly after the last row
+returned, so every page costs the same no matter how deep the history is
+(no OFFSET scans).
+
+Cursors are opaque to clients: base64url-encoded JSON [timestamp, id].
+Pages are written out row by row as they are fetched, so a page holding large
+`code` fields is never built up as one big string. A database error after the
+first row aborts the response instead of closing the JSON, so a cut-off page
+never looks like a complete last page.
+"""
+
+import base64
+import itertools
+import json
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(timestamp, row_id) -> str:
+    if hasattr(timestamp, "isoformat"):
+        timestamp = timestamp.isoformat()
+    raw = json.dumps([timestamp, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, object]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise CursorError(f"Invalid cursor: {cursor!r}") from e
+    return timestamp, row_id
+
+
+def parse_include(include: Optional[str], allowed: Iterable[str]) -> List[str]:
+    """Comma-separated heavy fields the caller asked for, e.g. "code,stdout"."""
+    fields = [field.strip() for field in (include or "").split(",") if field.strip()]
+    unknown = sorted(set(fields) - set(allowed))
+    if unknown:
+        raise ValueError(f"Unknown include field(s): {', '.join(unknown)}; allowed: {', '.join(allowed)}")
+    return fields
+
+
+_END = object()
+
+
+def prefetch(rows: Iterator) -> Iterator:
+    """Fetch the first row now, so a failing query raises before the response starts."""
+    first = next(rows, _END)
+    return rows if first is _END else itertools.chain([first], rows)
+
+
+def stream_page(envelope: dict, items_key: str, rows: Iterator[Tuple[dict, tuple]], limit: int) -> Iterator[str]:
+    """JSON page: `envelope` plus `items_key`, `count` and `next_cursor`, written as rows arrive.
+
+    `rows` yields (item, (timestamp, id)) and should be asked for limit + 1
+    rows; the extra row only tells whether another page exists.
+    """
+    head = json.dumps(envelope, default=str)
+    yield head[:-1] + ("," if envelope else "") + f'"{items_key}":['
+    count, last_key, next_cursor = 0, None, None
+    for item, key in rows:
+        if count == limit:
+            next_cursor = encode_cursor(*last_key)
+            break
+        yield ("," if count else "") + json.dumps(item, default=str)
+        count += 1
+        last_key = key
+    yield f'],"count":{count},"next_cursor":{json.dumps(next_cursor)}}}'
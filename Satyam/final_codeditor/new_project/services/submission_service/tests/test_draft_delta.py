@@ -0,0 +1,54 @@
+import pytest
+
+from draft_delta import PatchError, apply_patch, diff_ops, replay
+
+
+@pytest.mark.parametrize("old, new", [
+    ("print(1)", "print(2)"),
+    ("", "x = 1\n"),
+    ("abc", ""),
+    ("a😀b", "a😁b"),
+    ("# 😀 emoji\nx = 1", "# 😀 emoji\nx = 2"),
+    ("😀😀", "😀"),
+    ("名前 = 1", "名前 = 10"),
+])
+def test_diff_then_apply_round_trips(old, new):
+    assert apply_patch(old, diff_ops(old, new)) == new
+
+
+def test_offsets_count_utf16_code_units():
+    # The emoji is two JavaScript string indexes, so "x" sits at 2
+    assert diff_ops("😀x", "😀y") == [{"offset": 2, "delete": 1, "insert": "y"}]
+    assert apply_patch("😀x", [{"offset": 2, "delete": 1, "insert": "z"}]) == "😀z"
+
+
+def test_ops_apply_in_sequence():
+    ops = [{"offset": 0, "delete": 0, "insert": "ab"}, {"offset": 2, "delete": 0, "insert": "c"}]
+    assert apply_patch("", ops) == "abc"
+
+
+def test_identical_text_has_no_ops():
+    assert diff_ops("same", "same") == []
+
+
+def test_out_of_range_ops_are_rejected():
+    with pytest.raises(PatchError):
+        apply_patch("abc", [{"offset": 2, "delete": 5, "insert": ""}])
+    with pytest.raises(PatchError):
+        apply_patch("abc", [{"offset": -1, "delete": 0, "insert": "x"}])
+
+
+def test_splitting_a_surrogate_pair_is_rejected():
+    with pytest.raises(PatchError):
+        apply_patch("a😀b", [{"offset": 2, "delete": 0, "insert": "x"}])
+
+
+def test_replay_follows_the_delta_chain():
+    deltas = [
+        {"from_version": 1, "to_version": 2, "ops": diff_ops("a", "ab")},
+        {"from_version": 2, "to_version": 3, "ops": diff_ops("ab", "abc")},
+    ]
+    assert replay("a", 1, 3, deltas) == "abc"
+    assert replay("a", 1, 2, deltas) == "ab"
+    # Missing v2 -> v3
+    assert replay("a", 1, 3, deltas[:1]) is None
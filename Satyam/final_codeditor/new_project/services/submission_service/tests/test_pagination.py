@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from pagination import CursorError, decode_cursor, encode_cursor, parse_include, prefetch, stream_page
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2024-05-01T10:00:00", 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("2024-05-01T10:00:00", 42)
+
+
+def test_cursor_accepts_datetimes():
+    from datetime import datetime
+
+    assert decode_cursor(encode_cursor(datetime(2024, 5, 1, 10), "abc")) == ("2024-05-01T10:00:00", "abc")
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor("only", 1)[:-3], "WzFd"])
+def test_bad_cursors_are_rejected(cursor):
+    with pytest.raises(CursorError):
+        decode_cursor(cursor)
+
+
+def test_parse_include():
+    assert parse_include("code, stdin", ("code", "stdin")) == ["code", "stdin"]
+    assert parse_include(None, ("code",)) == []
+    with pytest.raises(ValueError):
+        parse_include("code,password", ("code",))
+
+
+def rows(n):
+    for i in range(n):
+        yield {"id": i}, ("2024-05-01", i)
+
+
+def test_stream_page_sets_next_cursor_when_more_rows_exist():
+    page = json.loads("".join(stream_page({"candidate_id": "c1"}, "items", rows(4), 3)))
+    assert page["candidate_id"] == "c1"
+    assert [item["id"] for item in page["items"]] == [0, 1, 2]
+    assert page["count"] == 3
+    assert decode_cursor(page["next_cursor"]) == ("2024-05-01", 2)
+
+
+def test_stream_page_last_page_has_no_cursor():
+    page = json.loads("".join(stream_page({}, "items", rows(2), 3)))
+    assert page == {"items": [{"id": 0}, {"id": 1}], "count": 2, "next_cursor": None}
+
+
+def test_prefetch_raises_before_the_first_byte():
+    def failing():
+        raise RuntimeError("query failed")
+        yield
+
+    with pytest.raises(RuntimeError):
+        prefetch(failing())
+    assert list(prefetch(rows(2))) == list(rows(2))
+    assert list(prefetch(rows(0))) == []
+
+
+def test_errors_abort_the_page_instead_of_closing_it():
+    def failing():
+        yield {"id": 0}, ("2024-05-01", 0)
+        raise RuntimeError("connection lost")
+
+    chunks = []
+    with pytest.raises(RuntimeError):
+        for chunk in stream_page({}, "items", prefetch(failing()), 3):
+            chunks.append(chunk)
+    assert "next_cursor" not in "".join(chunks)
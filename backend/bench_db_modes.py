@@ -0,0 +1,145 @@
+"""
+Load benchmark: sync (threadpool) vs async (AsyncConnection) DB modes
+=====================================================================
+
+Starts `main:app` once per DB_MODE, drives it with many concurrent clients
+and prints throughput and latency percentiles for each mode.
+
+Needs a reachable PostgreSQL configured through the usual POSTGRES_* env
+vars, plus `httpx` (pip install httpx).
+
+Usage:
+    cd backend
+    python bench_db_modes.py --concurrency 500 --duration 20
+    python bench_db_modes.py --test-id <uuid> --assignment-id <uuid>
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def build_paths(args) -> list:
+    paths = ["/api/tests"]
+    if args.test_id:
+        paths += [f"/api/tests/{args.test_id}", f"/api/tests/{args.test_id}/questions"]
+    if args.assignment_id:
+        paths += [f"/api/assignments/{args.assignment_id}", f"/api/assignments/{args.assignment_id}/answers"]
+    return paths
+
+
+def start_server(mode: str, port: int, workers: int) -> subprocess.Popen:
+    env = {**os.environ, "DB_MODE": mode}
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+           "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env)
+
+
+async def wait_until_healthy(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                resp = await client.get(f"{base_url}/health")
+                if resp.status_code == 200:
+                    return resp.json()
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"Server at {base_url} did not become healthy within {timeout}s")
+
+
+async def run_load(base_url: str, paths: list, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    stop_at = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        async def worker(worker_id: int):
+            nonlocal errors
+            i = worker_id
+            while time.monotonic() < stop_at:
+                path = paths[i % len(paths)]
+                i += 1
+                started = time.perf_counter()
+                try:
+                    resp = await client.get(path)
+                    if resp.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        await asyncio.gather(*(worker(w) for w in range(concurrency)))
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else 0.0
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / duration,
+        "mean_ms": statistics.fmean(latencies) if latencies else 0.0,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+
+async def bench_mode(mode: str, args, paths: list) -> dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = start_server(mode, args.port, args.workers)
+    try:
+        await wait_until_healthy(base_url)
+        # Warm the pool and the OS caches before measuring
+        await run_load(base_url, paths, min(args.concurrency, 20), 2)
+        result = await run_load(base_url, paths, args.concurrency, args.duration)
+        async with httpx.AsyncClient() as client:
+            result["health"] = (await client.get(f"{base_url}/health")).json()
+        return result
+    finally:
+        server.terminate()
+        server.wait(timeout=15)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per mode")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--test-id")
+    parser.add_argument("--assignment-id")
+    parser.add_argument("--modes", default="sync,async")
+    args = parser.parse_args()
+
+    paths = build_paths(args)
+    print(f"Paths: {', '.join(paths)}")
+    print(f"Concurrency: {args.concurrency}, duration: {args.duration}s/mode, workers: {args.workers}\n")
+
+    results = {}
+    for mode in args.modes.split(","):
+        results[mode] = asyncio.run(bench_mode(mode, args, paths))
+
+    print(f"{'mode':<8}{'requests':>10}{'errors':>8}{'req/s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<8}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10.1f}{r['mean_ms']:>10.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+    for mode, r in results.items():
+        pool = r["health"].get("async_db_pool") or r["health"].get("db_pool", {})
+        print(f"{mode} pool: avg_wait_ms={pool.get('avg_wait_ms')} timeouts={pool.get('timeouts')} max_size={pool.get('max_size')}")
+
+
+if __name__ == "__main__":
+    main()
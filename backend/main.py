@@ -14,17 +14,26 @@ Services included:
 6. MCQ Filtering Service - Fetch MCQs by language and difficulty
 """
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, FastAPI, Depends, Header, HTTPException, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from enum import Enum
-from typing import List, Optional
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Optional
+import asyncio
+import json
 import logging
+import threading
+import time
 import psycopg
+from psycopg_pool import AsyncConnectionPool, ConnectionPool, PoolTimeout
 import uuid
 from datetime import datetime, timedelta
 import hashlib
 import os
+import urllib.parse
+import urllib.request
 
 try:
     import jwt
@@ -52,23 +61,132 @@ app.add_middleware(
 JWT_SECRET = os.getenv("JWT_SECRET", "talentshire-secret-key-change-in-production")
 JWT_ALGORITHM = "HS256"
 
-# ---------- PostgreSQL Connection ----------
-def get_db_connection():
-    try:
-        import os
-        host = os.getenv("POSTGRES_HOST", "localhost")
-        port = int(os.getenv("POSTGRES_PORT", "5432"))
-        conn = psycopg.connect(
-            dbname=os.getenv("POSTGRES_DB", "talentshire"),
-            user=os.getenv("POSTGRES_USER", "talentshire"),
-            password=os.getenv("POSTGRES_PASSWORD", "talentshire123"),
-            host=host,
-            port=port
-        )
-        return conn
+# ---------- PostgreSQL Connection Pool ----------
+# One pool per worker process. Handlers borrow a connection through the
+# `get_db` dependency instead of opening their own, so the number of
+# Postgres backends is bounded by DB_POOL_MAX_SIZE x uvicorn workers.
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+
+# DB_MODE=async serves the /api/tests, /api/answers, /api/assignments and
+# /api/reports routes from async handlers on psycopg.AsyncConnection instead
+# of sync handlers running in the Starlette threadpool.
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+ASYNC_DB_MODE = DB_MODE == "async"
+
+# In async mode the sync pool only serves the routes that stay sync (login,
+# MCQ filters, candidates), so it gets a small budget of its own; the async
+# pool takes DB_POOL_MIN_SIZE/DB_POOL_MAX_SIZE. Backends per worker are then
+# DB_POOL_MAX_SIZE + DB_SYNC_POOL_MAX_SIZE.
+SYNC_DB_POOL_MIN_SIZE = int(os.getenv("DB_SYNC_POOL_MIN_SIZE", "1")) if ASYNC_DB_MODE else DB_POOL_MIN_SIZE
+SYNC_DB_POOL_MAX_SIZE = int(os.getenv("DB_SYNC_POOL_MAX_SIZE", "4")) if ASYNC_DB_MODE else DB_POOL_MAX_SIZE
+
+def get_db_kwargs() -> dict:
+    """Connection parameters shared by every pooled connection"""
+    return {
+        "dbname": os.getenv("POSTGRES_DB", "talentshire"),
+        "user": os.getenv("POSTGRES_USER", "talentshire"),
+        "password": os.getenv("POSTGRES_PASSWORD", "talentshire123"),
+        "host": os.getenv("POSTGRES_HOST", "localhost"),
+        "port": int(os.getenv("POSTGRES_PORT", "5432")),
+    }
+
+db_pool = ConnectionPool(
+    kwargs=get_db_kwargs(),
+    min_size=SYNC_DB_POOL_MIN_SIZE,
+    max_size=SYNC_DB_POOL_MAX_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    max_idle=DB_POOL_MAX_IDLE,
+    name="talentshire-backend",
+    open=False,
+)
+
+async_db_pool = AsyncConnectionPool(
+    kwargs=get_db_kwargs(),
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    max_idle=DB_POOL_MAX_IDLE,
+    name="talentshire-backend-async",
+    open=False,
+) if ASYNC_DB_MODE else None
+
+@app.on_event("startup")
+def open_db_pool():
+    db_pool.open()
+    logger.info(f"PostgreSQL pool opened (min={SYNC_DB_POOL_MIN_SIZE}, max={SYNC_DB_POOL_MAX_SIZE})")
+
+@app.on_event("startup")
+async def open_async_db_pool():
+    if async_db_pool is not None:
+        await async_db_pool.open()
+        logger.info(f"PostgreSQL async pool opened (min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE})")
+
+@app.on_event("shutdown")
+def close_db_pool():
+    db_pool.close()
+    logger.info("PostgreSQL pool closed")
+
+@app.on_event("shutdown")
+async def close_async_db_pool():
+    if async_db_pool is not None:
+        await async_db_pool.close()
+        logger.info("PostgreSQL async pool closed")
+
+def get_db():
+    """FastAPI dependency: borrow a pooled connection for the duration of a request.
+
+    The connection is always handed back to the pool, even when the handler
+    raises; the pool rolls back any transaction the handler left open.
+    """
+    try:
+        conn = db_pool.getconn()
+    except PoolTimeout:
+        logger.error(f"Timed out after {DB_POOL_TIMEOUT}s waiting for a PostgreSQL connection")
+        raise HTTPException(status_code=503, detail="Database busy, please retry")
+    except Exception as e:
+        logger.error(f"Error connecting to PostgreSQL: {e}")
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    try:
+        yield conn
+    finally:
+        db_pool.putconn(conn)
+
+async def get_async_db():
+    """Async counterpart of `get_db` used by the DB_MODE=async handlers."""
+    try:
+        conn = await async_db_pool.getconn()
+    except PoolTimeout:
+        logger.error(f"Timed out after {DB_POOL_TIMEOUT}s waiting for a PostgreSQL connection")
+        raise HTTPException(status_code=503, detail="Database busy, please retry")
     except Exception as e:
         logger.error(f"Error connecting to PostgreSQL: {e}")
         raise HTTPException(status_code=500, detail="Database connection failed")
+    try:
+        yield conn
+    finally:
+        await async_db_pool.putconn(conn)
+
+def get_db_pool_stats(pool) -> dict:
+    """Pool gauges and counters for /health"""
+    stats = pool.get_stats()
+    requests_num = stats.get("requests_num", 0)
+    return {
+        "min_size": stats.get("pool_min", pool.min_size),
+        "max_size": stats.get("pool_max", pool.max_size),
+        "size": stats.get("pool_size", 0),
+        "in_use": stats.get("pool_size", 0) - stats.get("pool_available", 0),
+        "available": stats.get("pool_available", 0),
+        "waiting": stats.get("requests_waiting", 0),
+        "requests": requests_num,
+        "requests_queued": stats.get("requests_queued", 0),
+        "avg_wait_ms": round(stats.get("requests_wait_ms", 0) / requests_num, 2) if requests_num else 0.0,
+        "timeouts": stats.get("requests_errors", 0),
+        "connections_errors": stats.get("connections_errors", 0),
+        "connections_lost": stats.get("connections_lost", 0),
+    }
 
 # ---------- Enums ----------
 class LanguageEnum(str, Enum):
@@ -211,7 +329,7 @@ def get_or_create_user(db_conn, email: str, name: str = None) -> tuple[uuid.UUID
         # Create new user
         user_id = uuid.uuid4()
         cur.execute(
-            "INSERT INTO users (user_id, full_name, email) VALUES (%s, %s, %s) RETURNING user_id;",
+            SQL_INSERT_USER,
             (user_id, name or email.split('@')[0], email)
         )
         created_id = cur.fetchone()[0]
@@ -222,6 +340,79 @@ def get_or_create_user(db_conn, email: str, name: str = None) -> tuple[uuid.UUID
         logger.error(f"Error getting/creating user: {e}")
         raise HTTPException(status_code=500, detail="Error managing user account")
 
+# ---------- SQL Statements ----------
+# Shared by the sync and async request paths.
+SQL_INSERT_TEST = """
+    INSERT INTO tests (test_id, test_name, description, created_by, duration_minutes, total_marks, passing_marks, status, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+    RETURNING test_id, test_name, description, duration_minutes, total_marks, passing_marks, status;
+"""
+SQL_INSERT_TEST_QUESTION = """
+    INSERT INTO test_questions (id, test_id, question_id, question_type, order_index)
+    VALUES (%s, %s, %s, %s, %s)
+    RETURNING id;
+"""
+SQL_SELECT_CANDIDATE = "SELECT candidate_id FROM candidates WHERE candidate_id = %s;"
+SQL_INSERT_CANDIDATE = "INSERT INTO candidates (candidate_id, email) VALUES (%s, %s);"
+SQL_INSERT_ASSIGNMENT = """
+    INSERT INTO test_assignments (assignment_id, test_id, candidate_id, status, assigned_at, scheduled_start_time, scheduled_end_time)
+    VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP, %s, %s)
+    RETURNING assignment_id;
+"""
+SQL_SELECT_ASSIGNMENTS_FOR_TEST = """
+    SELECT assignment_id, candidate_id, status, scheduled_start_time, scheduled_end_time
+    FROM test_assignments
+    WHERE test_id = %s;
+"""
+SQL_INSERT_ANSWER = """
+    INSERT INTO test_answers (
+        answer_id, assignment_id, question_id, question_type, selected_option,
+        code_submission, code_output, is_correct, score, time_spent_seconds,
+        code_analysis, ai_review_notes, language, stdin, stdout, code_status, code_passed
+    )
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    RETURNING answer_id;
+"""
+SQL_SELECT_ANY_USER = "SELECT user_id FROM users LIMIT 1;"
+SQL_INSERT_USER = "INSERT INTO users (user_id, full_name, email) VALUES (%s, %s, %s) RETURNING user_id;"
+SQL_LIST_TESTS = "SELECT test_id, test_name, duration_minutes, status, created_at FROM tests ORDER BY created_at DESC;"
+SQL_SELECT_TEST = "SELECT test_id, test_name, duration_minutes, status, created_at FROM tests WHERE test_id = %s"
+SQL_UPDATE_TEST = "UPDATE tests SET test_name = %s, duration_minutes = %s, status = %s WHERE test_id = %s RETURNING test_id, test_name, duration_minutes, status"
+SQL_PUBLISH_TEST = "UPDATE tests SET status = 'active' WHERE test_id = %s RETURNING test_id, status"
+SQL_START_ASSIGNMENT = "UPDATE test_assignments SET status = %s, started_at = CURRENT_TIMESTAMP WHERE assignment_id = %s RETURNING assignment_id, status;"
+SQL_END_ASSIGNMENT = "UPDATE test_assignments SET status = %s, submitted_at = CURRENT_TIMESTAMP WHERE assignment_id = %s RETURNING assignment_id, status, candidate_id, test_id;"
+SQL_SELECT_ASSIGNMENT = "SELECT assignment_id, test_id, candidate_id, status, scheduled_start_time, scheduled_end_time, started_at, submitted_at FROM test_assignments WHERE assignment_id = %s;"
+SQL_SELECT_TEST_MCQS = """
+    SELECT mq.question_id, mq.question_text, mq.option_a, mq.option_b, mq.option_c, mq.option_d,
+           mq.correct_answer, mq.difficulty, mq.marks
+    FROM test_questions tq
+    JOIN mcq_questions mq ON tq.question_id = mq.question_id
+    WHERE tq.test_id = %s AND tq.question_type = 'multiple_choice'
+    ORDER BY tq.order_index;
+"""
+SQL_SELECT_TEST_CODING = """
+    SELECT cq.question_id, cq.title, cq.description, cq.difficulty, cq.language, cq.marks
+    FROM test_questions tq
+    JOIN coding_questions cq ON tq.question_id = cq.question_id
+    WHERE tq.test_id = %s AND tq.question_type = 'coding'
+    ORDER BY tq.order_index;
+"""
+SQL_SELECT_TEST_META = "SELECT test_id, test_name, duration_minutes, status FROM tests WHERE test_id = %s;"
+SQL_SELECT_ANSWERS = "SELECT answer_id, assignment_id, question_id, question_type, selected_option, code_submission, code_output, score FROM test_answers WHERE assignment_id = %s;"
+SQL_SELECT_ASSIGNMENT_TIMES = "SELECT test_id, candidate_id, started_at, submitted_at FROM test_assignments WHERE assignment_id = %s;"
+SQL_SELECT_TEST_NAME = "SELECT test_name FROM tests WHERE test_id = %s;"
+SQL_SUMMARIZE_ANSWERS = "SELECT COUNT(*), SUM(CASE WHEN is_correct_mcq THEN 1 ELSE 0 END), SUM(score) FROM test_answers WHERE assignment_id = %s;"
+SQL_INSERT_REPORT = """
+    INSERT INTO candidate_reports (report_id, candidate_id, test_id, total_score, total_max, percentage, duration_seconds, status, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+    RETURNING report_id;
+"""
+SQL_SELECT_REPORT = """
+    SELECT report_id, candidate_id, test_id, total_score, total_max, percentage, duration_seconds, status, created_at
+    FROM candidate_reports
+    WHERE report_id = %s;
+"""
+
 # ---------- Service Functions ----------
 # ---- Test Storage Service (Ishaan) ----
 def create_test(db_conn, test: TestCreate, created_by: uuid.UUID):
@@ -230,11 +421,7 @@ def create_test(db_conn, test: TestCreate, created_by: uuid.UUID):
         # Ensure status is lowercase for the enum
         status = (test.status or "draft").lower()
         test_id = uuid.uuid4()
-        cur.execute("""
-            INSERT INTO tests (test_id, test_name, description, created_by, duration_minutes, total_marks, passing_marks, status, created_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
-            RETURNING test_id, test_name, description, duration_minutes, total_marks, passing_marks, status;
-        """, (test_id, test.test_name, test.description, created_by, test.duration_minutes, test.total_marks, test.passing_marks, status))
+        cur.execute(SQL_INSERT_TEST, (test_id, test.test_name, test.description, created_by, test.duration_minutes, test.total_marks, test.passing_marks, status))
         row = cur.fetchone()
         db_conn.commit()
         cur.close()
@@ -255,11 +442,7 @@ def create_test(db_conn, test: TestCreate, created_by: uuid.UUID):
 def create_test_question(db_conn, test_id: uuid.UUID, test_question: TestQuestionCreate):
     try:
         cur = db_conn.cursor()
-        cur.execute("""
-            INSERT INTO test_questions (id, test_id, question_id, question_type, order_index)
-            VALUES (%s, %s, %s, %s, %s)
-            RETURNING id;
-        """, (uuid.uuid4(), test_id, test_question.question_id, test_question.question_type.value, test_question.order_index))
+        cur.execute(SQL_INSERT_TEST_QUESTION, (uuid.uuid4(), test_id, test_question.question_id, test_question.question_type.value, test_question.order_index))
         question_id = cur.fetchone()[0]
         db_conn.commit()
         cur.close()
@@ -273,18 +456,14 @@ def assign_test_to_candidate(db_conn, assignment: TestAssignmentCreate):
     try:
         cur = db_conn.cursor()
         # Ensure candidate exists; create if needed
-        cur.execute("SELECT candidate_id FROM candidates WHERE candidate_id = %s;", (assignment.candidate_id,))
+        cur.execute(SQL_SELECT_CANDIDATE, (assignment.candidate_id,))
         if not cur.fetchone():
             cur.execute(
-                "INSERT INTO candidates (candidate_id, email) VALUES (%s, %s);",
+                SQL_INSERT_CANDIDATE,
                 (assignment.candidate_id, f"candidate-{assignment.candidate_id}@local")
             )
         
-        cur.execute("""
-            INSERT INTO test_assignments (assignment_id, test_id, candidate_id, status, assigned_at, scheduled_start_time, scheduled_end_time)
-            VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP, %s, %s)
-            RETURNING assignment_id;
-        """, (uuid.uuid4(), assignment.test_id, assignment.candidate_id, "ASSIGNED", assignment.scheduled_start_time, assignment.scheduled_end_time))
+        cur.execute(SQL_INSERT_ASSIGNMENT, (uuid.uuid4(), assignment.test_id, assignment.candidate_id, "ASSIGNED", assignment.scheduled_start_time, assignment.scheduled_end_time))
         assignment_id = cur.fetchone()[0]
         db_conn.commit()
         cur.close()
@@ -296,11 +475,7 @@ def assign_test_to_candidate(db_conn, assignment: TestAssignmentCreate):
 def get_assignments_for_test(db_conn, test_id: uuid.UUID):
     try:
         cur = db_conn.cursor()
-        cur.execute("""
-            SELECT assignment_id, candidate_id, status, scheduled_start_time, scheduled_end_time
-            FROM test_assignments
-            WHERE test_id = %s;
-        """, (test_id,))
+        cur.execute(SQL_SELECT_ASSIGNMENTS_FOR_TEST, (test_id,))
         rows = cur.fetchall()
         cur.close()
         return [{"assignment_id": r[0], "candidate_id": r[1], "status": r[2],
@@ -313,15 +488,7 @@ def get_assignments_for_test(db_conn, test_id: uuid.UUID):
 def submit_test_answer(db_conn, answer: TestAnswerCreate):
     try:
         cur = db_conn.cursor()
-        cur.execute("""
-            INSERT INTO test_answers (
-                answer_id, assignment_id, question_id, question_type, selected_option,
-                code_submission, code_output, is_correct, score, time_spent_seconds,
-                code_analysis, ai_review_notes, language, stdin, stdout, code_status, code_passed
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING answer_id;
-        """, (
+        cur.execute(SQL_INSERT_ANSWER, (
             uuid.uuid4(), answer.assignment_id, answer.question_id, answer.question_type.value,
             answer.selected_option, answer.code_submission, answer.code_output, answer.is_correct,
             answer.score, answer.time_spent_seconds, answer.code_analysis, answer.ai_review_notes,
@@ -336,10 +503,9 @@ def submit_test_answer(db_conn, answer: TestAnswerCreate):
         raise HTTPException(status_code=500, detail="Error submitting test answer")
 
 # ---- MCQ Filter Service ----
-def fetch_mcqs(language: str, difficulty: str):
+def fetch_mcqs(db_conn, language: str, difficulty: str):
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        cur = db_conn.cursor()
         cur.execute("""
             SELECT mcq_id, question_text, option_a, option_b, option_c, option_d, correct_answer
             FROM mcq_questions
@@ -349,25 +515,256 @@ def fetch_mcqs(language: str, difficulty: str):
         rows = cur.fetchall()
         mcqs = [{"mcq_id": r[0], "question_text": r[1], "option_a": r[2], "option_b": r[3], "option_c": r[4], "option_d": r[5], "correct_answer": r[6]} for r in rows]
         cur.close()
-        conn.close()
         return mcqs
     except Exception as e:
         logger.error(f"Error fetching MCQs: {e}")
         raise HTTPException(status_code=500, detail="Error fetching MCQs")
 
+# ---------- Row Serializers ----------
+# Shared by the sync and async request paths.
+def serialize_test_row(r) -> dict:
+    return {"test_id": str(r[0]), "test_name": r[1], "duration_minutes": r[2], "status": r[3], "created_at": r[4].isoformat() if r[4] else None}
+
+def serialize_assignment_row(row) -> dict:
+    return {
+        "assignment_id": str(row[0]),
+        "test_id": str(row[1]),
+        "candidate_id": str(row[2]),
+        "status": row[3],
+        "scheduled_start_time": row[4].isoformat() if row[4] else None,
+        "scheduled_end_time": row[5].isoformat() if row[5] else None,
+        "started_at": row[6].isoformat() if row[6] else None,
+        "submitted_at": row[7].isoformat() if row[7] else None,
+    }
+
+def serialize_test_questions(test_row, mcq_rows, coding_rows) -> dict:
+    mcq_questions = [
+        {
+            "question_id": str(r[0]),
+            "question_text": r[1],
+            "option_a": r[2],
+            "option_b": r[3],
+            "option_c": r[4],
+            "option_d": r[5],
+            "correct_answer": r[6],
+            "difficulty": r[7],
+            "marks": r[8],
+        }
+        for r in mcq_rows
+    ]
+
+    coding_questions = [
+        {
+            "question_id": str(r[0]),
+            "title": r[1],
+            "description": r[2],
+            "difficulty": r[3],
+            "language": r[4],
+            "marks": r[5],
+        }
+        for r in coding_rows
+    ]
+
+    return {
+        "test_id": str(test_row[0]),
+        "test_name": test_row[1],
+        "duration_minutes": test_row[2],
+        "status": test_row[3],
+        "mcq_questions": mcq_questions,
+        "coding_questions": coding_questions,
+    }
+
+def serialize_answer_row(r) -> dict:
+    return {
+        "answer_id": str(r[0]),
+        "assignment_id": str(r[1]),
+        "question_id": str(r[2]),
+        "question_type": r[3],
+        "selected_option": r[4],
+        "code_submission": r[5],
+        "code_output": r[6],
+        "score": r[7],
+    }
+
+def serialize_report_row(row) -> dict:
+    return {
+        "report_id": str(row[0]),
+        "candidate_id": str(row[1]),
+        "test_id": str(row[2]),
+        "total_score": row[3],
+        "total_max": row[4],
+        "percentage": row[5],
+        "duration_seconds": row[6],
+        "status": row[7],
+        "created_at": row[8].isoformat() if row[8] else None,
+    }
+
+def summarize_answers(answer_row) -> tuple:
+    """Return (total_answers, correct_answers, total_score, percentage) for a report"""
+    total_answers = answer_row[0] or 0
+    correct_answers = answer_row[1] or 0
+    total_score = answer_row[2] or 0
+    percentage = (total_score / max(total_answers, 1)) * 100 if total_answers > 0 else 0
+    return total_answers, correct_answers, total_score, percentage
+
+# ---------- Test Bundles ----------
+# GET /api/tests/{test_id}/questions returns the same payload to every
+# candidate of a test, so it is built once and kept as serialized JSON bytes
+# with an ETag. Publishing a test builds its bundle; otherwise the first
+# request builds it, with concurrent requests for the same test waiting on
+# that one build. Only active (published) tests are kept, for
+# TEST_BUNDLE_TTL_S, which bounds how stale another worker's copy can be
+# after an edit. Edits made through this worker drop its copy at once and
+# bump test_bundle_generation, so a build that was already reading the old
+# rows returns its bundle but does not cache it.
+TEST_BUNDLE_TTL_S = float(os.getenv("TEST_BUNDLE_TTL_S", "300"))
+
+class TestBundle:
+    __slots__ = ("body", "etag", "expires_at")
+
+    def __init__(self, payload: dict):
+        self.body = json.dumps({"success": True, "data": jsonable_encoder(payload)}, separators=(",", ":")).encode("utf-8")
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.expires_at = time.monotonic() + TEST_BUNDLE_TTL_S
+
+test_bundles: Dict[str, TestBundle] = {}
+test_bundle_builds = 0
+test_bundle_generation = 0
+# Build locks exist only while a build for that test is running or awaited
+_bundle_locks: Dict[str, threading.Lock] = {}
+_bundle_locks_guard = threading.Lock()
+_async_bundle_locks: Dict[str, asyncio.Lock] = {}
+
+def get_cached_test_bundle(test_id) -> Optional[TestBundle]:
+    bundle = test_bundles.get(str(test_id))
+    if bundle and bundle.expires_at > time.monotonic():
+        return bundle
+    return None
+
+def invalidate_test_bundle(test_id):
+    global test_bundle_generation
+    with _bundle_locks_guard:
+        test_bundles.pop(str(test_id), None)
+        test_bundle_generation += 1
+
+def make_test_bundle(test_id, test_row, mcq_rows, coding_rows, generation: int) -> Optional[TestBundle]:
+    """Serialize a test's questions; keep the bundle if the test is published and
+    nothing was invalidated since `generation` was read, before the rows were"""
+    global test_bundle_builds
+    if not test_row:
+        return None
+    bundle = TestBundle(serialize_test_questions(test_row, mcq_rows, coding_rows))
+    with _bundle_locks_guard:
+        test_bundle_builds += 1
+        if (test_row[3] or "").lower() != "active":
+            test_bundles.pop(str(test_id), None)
+        elif generation == test_bundle_generation:
+            test_bundles[str(test_id)] = bundle
+    return bundle
+
+def build_test_bundle(conn, test_id) -> Optional[TestBundle]:
+    generation = test_bundle_generation
+    cur = conn.cursor()
+    cur.execute(SQL_SELECT_TEST_MCQS, (test_id,))
+    mcq_rows = cur.fetchall()
+    cur.execute(SQL_SELECT_TEST_CODING, (test_id,))
+    coding_rows = cur.fetchall()
+    cur.execute(SQL_SELECT_TEST_META, (test_id,))
+    test_row = cur.fetchone()
+    cur.close()
+    return make_test_bundle(test_id, test_row, mcq_rows, coding_rows, generation)
+
+async def build_test_bundle_async(conn, test_id) -> Optional[TestBundle]:
+    generation = test_bundle_generation
+    async with conn.cursor() as cur:
+        await cur.execute(SQL_SELECT_TEST_MCQS, (test_id,))
+        mcq_rows = await cur.fetchall()
+        await cur.execute(SQL_SELECT_TEST_CODING, (test_id,))
+        coding_rows = await cur.fetchall()
+        await cur.execute(SQL_SELECT_TEST_META, (test_id,))
+        test_row = await cur.fetchone()
+    return make_test_bundle(test_id, test_row, mcq_rows, coding_rows, generation)
+
+def get_test_bundle(test_id) -> Optional[TestBundle]:
+    """Cached bundle, or one built under the test's lock; a connection is borrowed only to build"""
+    bundle = get_cached_test_bundle(test_id)
+    if bundle:
+        return bundle
+    key = str(test_id)
+    with _bundle_locks_guard:
+        lock = _bundle_locks.setdefault(key, threading.Lock())
+    with lock:
+        try:
+            bundle = get_cached_test_bundle(test_id)
+            if bundle:
+                return bundle
+            with contextmanager(get_db)() as conn:
+                return build_test_bundle(conn, test_id)
+        finally:
+            # Requests already waiting on this lock find the bundle cached
+            with _bundle_locks_guard:
+                if _bundle_locks.get(key) is lock:
+                    del _bundle_locks[key]
+
+async def get_test_bundle_async(test_id) -> Optional[TestBundle]:
+    bundle = get_cached_test_bundle(test_id)
+    if bundle:
+        return bundle
+    key = str(test_id)
+    lock = _async_bundle_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        try:
+            bundle = get_cached_test_bundle(test_id)
+            if bundle:
+                return bundle
+            async with asynccontextmanager(get_async_db)() as conn:
+                return await build_test_bundle_async(conn, test_id)
+        finally:
+            if _async_bundle_locks.get(key) is lock:
+                del _async_bundle_locks[key]
+
+def test_bundle_response(bundle: TestBundle, if_none_match: Optional[str]) -> Response:
+    headers = {"ETag": bundle.etag, "Cache-Control": "no-cache"}
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if bundle.etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(content=bundle.body, media_type="application/json", headers=headers)
+
+# ---------- Problem Service ----------
+# The problem service caches a candidate's access to a test's problems; ending
+# an assignment tells it to drop that entry instead of waiting for the TTL.
+PROBLEM_SERVICE_URL = os.getenv("PROBLEM_SERVICE_URL", "").rstrip("/")
+
+def notify_assignment_ended(candidate_id, test_id):
+    """Run as a background task, after the response; failures only cost the cache TTL"""
+    if not PROBLEM_SERVICE_URL:
+        return
+    query = urllib.parse.urlencode({"candidate_id": str(candidate_id), "test_id": str(test_id)})
+    request = urllib.request.Request(f"{PROBLEM_SERVICE_URL}/candidate/authorization?{query}", method="DELETE")
+    try:
+        with urllib.request.urlopen(request, timeout=2):
+            pass
+    except Exception as e:
+        logger.warning(f"Could not invalidate problem access for candidate {candidate_id}, test {test_id}: {e}")
+
 # ---------- FastAPI Endpoints ----------
+sync_router = APIRouter()
 
 # ---- Health Check ----
 @app.get("/health")
 def health_check():
-    """Simple health check endpoint"""
-    return {"status": "ok", "service": "talentshire-backend"}
+    """Simple health check endpoint, including PostgreSQL pool metrics"""
+    health = {"status": "ok", "service": "talentshire-backend", "db_mode": DB_MODE, "db_pool": get_db_pool_stats(db_pool),
+              "test_bundles": {"cached": len(test_bundles), "builds": test_bundle_builds}}
+    if async_db_pool is not None:
+        health["async_db_pool"] = get_db_pool_stats(async_db_pool)
+    return health
 
 # ---- Auth Endpoints ----
 @app.post("/api/auth/login", status_code=200)
-def login_endpoint(request: LoginRequest):
+def login_endpoint(request: LoginRequest, conn: psycopg.Connection = Depends(get_db)):
     """Simple login endpoint - accepts demo credentials and creates JWT token"""
-    conn = get_db_connection()
     try:
         # Get or create user
         user_id, email = get_or_create_user(conn, request.email, request.email.split('@')[0])
@@ -391,8 +788,6 @@ def login_endpoint(request: LoginRequest):
     except Exception as e:
         logger.error(f"Login error: {e}")
         return {"success": False, "error": "Login failed"}
-    finally:
-        conn.close()
 
 @app.post("/api/auth/token-login", status_code=200)
 def token_login_endpoint(request: TokenLoginRequest):
@@ -443,19 +838,18 @@ def refresh_token_endpoint():
 
 # --- UNIFIED API ROUTES (all use /api prefix) ---
 
-@app.post("/api/tests", status_code=201)
-def create_test_api(test: TestCreate):
-    conn = get_db_connection()
+@sync_router.post("/api/tests", status_code=201)
+def create_test_api(test: TestCreate, conn: psycopg.Connection = Depends(get_db)):
     try:
         cur = conn.cursor()
-        cur.execute("SELECT user_id FROM users LIMIT 1;")
+        cur.execute(SQL_SELECT_ANY_USER)
         row = cur.fetchone()
         if row:
             created_by = row[0]
         else:
             system_id = uuid.uuid4()
             cur.execute(
-                "INSERT INTO users (user_id, full_name, email) VALUES (%s, %s, %s) RETURNING user_id;",
+                SQL_INSERT_USER,
                 (system_id, 'System User', 'system@local')
             )
             created_by = cur.fetchone()[0]
@@ -469,50 +863,45 @@ def create_test_api(test: TestCreate):
     return {"success": True, "data": result}
 
 
-@app.get("/api/tests")
-def list_tests_api():
+@sync_router.get("/api/tests")
+def list_tests_api(conn: psycopg.Connection = Depends(get_db)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("SELECT test_id, test_name, duration_minutes, status, created_at FROM tests ORDER BY created_at DESC;")
+        cur.execute(SQL_LIST_TESTS)
         rows = cur.fetchall()
         cur.close()
-        conn.close()
-        data = [{"test_id": str(r[0]), "test_name": r[1], "duration_minutes": r[2], "status": r[3], "created_at": r[4].isoformat() if r[4] else None} for r in rows]
+        data = [serialize_test_row(r) for r in rows]
         return {"success": True, "data": data}
     except Exception as e:
         logger.error(f"Error listing tests: {e}")
         return {"success": False, "error": "Error listing tests"}
 
 
-@app.get("/api/tests/{test_id}")
-def get_test_api(test_id: uuid.UUID):
+@sync_router.get("/api/tests/{test_id}")
+def get_test_api(test_id: uuid.UUID, conn: psycopg.Connection = Depends(get_db)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("SELECT test_id, test_name, duration_minutes, status, created_at FROM tests WHERE test_id = %s", (test_id,))
+        cur.execute(SQL_SELECT_TEST, (test_id,))
         row = cur.fetchone()
         cur.close()
-        conn.close()
         if not row:
             return {"success": False, "error": "Test not found"}
-        return {"success": True, "data": {"test_id": str(row[0]), "test_name": row[1], "duration_minutes": row[2], "status": row[3], "created_at": row[4].isoformat() if row[4] else None}}
+        return {"success": True, "data": serialize_test_row(row)}
     except Exception as e:
         logger.error(f"Error fetching test: {e}")
         return {"success": False, "error": "Error fetching test"}
 
 
-@app.put("/api/tests/{test_id}")
-def update_test_api(test_id: uuid.UUID, test: TestCreate):
+@sync_router.put("/api/tests/{test_id}")
+def update_test_api(test_id: uuid.UUID, test: TestCreate, conn: psycopg.Connection = Depends(get_db)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("UPDATE tests SET test_name = %s, duration_minutes = %s, status = %s WHERE test_id = %s RETURNING test_id, test_name, duration_minutes, status",
+        cur.execute(SQL_UPDATE_TEST,
                 (test.test_name, test.duration_minutes, (test.status or "draft"), test_id))
         row = cur.fetchone()
         conn.commit()
         cur.close()
-        conn.close()
+        invalidate_test_bundle(test_id)
         if not row:
             raise HTTPException(status_code=404, detail="Test not found for update")
         return {"success": True, "data": {"test_id": str(row[0]), "test_name": row[1], "duration_minutes": row[2], "status": row[3]}}
@@ -523,18 +912,22 @@ def update_test_api(test_id: uuid.UUID, test: TestCreate):
         raise HTTPException(status_code=500, detail="Error updating test")
 
 
-@app.patch("/api/tests/{test_id}/publish")
-def publish_test_api(test_id: uuid.UUID):
+@sync_router.patch("/api/tests/{test_id}/publish")
+def publish_test_api(test_id: uuid.UUID, conn: psycopg.Connection = Depends(get_db)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("UPDATE tests SET status = 'active' WHERE test_id = %s RETURNING test_id, status", (test_id,))
+        cur.execute(SQL_PUBLISH_TEST, (test_id,))
         row = cur.fetchone()
         conn.commit()
         cur.close()
-        conn.close()
         if not row:
             raise HTTPException(status_code=404, detail="Test not found to publish")
+        try:
+            build_test_bundle(conn, test_id)
+        except Exception as e:
+            # Not fatal: the first exam start builds it instead
+            invalidate_test_bundle(test_id)
+            logger.warning(f"Error building bundle for published test {test_id}: {e}")
         return {"success": True, "data": {"test_id": str(row[0]), "status": row[1]}}
     except HTTPException:
         raise
@@ -544,14 +937,12 @@ def publish_test_api(test_id: uuid.UUID):
 
 
 @app.get("/api/candidates/{candidate_id}/assignments")
-def get_candidate_assignments_api(candidate_id: uuid.UUID):
+def get_candidate_assignments_api(candidate_id: uuid.UUID, conn: psycopg.Connection = Depends(get_db)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
         cur.execute("SELECT assignment_id, test_id, status, scheduled_start_time, scheduled_end_time FROM test_assignments WHERE candidate_id = %s ORDER BY assigned_at DESC", (candidate_id,))
         rows = cur.fetchall()
         cur.close()
-        conn.close()
         data = [{"assignment_id": str(r[0]), "test_id": str(r[1]), "status": r[2], "scheduled_start_time": r[3].isoformat() if r[3] else None, "scheduled_end_time": r[4].isoformat() if r[4] else None} for r in rows]
         return {"success": True, "data": data}
     except Exception as e:
@@ -559,55 +950,50 @@ def get_candidate_assignments_api(candidate_id: uuid.UUID):
         raise HTTPException(status_code=500, detail="Error fetching assignments")
 
 
-@app.post("/api/tests/{test_id}/questions", status_code=201)
-def create_test_question_api(test_id: uuid.UUID, question: TestQuestionCreate):
-    conn = get_db_connection()
+@sync_router.post("/api/tests/{test_id}/questions", status_code=201)
+def create_test_question_api(test_id: uuid.UUID, question: TestQuestionCreate, conn: psycopg.Connection = Depends(get_db)):
     result = create_test_question(conn, test_id, question)
+    invalidate_test_bundle(test_id)
     return {"success": True, "data": result}
 
 
-@app.post("/api/assignments", status_code=201)
-def assign_test_api(assignment: TestAssignmentCreate):
-    conn = get_db_connection()
+@sync_router.post("/api/assignments", status_code=201)
+def assign_test_api(assignment: TestAssignmentCreate, conn: psycopg.Connection = Depends(get_db)):
     result = assign_test_to_candidate(conn, assignment)
     return {"success": True, "data": result}
 
 
-@app.get("/api/assignments/{test_id}")
-def get_assignments_api(test_id: uuid.UUID):
-    conn = get_db_connection()
+@sync_router.get("/api/assignments/{test_id}")
+def get_assignments_api(test_id: uuid.UUID, conn: psycopg.Connection = Depends(get_db)):
     result = get_assignments_for_test(conn, test_id)
     return {"success": True, "data": result}
 
 
-@app.post("/api/answers", status_code=201)
-def submit_answer_api(answer: TestAnswerCreate):
-    conn = get_db_connection()
+@sync_router.post("/api/answers", status_code=201)
+def submit_answer_api(answer: TestAnswerCreate, conn: psycopg.Connection = Depends(get_db)):
     result = submit_test_answer(conn, answer)
     return {"success": True, "data": result}
 
 
 @app.post("/api/filter_mcqs")
-def filter_mcqs_api(filters: FilterRequest):
-    mcqs = fetch_mcqs(filters.language.value, filters.difficulty_level.value)
+def filter_mcqs_api(filters: FilterRequest, conn: psycopg.Connection = Depends(get_db)):
+    mcqs = fetch_mcqs(conn, filters.language.value, filters.difficulty_level.value)
     if not mcqs:
         raise HTTPException(status_code=404, detail="No MCQs found with these filters.")
     return {"success": True, "data": mcqs}
 
 # ---- Assignment Management ----
-@app.patch("/api/assignments/{assignment_id}/start")
-def start_assignment_endpoint(assignment_id: uuid.UUID):
+@sync_router.patch("/api/assignments/{assignment_id}/start")
+def start_assignment_endpoint(assignment_id: uuid.UUID, conn: psycopg.Connection = Depends(get_db)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
         cur.execute(
-            "UPDATE test_assignments SET status = %s, started_at = CURRENT_TIMESTAMP WHERE assignment_id = %s RETURNING assignment_id, status;",
+            SQL_START_ASSIGNMENT,
             ("STARTED", assignment_id)
         )
         row = cur.fetchone()
         conn.commit()
         cur.close()
-        conn.close()
         if not row:
             raise HTTPException(status_code=404, detail="Assignment not found")
         return {"success": True, "data": {"assignment_id": str(row[0]), "status": row[1]}}
@@ -617,21 +1003,20 @@ def start_assignment_endpoint(assignment_id: uuid.UUID):
         logger.error(f"Error starting assignment: {e}")
         return {"success": False, "error": "Error starting assignment"}
 
-@app.patch("/api/assignments/{assignment_id}/end")
-def end_assignment_endpoint(assignment_id: uuid.UUID):
+@sync_router.patch("/api/assignments/{assignment_id}/end")
+def end_assignment_endpoint(assignment_id: uuid.UUID, background_tasks: BackgroundTasks, conn: psycopg.Connection = Depends(get_db)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
         cur.execute(
-            "UPDATE test_assignments SET status = %s, submitted_at = CURRENT_TIMESTAMP WHERE assignment_id = %s RETURNING assignment_id, status;",
+            SQL_END_ASSIGNMENT,
             ("COMPLETED", assignment_id)
         )
         row = cur.fetchone()
         conn.commit()
         cur.close()
-        conn.close()
         if not row:
             raise HTTPException(status_code=404, detail="Assignment not found")
+        background_tasks.add_task(notify_assignment_ended, row[2], row[3])
         return {"success": True, "data": {"assignment_id": str(row[0]), "status": row[1]}}
     except HTTPException:
         raise
@@ -639,33 +1024,19 @@ def end_assignment_endpoint(assignment_id: uuid.UUID):
         logger.error(f"Error ending assignment: {e}")
         return {"success": False, "error": "Error ending assignment"}
 
-@app.get("/api/assignments/{assignment_id}")
-def get_assignment_endpoint(assignment_id: uuid.UUID):
+@sync_router.get("/api/assignments/{assignment_id}")
+def get_assignment_endpoint(assignment_id: uuid.UUID, conn: psycopg.Connection = Depends(get_db)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
         cur.execute(
-            "SELECT assignment_id, test_id, candidate_id, status, scheduled_start_time, scheduled_end_time, started_at, submitted_at FROM test_assignments WHERE assignment_id = %s;",
+            SQL_SELECT_ASSIGNMENT,
             (assignment_id,)
         )
         row = cur.fetchone()
         cur.close()
-        conn.close()
         if not row:
             raise HTTPException(status_code=404, detail="Assignment not found")
-        return {
-            "success": True,
-            "data": {
-                "assignment_id": str(row[0]),
-                "test_id": str(row[1]),
-                "candidate_id": str(row[2]),
-                "status": row[3],
-                "scheduled_start_time": row[4].isoformat() if row[4] else None,
-                "scheduled_end_time": row[5].isoformat() if row[5] else None,
-                "started_at": row[6].isoformat() if row[6] else None,
-                "submitted_at": row[7].isoformat() if row[7] else None,
-            }
-        }
+        return {"success": True, "data": serialize_assignment_row(row)}
     except HTTPException:
         raise
     except Exception as e:
@@ -673,83 +1044,13 @@ def get_assignment_endpoint(assignment_id: uuid.UUID):
         return {"success": False, "error": "Error fetching assignment"}
 
 # ---- Test Questions ----
-@app.get("/api/tests/{test_id}/questions")
-def get_test_questions_endpoint(test_id: uuid.UUID):
+@sync_router.get("/api/tests/{test_id}/questions")
+def get_test_questions_endpoint(test_id: uuid.UUID, if_none_match: Optional[str] = Header(None)):
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Fetch MCQ questions for this test
-        cur.execute("""
-            SELECT mq.question_id, mq.question_text, mq.option_a, mq.option_b, mq.option_c, mq.option_d,
-                   mq.correct_answer, mq.difficulty, mq.marks
-            FROM test_questions tq
-            JOIN mcq_questions mq ON tq.question_id = mq.question_id
-            WHERE tq.test_id = %s AND tq.question_type = 'multiple_choice'
-            ORDER BY tq.order_index;
-        """, (test_id,))
-        mcq_rows = cur.fetchall()
-        
-        # Fetch coding questions for this test
-        cur.execute("""
-            SELECT cq.question_id, cq.title, cq.description, cq.difficulty, cq.language, cq.marks
-            FROM test_questions tq
-            JOIN coding_questions cq ON tq.question_id = cq.question_id
-            WHERE tq.test_id = %s AND tq.question_type = 'coding'
-            ORDER BY tq.order_index;
-        """, (test_id,))
-        coding_rows = cur.fetchall()
-        
-        # Fetch test metadata
-        cur.execute(
-            "SELECT test_id, test_name, duration_minutes, status FROM tests WHERE test_id = %s;",
-            (test_id,)
-        )
-        test_row = cur.fetchone()
-        cur.close()
-        conn.close()
-        
-        if not test_row:
+        bundle = get_test_bundle(test_id)
+        if not bundle:
             raise HTTPException(status_code=404, detail="Test not found")
-        
-        mcq_questions = [
-            {
-                "question_id": str(r[0]),
-                "question_text": r[1],
-                "option_a": r[2],
-                "option_b": r[3],
-                "option_c": r[4],
-                "option_d": r[5],
-                "correct_answer": r[6],
-                "difficulty": r[7],
-                "marks": r[8],
-            }
-            for r in mcq_rows
-        ]
-        
-        coding_questions = [
-            {
-                "question_id": str(r[0]),
-                "title": r[1],
-                "description": r[2],
-                "difficulty": r[3],
-                "language": r[4],
-                "marks": r[5],
-            }
-            for r in coding_rows
-        ]
-        
-        return {
-            "success": True,
-            "data": {
-                "test_id": str(test_row[0]),
-                "test_name": test_row[1],
-                "duration_minutes": test_row[2],
-                "status": test_row[3],
-                "mcq_questions": mcq_questions,
-                "coding_questions": coding_questions,
-            }
-        }
+        return test_bundle_response(bundle, if_none_match)
     except HTTPException:
         raise
     except Exception as e:
@@ -757,32 +1058,18 @@ def get_test_questions_endpoint(test_id: uuid.UUID):
         return {"success": False, "error": "Error fetching test questions"}
 
 # ---- Answers ----
-@app.get("/api/assignments/{assignment_id}/answers")
-def get_assignment_answers_endpoint(assignment_id: uuid.UUID):
+@sync_router.get("/api/assignments/{assignment_id}/answers")
+def get_assignment_answers_endpoint(assignment_id: uuid.UUID, conn: psycopg.Connection = Depends(get_db)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
         cur.execute(
-            "SELECT answer_id, assignment_id, question_id, question_type, selected_option, code_submission, code_output, score FROM test_answers WHERE assignment_id = %s;",
+            SQL_SELECT_ANSWERS,
             (assignment_id,)
         )
         rows = cur.fetchall()
         cur.close()
-        conn.close()
         
-        answers = [
-            {
-                "answer_id": str(r[0]),
-                "assignment_id": str(r[1]),
-                "question_id": str(r[2]),
-                "question_type": r[3],
-                "selected_option": r[4],
-                "code_submission": r[5],
-                "code_output": r[6],
-                "score": r[7],
-            }
-            for r in rows
-        ]
+        answers = [serialize_answer_row(r) for r in rows]
         
         return {"success": True, "data": answers}
     except Exception as e:
@@ -790,15 +1077,14 @@ def get_assignment_answers_endpoint(assignment_id: uuid.UUID):
         return {"success": False, "error": "Error fetching answers"}
 
 # ---- Reports ----
-@app.post("/api/reports/{assignment_id}/generate")
-def generate_report_endpoint(assignment_id: uuid.UUID):
+@sync_router.post("/api/reports/{assignment_id}/generate")
+def generate_report_endpoint(assignment_id: uuid.UUID, conn: psycopg.Connection = Depends(get_db)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
         
         # Get assignment info
         cur.execute(
-            "SELECT test_id, candidate_id, started_at, submitted_at FROM test_assignments WHERE assignment_id = %s;",
+            SQL_SELECT_ASSIGNMENT_TIMES,
             (assignment_id,)
         )
         assign_row = cur.fetchone()
@@ -808,7 +1094,7 @@ def generate_report_endpoint(assignment_id: uuid.UUID):
         test_id, candidate_id, started_at, submitted_at = assign_row
         
         # Get test info
-        cur.execute("SELECT test_name FROM tests WHERE test_id = %s;", (test_id,))
+        cur.execute(SQL_SELECT_TEST_NAME, (test_id,))
         test_row = cur.fetchone()
         test_name = test_row[0] if test_row else "Unknown Test"
         
@@ -819,27 +1105,18 @@ def generate_report_endpoint(assignment_id: uuid.UUID):
         
         # Get all answers for assignment
         cur.execute(
-            "SELECT COUNT(*), SUM(CASE WHEN is_correct_mcq THEN 1 ELSE 0 END), SUM(score) FROM test_answers WHERE assignment_id = %s;",
+            SQL_SUMMARIZE_ANSWERS,
             (assignment_id,)
         )
         answer_row = cur.fetchone()
-        total_answers = answer_row[0] or 0
-        correct_answers = answer_row[1] or 0
-        total_score = answer_row[2] or 0
-        
-        percentage = (total_score / max(total_answers, 1)) * 100 if total_answers > 0 else 0
+        total_answers, correct_answers, total_score, percentage = summarize_answers(answer_row)
         
         # Create report record
         report_id = uuid.uuid4()
-        cur.execute("""
-            INSERT INTO candidate_reports (report_id, candidate_id, test_id, total_score, total_max, percentage, duration_seconds, status, created_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
-            RETURNING report_id;
-        """, (report_id, candidate_id, test_id, total_score, total_answers, percentage, duration_seconds, "completed"))
+        cur.execute(SQL_INSERT_REPORT, (report_id, candidate_id, test_id, total_score, total_answers, percentage, duration_seconds, "completed"))
         
         conn.commit()
         cur.close()
-        conn.close()
         
         return {
             "success": True,
@@ -860,39 +1137,338 @@ def generate_report_endpoint(assignment_id: uuid.UUID):
         logger.error(f"Error generating report: {e}")
         return {"success": False, "error": f"Error generating report: {str(e)}"}
 
-@app.get("/api/reports/{report_id}")
-def fetch_report_endpoint(report_id: uuid.UUID):
+@sync_router.get("/api/reports/{report_id}")
+def fetch_report_endpoint(report_id: uuid.UUID, conn: psycopg.Connection = Depends(get_db)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("""
-            SELECT report_id, candidate_id, test_id, total_score, total_max, percentage, duration_seconds, status, created_at
-            FROM candidate_reports
-            WHERE report_id = %s;
-        """, (report_id,))
+        cur.execute(SQL_SELECT_REPORT, (report_id,))
         row = cur.fetchone()
         cur.close()
-        conn.close()
         
         if not row:
             raise HTTPException(status_code=404, detail="Report not found")
         
+        return {"success": True, "data": serialize_report_row(row)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching report: {e}")
+        return {"success": False, "error": "Error fetching report"}
+
+# ---------- Async Request Path (DB_MODE=async) ----------
+# Same routes, SQL and response shapes as the sync handlers above, but
+# awaiting psycopg.AsyncConnection so a single worker is not capped by the
+# threadpool size while requests wait on Postgres.
+async_router = APIRouter()
+
+# ---- Tests ----
+@async_router.post("/api/tests", status_code=201)
+async def create_test_api_async(test: TestCreate, conn: psycopg.AsyncConnection = Depends(get_async_db)):
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(SQL_SELECT_ANY_USER)
+            row = await cur.fetchone()
+            if row:
+                created_by = row[0]
+            else:
+                await cur.execute(
+                    SQL_INSERT_USER,
+                    (uuid.uuid4(), 'System User', 'system@local')
+                )
+                created_by = (await cur.fetchone())[0]
+                await conn.commit()
+    except Exception as e:
+        logger.error(f"Error ensuring creator user: {e}")
+        raise HTTPException(status_code=500, detail="Error preparing creator user")
+
+    try:
+        status = (test.status or "draft").lower()
+        async with conn.cursor() as cur:
+            await cur.execute(SQL_INSERT_TEST, (uuid.uuid4(), test.test_name, test.description, created_by, test.duration_minutes, test.total_marks, test.passing_marks, status))
+            row = await cur.fetchone()
+        await conn.commit()
+    except Exception as e:
+        logger.error(f"Error creating test: {e}")
+        raise HTTPException(status_code=500, detail=f"Error creating test: {str(e)}")
+    return {
+        "success": True,
+        "data": {
+            "test_id": str(row[0]),
+            "test_name": row[1],
+            "description": row[2],
+            "duration_minutes": row[3],
+            "total_marks": row[4],
+            "passing_marks": row[5],
+            "status": row[6],
+            "created_by": str(created_by)
+        }
+    }
+
+
+@async_router.get("/api/tests")
+async def list_tests_api_async(conn: psycopg.AsyncConnection = Depends(get_async_db)):
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(SQL_LIST_TESTS)
+            rows = await cur.fetchall()
+        return {"success": True, "data": [serialize_test_row(r) for r in rows]}
+    except Exception as e:
+        logger.error(f"Error listing tests: {e}")
+        return {"success": False, "error": "Error listing tests"}
+
+
+@async_router.get("/api/tests/{test_id}")
+async def get_test_api_async(test_id: uuid.UUID, conn: psycopg.AsyncConnection = Depends(get_async_db)):
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(SQL_SELECT_TEST, (test_id,))
+            row = await cur.fetchone()
+        if not row:
+            return {"success": False, "error": "Test not found"}
+        return {"success": True, "data": serialize_test_row(row)}
+    except Exception as e:
+        logger.error(f"Error fetching test: {e}")
+        return {"success": False, "error": "Error fetching test"}
+
+
+@async_router.put("/api/tests/{test_id}")
+async def update_test_api_async(test_id: uuid.UUID, test: TestCreate, conn: psycopg.AsyncConnection = Depends(get_async_db)):
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(SQL_UPDATE_TEST, (test.test_name, test.duration_minutes, (test.status or "draft"), test_id))
+            row = await cur.fetchone()
+        await conn.commit()
+        invalidate_test_bundle(test_id)
+        if not row:
+            raise HTTPException(status_code=404, detail="Test not found for update")
+        return {"success": True, "data": {"test_id": str(row[0]), "test_name": row[1], "duration_minutes": row[2], "status": row[3]}}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating test: {e}")
+        raise HTTPException(status_code=500, detail="Error updating test")
+
+
+@async_router.patch("/api/tests/{test_id}/publish")
+async def publish_test_api_async(test_id: uuid.UUID, conn: psycopg.AsyncConnection = Depends(get_async_db)):
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(SQL_PUBLISH_TEST, (test_id,))
+            row = await cur.fetchone()
+        await conn.commit()
+        if not row:
+            raise HTTPException(status_code=404, detail="Test not found to publish")
+        try:
+            await build_test_bundle_async(conn, test_id)
+        except Exception as e:
+            # Not fatal: the first exam start builds it instead
+            invalidate_test_bundle(test_id)
+            logger.warning(f"Error building bundle for published test {test_id}: {e}")
+        return {"success": True, "data": {"test_id": str(row[0]), "status": row[1]}}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error publishing test: {e}")
+        raise HTTPException(status_code=500, detail="Error publishing test")
+
+
+@async_router.post("/api/tests/{test_id}/questions", status_code=201)
+async def create_test_question_api_async(test_id: uuid.UUID, question: TestQuestionCreate, conn: psycopg.AsyncConnection = Depends(get_async_db)):
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(SQL_INSERT_TEST_QUESTION, (uuid.uuid4(), test_id, question.question_id, question.question_type.value, question.order_index))
+            question_id = (await cur.fetchone())[0]
+        await conn.commit()
+        invalidate_test_bundle(test_id)
+        return {"success": True, "data": {"id": question_id, "test_id": test_id}}
+    except Exception as e:
+        logger.error(f"Error creating test question: {e}")
+        raise HTTPException(status_code=500, detail="Error creating test question")
+
+# ---- Assignments ----
+@async_router.post("/api/assignments", status_code=201)
+async def assign_test_api_async(assignment: TestAssignmentCreate, conn: psycopg.AsyncConnection = Depends(get_async_db)):
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(SQL_SELECT_CANDIDATE, (assignment.candidate_id,))
+            if not await cur.fetchone():
+                await cur.execute(SQL_INSERT_CANDIDATE, (assignment.candidate_id, f"candidate-{assignment.candidate_id}@local"))
+            await cur.execute(SQL_INSERT_ASSIGNMENT, (uuid.uuid4(), assignment.test_id, assignment.candidate_id, "ASSIGNED", assignment.scheduled_start_time, assignment.scheduled_end_time))
+            assignment_id = (await cur.fetchone())[0]
+        await conn.commit()
+        return {"success": True, "data": {"assignment_id": assignment_id}}
+    except Exception as e:
+        logger.error(f"Error assigning test: {e}")
+        raise HTTPException(status_code=500, detail="Error assigning test")
+
+
+@async_router.get("/api/assignments/{test_id}")
+async def get_assignments_api_async(test_id: uuid.UUID, conn: psycopg.AsyncConnection = Depends(get_async_db)):
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(SQL_SELECT_ASSIGNMENTS_FOR_TEST, (test_id,))
+            rows = await cur.fetchall()
+        result = [{"assignment_id": r[0], "candidate_id": r[1], "status": r[2],
+                   "scheduled_start_time": r[3], "scheduled_end_time": r[4]} for r in rows]
+        return {"success": True, "data": result}
+    except Exception as e:
+        logger.error(f"Error fetching assignments: {e}")
+        raise HTTPException(status_code=500, detail="Error fetching assignments")
+
+
+@async_router.post("/api/answers", status_code=201)
+async def submit_answer_api_async(answer: TestAnswerCreate, conn: psycopg.AsyncConnection = Depends(get_async_db)):
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(SQL_INSERT_ANSWER, (
+                uuid.uuid4(), answer.assignment_id, answer.question_id, answer.question_type.value,
+                answer.selected_option, answer.code_submission, answer.code_output, answer.is_correct,
+                answer.score, answer.time_spent_seconds, answer.code_analysis, answer.ai_review_notes,
+                answer.language, answer.stdin, answer.stdout, answer.code_status, answer.code_passed
+            ))
+            answer_id = (await cur.fetchone())[0]
+        await conn.commit()
+        return {"success": True, "data": {"answer_id": answer_id}}
+    except Exception as e:
+        logger.error(f"Error submitting test answer: {e}")
+        raise HTTPException(status_code=500, detail="Error submitting test answer")
+
+
+async def update_assignment_status_async(conn, sql: str, status: str, assignment_id: uuid.UUID, action: str,
+                                         background_tasks: Optional[BackgroundTasks] = None):
+    """`background_tasks` is passed when ending, to notify the problem service"""
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(sql, (status, assignment_id))
+            row = await cur.fetchone()
+        await conn.commit()
+        if not row:
+            raise HTTPException(status_code=404, detail="Assignment not found")
+        if background_tasks is not None:
+            background_tasks.add_task(notify_assignment_ended, row[2], row[3])
+        return {"success": True, "data": {"assignment_id": str(row[0]), "status": row[1]}}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error {action} assignment: {e}")
+        return {"success": False, "error": f"Error {action} assignment"}
+
+
+@async_router.patch("/api/assignments/{assignment_id}/start")
+async def start_assignment_endpoint_async(assignment_id: uuid.UUID, conn: psycopg.AsyncConnection = Depends(get_async_db)):
+    return await update_assignment_status_async(conn, SQL_START_ASSIGNMENT, "STARTED", assignment_id, "starting")
+
+
+@async_router.patch("/api/assignments/{assignment_id}/end")
+async def end_assignment_endpoint_async(assignment_id: uuid.UUID, background_tasks: BackgroundTasks,
+                                        conn: psycopg.AsyncConnection = Depends(get_async_db)):
+    return await update_assignment_status_async(conn, SQL_END_ASSIGNMENT, "COMPLETED", assignment_id, "ending",
+                                                 background_tasks)
+
+
+@async_router.get("/api/assignments/{assignment_id}")
+async def get_assignment_endpoint_async(assignment_id: uuid.UUID, conn: psycopg.AsyncConnection = Depends(get_async_db)):
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(SQL_SELECT_ASSIGNMENT, (assignment_id,))
+            row = await cur.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Assignment not found")
+        return {"success": True, "data": serialize_assignment_row(row)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching assignment: {e}")
+        return {"success": False, "error": "Error fetching assignment"}
+
+
+@async_router.get("/api/tests/{test_id}/questions")
+async def get_test_questions_endpoint_async(test_id: uuid.UUID, if_none_match: Optional[str] = Header(None)):
+    try:
+        bundle = await get_test_bundle_async(test_id)
+        if not bundle:
+            raise HTTPException(status_code=404, detail="Test not found")
+        return test_bundle_response(bundle, if_none_match)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching test questions: {e}")
+        return {"success": False, "error": "Error fetching test questions"}
+
+
+@async_router.get("/api/assignments/{assignment_id}/answers")
+async def get_assignment_answers_endpoint_async(assignment_id: uuid.UUID, conn: psycopg.AsyncConnection = Depends(get_async_db)):
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(SQL_SELECT_ANSWERS, (assignment_id,))
+            rows = await cur.fetchall()
+        return {"success": True, "data": [serialize_answer_row(r) for r in rows]}
+    except Exception as e:
+        logger.error(f"Error fetching answers: {e}")
+        return {"success": False, "error": "Error fetching answers"}
+
+# ---- Reports ----
+@async_router.post("/api/reports/{assignment_id}/generate")
+async def generate_report_endpoint_async(assignment_id: uuid.UUID, conn: psycopg.AsyncConnection = Depends(get_async_db)):
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(SQL_SELECT_ASSIGNMENT_TIMES, (assignment_id,))
+            assign_row = await cur.fetchone()
+            if not assign_row:
+                raise HTTPException(status_code=404, detail="Assignment not found")
+
+            test_id, candidate_id, started_at, submitted_at = assign_row
+
+            await cur.execute(SQL_SELECT_TEST_NAME, (test_id,))
+            test_row = await cur.fetchone()
+            test_name = test_row[0] if test_row else "Unknown Test"
+
+            duration_seconds = 0
+            if started_at and submitted_at:
+                duration_seconds = int((submitted_at - started_at).total_seconds())
+
+            await cur.execute(SQL_SUMMARIZE_ANSWERS, (assignment_id,))
+            total_answers, correct_answers, total_score, percentage = summarize_answers(await cur.fetchone())
+
+            report_id = uuid.uuid4()
+            await cur.execute(SQL_INSERT_REPORT, (report_id, candidate_id, test_id, total_score, total_answers, percentage, duration_seconds, "completed"))
+        await conn.commit()
+
         return {
             "success": True,
             "data": {
-                "report_id": str(row[0]),
-                "candidate_id": str(row[1]),
-                "test_id": str(row[2]),
-                "total_score": row[3],
-                "total_max": row[4],
-                "percentage": row[5],
-                "duration_seconds": row[6],
-                "status": row[7],
-                "created_at": row[8].isoformat() if row[8] else None,
+                "report_id": str(report_id),
+                "assignment_id": str(assignment_id),
+                "test_name": test_name,
+                "total_score": total_score,
+                "total_answers": total_answers,
+                "correct_answers": correct_answers,
+                "percentage": percentage,
+                "duration_seconds": duration_seconds,
             }
         }
     except HTTPException:
         raise
+    except Exception as e:
+        logger.error(f"Error generating report: {e}")
+        return {"success": False, "error": f"Error generating report: {str(e)}"}
+
+
+@async_router.get("/api/reports/{report_id}")
+async def fetch_report_endpoint_async(report_id: uuid.UUID, conn: psycopg.AsyncConnection = Depends(get_async_db)):
+    try:
+        async with conn.cursor() as cur:
+            await cur.execute(SQL_SELECT_REPORT, (report_id,))
+            row = await cur.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Report not found")
+        return {"success": True, "data": serialize_report_row(row)}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching report: {e}")
         return {"success": False, "error": "Error fetching report"}
+
+# ---------- Route Registration ----------
+app.include_router(async_router if ASYNC_DB_MODE else sync_router)
+logger.info(f"Serving /api/tests, /api/answers, /api/assignments and /api/reports in {DB_MODE} mode")
@@ -0,0 +1,88 @@
+"""
+Benchmark: report rendering CPU time
+====================================
+
+Renders the static_sample.json report N times (in memory, no disk I/O) and
+reports CPU time per report for:
+
+  rebuilt    styles, table styles and donut drawings built on every call (the old behaviour)
+  cached     the module-level templates and reused donut drawings
+
+Usage:
+    cd backend
+    python bench_report_generator.py --reports 1000
+"""
+
+import argparse
+import copy
+import io
+import json
+import statistics
+import time
+
+import report_generator
+
+
+def summarize(latencies: list) -> dict:
+    latencies = sorted(latencies)
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+    return {
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "max_ms": latencies[-1],
+    }
+
+
+def render_rebuilt(data: dict):
+    """Pay for the templates on every report, as generate_pdf_report used to"""
+    report_generator.TEMPLATES = report_generator._build_templates()
+    report_generator._donuts.charts = {}
+    report_generator.generate_pdf_report(data, io.BytesIO())
+
+
+def render_cached(data: dict):
+    report_generator.generate_pdf_report(data, io.BytesIO())
+
+
+def timed(fn, data: dict, reports: int) -> dict:
+    cpu_ms = []
+    for _ in range(reports):
+        payload = copy.deepcopy(data)
+        started = time.process_time()
+        fn(payload)
+        cpu_ms.append((time.process_time() - started) * 1000)
+    return summarize(cpu_ms)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=1000, help="reports rendered per variant")
+    parser.add_argument("--sample", default="static_sample.json")
+    args = parser.parse_args()
+
+    with open(args.sample, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    # Warm up imports, font metrics and the cached templates
+    render_cached(copy.deepcopy(data))
+
+    cached_templates = report_generator.TEMPLATES
+    results = {"rebuilt": timed(render_rebuilt, data, args.reports)}
+    report_generator.TEMPLATES = cached_templates
+    report_generator._donuts.charts = {}
+    results["cached"] = timed(render_cached, data, args.reports)
+
+    print(f"{args.reports} reports per variant, CPU time per report\n")
+    print(f"{'variant':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['mean_ms']:>10.3f}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['max_ms']:>10.3f}")
+    before, after = results["rebuilt"]["mean_ms"], results["cached"]["mean_ms"]
+    print(f"\nCPU per report: {before - after:.3f} ms less ({(before - after) / before * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,268 @@
+"""
+Cohort report export.
+
+`GET /api/tests/{test_id}/reports.zip` returns one PDF per completed assignment
+of a test. Report data for the whole cohort is loaded with a fixed number of
+queries (test, assignments, questions, answers, proctoring), whatever the cohort
+size, and assembled into the same payload `POST /api/report` takes.
+
+PDFs are rendered through the render pool, a few at a time, and each one is
+added to the ZIP and sent as soon as it is ready. The archive is written to
+the response as it grows, so at most a handful of PDFs are held at once, on
+disk in a scratch directory that is removed afterwards. Candidates whose
+report failed to render are listed in `errors.txt` inside the archive.
+
+Needs the platform database (see shared/schema.sql) configured through
+DATABASE_URL or the PG* variables.
+"""
+
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from collections import defaultdict
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from db import get_session
+from render_pool import RenderPool, RenderQueueFull
+
+try:
+    from sqlalchemy import text
+except Exception:  # pragma: no cover - optional dependency
+    text = None
+
+
+class DatabaseUnavailable(Exception):
+    """No database is configured, so there is no cohort to export."""
+
+
+TEST_QUERY = """
+    SELECT test_name, duration_minutes FROM tests WHERE test_id = CAST(:test_id AS uuid)
+"""
+
+ASSIGNMENTS_QUERY = """
+    SELECT ta.assignment_id::text AS assignment_id, ta.candidate_id::text AS candidate_id,
+           ta.started_at, ta.submitted_at, u.full_name, u.email
+    FROM test_assignments ta
+    JOIN users u ON u.user_id = ta.candidate_id
+    WHERE ta.test_id = CAST(:test_id AS uuid) AND ta.status = 'completed'
+    ORDER BY u.full_name, ta.assignment_id
+"""
+
+QUESTIONS_QUERY = """
+    SELECT tq.question_id::text AS question_id, tq.order_index, tq.marks,
+           mq.question_text, mq.option_a, mq.option_b, mq.option_c, mq.option_d, mq.correct_answer,
+           cq.title, cq.description, cq.difficulty::text AS difficulty
+    FROM test_questions tq
+    LEFT JOIN mcq_questions mq ON mq.question_id = tq.question_id
+    LEFT JOIN coding_questions cq ON cq.question_id = tq.question_id
+    WHERE tq.test_id = CAST(:test_id AS uuid)
+    ORDER BY tq.order_index
+"""
+
+# Latest answer per question wins (ordered by submitted_at)
+ANSWERS_QUERY = """
+    SELECT a.assignment_id::text AS assignment_id, a.question_id::text AS question_id,
+           a.selected_option, a.is_correct_mcq, a.code, a.code_passed, a.score,
+           cs.passed_test_cases, cs.total_test_cases
+    FROM test_answers a
+    JOIN test_assignments ta ON ta.assignment_id = a.assignment_id
+    LEFT JOIN code_submissions cs ON cs.submission_id = a.code_submission_id
+    WHERE ta.test_id = CAST(:test_id AS uuid) AND ta.status = 'completed'
+    ORDER BY a.assignment_id, a.submitted_at
+"""
+
+PROCTORING_QUERY = """
+    SELECT DISTINCT ON (pd.assignment_id)
+           pd.assignment_id::text AS assignment_id, pd.flagged_faces, pd.focus_deviation_percent,
+           pd.cheating_events, pd.unusual_activity
+    FROM proctoring_data pd
+    JOIN test_assignments ta ON ta.assignment_id = pd.assignment_id
+    WHERE ta.test_id = CAST(:test_id AS uuid) AND ta.status = 'completed'
+    ORDER BY pd.assignment_id, pd.created_at DESC
+"""
+
+
+def _rows(session, query: str, test_id: str) -> List[dict]:
+    return [dict(row) for row in session.execute(text(query), {"test_id": test_id}).mappings()]
+
+
+def _mcq_item(question: dict, answer: Optional[dict]) -> dict:
+    options = [question["option_a"], question["option_b"], question["option_c"], question["option_d"]]
+    letters = "ABCD"
+    selected = (answer or {}).get("selected_option")
+    return {
+        "id": question["order_index"],
+        "question": question["question_text"],
+        "options": options,
+        "correct": options[letters.index(question["correct_answer"])] if question["correct_answer"] in letters else None,
+        "given_answer": options[letters.index(selected)] if selected and selected in letters else None,
+        "is_correct": bool(answer and answer["is_correct_mcq"]),
+        "marks": (answer or {}).get("score") or 0,
+    }
+
+
+def _coding_item(question: dict, answer: Optional[dict]) -> dict:
+    return {
+        "id": question["order_index"],
+        "title": question["title"],
+        "description": question["description"] or "",
+        "difficulty": question["difficulty"],
+        "given_answer": (answer or {}).get("code") or "",
+        "marks": (answer or {}).get("score") or 0,
+        "test_cases_passed": (answer or {}).get("passed_test_cases"),
+        "test_cases_total": (answer or {}).get("total_test_cases"),
+        "output_correct": answer["code_passed"] if answer else None,
+    }
+
+
+def _duration(assignment: dict, duration_minutes) -> str:
+    started, submitted = assignment["started_at"], assignment["submitted_at"]
+    if started and submitted:
+        return f"{max(0, round((submitted - started).total_seconds() / 60))} minutes"
+    return f"{duration_minutes} minutes" if duration_minutes else "-"
+
+
+def load_cohort_reports(test_id: str) -> Optional[Tuple[str, List[Tuple[str, dict]]]]:
+    """(test name, [(assignment id, report payload)]) for every completed assignment, or None if the test doesn't exist."""
+    with get_session() as session:
+        if session is None or text is None:
+            raise DatabaseUnavailable("Database not configured")
+        tests = _rows(session, TEST_QUERY, test_id)
+        if not tests:
+            return None
+        test = tests[0]
+        assignments = _rows(session, ASSIGNMENTS_QUERY, test_id)
+        if not assignments:
+            return test["test_name"], []
+        questions = _rows(session, QUESTIONS_QUERY, test_id)
+        answers = defaultdict(dict)
+        for answer in _rows(session, ANSWERS_QUERY, test_id):
+            answers[answer["assignment_id"]][answer["question_id"]] = answer
+        proctoring = {row.pop("assignment_id"): row for row in _rows(session, PROCTORING_QUERY, test_id)}
+
+    mcq_questions = [q for q in questions if q["question_text"] is not None]
+    coding_questions = [q for q in questions if q["question_text"] is None and q["title"] is not None]
+    mcq_max = sum(q["marks"] or 0 for q in mcq_questions)
+    coding_max = sum(q["marks"] or 0 for q in coding_questions)
+
+    reports = []
+    for assignment in assignments:
+        given = answers.get(assignment["assignment_id"], {})
+        mcq_items = [_mcq_item(q, given.get(q["question_id"])) for q in mcq_questions]
+        coding_items = [_coding_item(q, given.get(q["question_id"])) for q in coding_questions]
+        submitted = assignment["submitted_at"]
+        data = {
+            "candidate": {
+                "name": assignment["full_name"],
+                "email": assignment["email"],
+                "id": assignment["candidate_id"],
+                "exam": test["test_name"],
+                "date": submitted.date().isoformat() if submitted else "-",
+                "duration": _duration(assignment, test["duration_minutes"]),
+            },
+            "mcq": {
+                "max_marks": mcq_max,
+                "marks_obtained": sum(item["marks"] for item in mcq_items),
+                "correct": sum(1 for item in mcq_items if item["is_correct"]),
+                "wrong": sum(1 for item in mcq_items if item["given_answer"] and not item["is_correct"]),
+                "questions": mcq_items,
+            },
+            "coding": {
+                "max_marks": coding_max,
+                "marks_obtained": sum(item["marks"] for item in coding_items),
+                "output_ok": bool(coding_items) and all(item["output_correct"] for item in coding_items),
+                "questions": coding_items,
+            },
+            "proctoring": proctoring.get(assignment["assignment_id"]),
+            "include_proctoring": True,
+        }
+        reports.append((assignment["assignment_id"], data))
+    return test["test_name"], reports
+
+
+def safe_filename(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name or "").strip("_") or "report"
+
+
+class _ZipSink:
+    """Write-only file for ZipFile; what was written since the last take() is the next response chunk."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def _render(render_pool: RenderPool, data: dict, path: str) -> str:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + render_pool.timeout_s
+    while True:
+        try:
+            await render_pool.render(data, path)
+            return path
+        except RenderQueueFull:
+            # The pool is shared with /api/report jobs; wait for a free slot instead of dropping the candidate
+            if loop.time() > deadline:
+                raise
+            await asyncio.sleep(0.5)
+
+
+async def stream_reports_zip(render_pool: RenderPool, reports: List[Tuple[str, dict]]) -> AsyncIterator[bytes]:
+    """ZIP of one PDF per report, yielded piece by piece as the PDFs are rendered."""
+    work_dir = tempfile.mkdtemp(prefix="cohort_reports_")
+    sink = _ZipSink()
+    # Unseekable output: ZipFile writes each entry's sizes after its data.
+    # Deflate at level 1, as PDFs are already compressed but STORED entries with a
+    # trailing descriptor trip up some streaming unzip tools.
+    archive = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1)
+    todo = iter(reports)
+    running = {}
+    failed = []
+    try:
+        while True:
+            while len(running) < render_pool.workers:
+                entry = next(todo, None)
+                if entry is None:
+                    break
+                assignment_id, data = entry
+                name = f"{safe_filename((data.get('candidate') or {}).get('name'))}_{assignment_id[:8]}.pdf"
+                task = asyncio.create_task(_render(render_pool, data, os.path.join(work_dir, name)))
+                running[task] = name
+            if not running:
+                break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                error = task.exception()
+                if error is not None:
+                    failed.append(f"{name}: {str(error) or type(error).__name__}")
+                    continue
+                path = task.result()
+                await run_in_threadpool(archive.write, path, name)
+                os.remove(path)
+                yield sink.take()
+        if failed:
+            archive.writestr("errors.txt", "Reports that could not be rendered:\n" + "\n".join(failed) + "\n")
+        archive.close()
+        yield sink.take()
+    finally:
+        # Client went away or something failed: stop waiting for the remaining renders
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
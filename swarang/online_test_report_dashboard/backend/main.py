@@ -1,14 +1,18 @@
 
 from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from report_generator import generate_pdf_report
+from render_pool import RenderPool
+from report_jobs import DONE, FAILED, JobQueueFull, ReportJobs
+from report_store import ReportStore
+from cohort_export import DatabaseUnavailable, load_cohort_reports, safe_filename, stream_reports_zip
 from database_service import save_report, get_report, get_candidate_reports, get_all_reports, init_database
 from db import test_connection
-import glob
 from typing import Optional
 import uuid, os, json
+from urllib.parse import quote
 import logging
 
 # Configure logging
@@ -17,6 +21,29 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Online Test Report API")
 
+# PDFs are rendered in worker processes so the event loop stays free (see render_pool.py)
+render_pool = RenderPool()
+
+REPORTS_DIR = "reports"
+
+# Rendered PDFs and their SQLite index (see report_store.py)
+report_store = ReportStore(REPORTS_DIR)
+
+def save_rendered_report(data_dict: dict, path: str, pdf_size: int):
+    """Save a rendered report to the database (optional - won't fail if DB not available)."""
+    return save_report(
+        candidate_data=data_dict.get('candidate', {}),
+        mcq_data=data_dict.get('mcq', {}),
+        coding_data=data_dict.get('coding', {}),
+        proctoring_data=data_dict.get('proctoring'),
+        full_report_data=data_dict,
+        pdf_file_path=path,
+        pdf_file_size=pdf_size
+    )
+
+# POST /api/report queues a job; workers render and save it (see report_jobs.py)
+report_jobs = ReportJobs(render_pool, report_store, save_rendered_report)
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
@@ -28,8 +55,18 @@ async def startup_event():
         init_database()
     else:
         logger.warning("Database not configured or connection failed. Reports will not be saved to database.")
+    await report_store.start()
+    await render_pool.start()
+    await report_jobs.start()
     logger.info("Application ready.")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop taking jobs, let running renders finish, then stop the worker processes and the store."""
+    await report_jobs.stop()
+    await run_in_threadpool(render_pool.stop)
+    await report_store.stop()
+
 # Add CORS middleware to allow frontend requests
 app.add_middleware(
     CORSMiddleware,
@@ -46,63 +83,105 @@ class CandidateReport(BaseModel):
     proctoring: Optional[dict] = None
     include_proctoring: Optional[bool] = True
 
-@app.post("/api/report")
+def job_status_url(job_id: str) -> str:
+    return f"/api/report/jobs/{job_id}"
+
+def content_disposition(filename: str) -> str:
+    """Attachment header for any name, built the way FileResponse builds it."""
+    quoted = quote(filename)
+    if quoted != filename:
+        # Non-ASCII, quotes and the like would break (or fail to encode) a plain filename="..."
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+def stored_report_response(entry: dict, filename: str):
+    """Serve a stored PDF, decompressing it on the fly if compaction gzipped it."""
+    if entry["compressed"]:
+        return StreamingResponse(
+            report_store.read_chunks(entry),
+            media_type="application/pdf",
+            headers={"Content-Disposition": content_disposition(filename)},
+        )
+    return FileResponse(report_store.abspath(entry), media_type="application/pdf", filename=filename)
+
+@app.post("/api/report", status_code=202)
 async def create_report(payload: CandidateReport):
-    """Generate and save a PDF report, optionally storing it in the database."""
-    out_dir = "reports"
-    os.makedirs(out_dir, exist_ok=True)
-    fname = f"report_{uuid.uuid4().hex}.pdf"
-    path = os.path.join(out_dir, fname)
-    
+    """Queue a PDF report; poll the returned status_url until it redirects to the file."""
+    data_dict = payload.dict()
+    # Ensure nested dictionaries exist
+    for key in ('candidate', 'mcq', 'coding'):
+        if not data_dict.get(key):
+            data_dict[key] = {}
+
     try:
-        # Convert Pydantic model to dict and ensure all required fields exist
-        data_dict = payload.dict()
-        # Ensure nested dictionaries exist
-        if 'candidate' not in data_dict:
-            data_dict['candidate'] = {}
-        if 'mcq' not in data_dict:
-            data_dict['mcq'] = {}
-        if 'coding' not in data_dict:
-            data_dict['coding'] = {}
-        
-        # Generate PDF
-        generate_pdf_report(data_dict, path)
-        
-        # Check if file was created
-        if not os.path.exists(path):
-            raise HTTPException(status_code=500, detail="PDF file was not created")
-        
-        # Get file size
-        pdf_size = os.path.getsize(path)
-        
-        # Save report to database (optional - won't fail if DB not available)
-        report_id = save_report(
-            candidate_data=data_dict.get('candidate', {}),
-            mcq_data=data_dict.get('mcq', {}),
-            coding_data=data_dict.get('coding', {}),
-            proctoring_data=data_dict.get('proctoring'),
-            full_report_data=data_dict,
-            pdf_file_path=path,
-            pdf_file_size=pdf_size
-        )
-        
-        logger.info(f"Report generated and {'saved to database' if report_id else 'stored as PDF only'}: {fname}")
-            
-    except HTTPException:
-        raise
-    except Exception as e:
-        import traceback
-        error_detail = f"Error generating PDF: {str(e)}\n{traceback.format_exc()}"
-        logger.error(error_detail)
-        raise HTTPException(status_code=500, detail=error_detail)
-    
-    candidate_name = payload.candidate.get('name', 'report') if payload.candidate else 'report'
-    return FileResponse(
-        path, 
-        media_type="application/pdf", 
-        filename=f"{candidate_name}.pdf"
+        job = report_jobs.submit(data_dict)
+    except JobQueueFull as e:
+        logger.warning(f"Report rejected: {e}")
+        raise HTTPException(status_code=503, detail="Too many reports queued, please retry", headers={"Retry-After": "10"})
+
+    status_url = job_status_url(job.id)
+    return JSONResponse(
+        {**job.to_dict(), "status_url": status_url},
+        status_code=202,
+        headers={"Location": status_url, "Retry-After": "1"},
+    )
+
+@app.get("/api/report/jobs/{job_id}")
+async def get_report_job(job_id: str):
+    """Job status while it is queued, running or failed; a redirect to the PDF once done."""
+    job = report_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Report job {job_id} not found")
+    if job.status == DONE:
+        return RedirectResponse(f"{job_status_url(job.id)}/file", status_code=303)
+    headers = {} if job.status == FAILED else {"Retry-After": "1"}
+    return JSONResponse({**job.to_dict(), "status_url": job_status_url(job.id)}, headers=headers)
+
+@app.get("/api/report/jobs/{job_id}/file")
+async def get_report_job_file(job_id: str):
+    """The rendered PDF of a finished job."""
+    job = report_jobs.get(job_id)
+    if not job or job.status != DONE:
+        raise HTTPException(status_code=404, detail=f"No finished report for job {job_id}")
+    entry = report_store.get(job.id)
+    if not entry:
+        raise HTTPException(status_code=410, detail="Report file is no longer available")
+    return stored_report_response(entry, job.filename)
+
+@app.get("/api/tests/{test_id}/reports.zip")
+async def export_test_reports(test_id: str):
+    """ZIP of the PDF reports of every candidate who completed the test, streamed as they are rendered."""
+    try:
+        uuid.UUID(test_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid test id: {test_id}")
+    try:
+        cohort = await run_in_threadpool(load_cohort_reports, test_id)
+    except DatabaseUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if cohort is None:
+        raise HTTPException(status_code=404, detail=f"Test {test_id} not found")
+    test_name, reports = cohort
+    if not reports:
+        raise HTTPException(status_code=404, detail=f"No completed assignments for test {test_id}")
+
+    logger.info(f"Exporting {len(reports)} reports for test {test_id}")
+    filename = f"{safe_filename(test_name)}_reports.zip"
+    return StreamingResponse(
+        stream_reports_zip(render_pool, reports),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
+@app.get("/api/health")
+async def health():
+    return {
+        "status": "ok",
+        "render_pool": render_pool.stats(),
+        "report_jobs": report_jobs.stats(),
+        "report_store": report_store.stats(),
+    }
+
 @app.get("/api/sample")
 async def sample_data():
     try:
@@ -115,6 +194,15 @@ async def sample_data():
         raise HTTPException(status_code=500, detail="Invalid JSON in sample file")
 
 
+@app.get("/api/report/latest")
+async def latest_report(candidate: Optional[str] = None):
+    """Return the most recently generated PDF report, optionally for one candidate (email or id)."""
+    entry = await run_in_threadpool(report_store.latest, candidate)
+    if not entry:
+        raise HTTPException(status_code=404, detail="No reports available")
+    return stored_report_response(entry, os.path.basename(entry["path"]).replace(".gz", ""))
+
+
 @app.get("/api/report/{report_id}")
 async def get_report_by_id(report_id: str):
     """Retrieve a report from the database by ID."""
@@ -138,20 +226,6 @@ async def get_all_reports_endpoint(limit: int = 100, offset: int = 0):
     return JSONResponse({"reports": reports, "count": len(reports), "limit": limit, "offset": offset})
 
 
-@app.get("/api/report/latest")
-async def latest_report():
-    """Return the most recently generated PDF report from the `reports/` folder."""
-    out_dir = "reports"
-    if not os.path.exists(out_dir):
-        raise HTTPException(status_code=404, detail="No reports available")
-
-    pdfs = sorted(glob.glob(os.path.join(out_dir, "*.pdf")), key=os.path.getmtime, reverse=True)
-    if not pdfs:
-        raise HTTPException(status_code=404, detail="No reports available")
-
-    latest = pdfs[0]
-    return FileResponse(latest, media_type="application/pdf", filename=os.path.basename(latest))
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
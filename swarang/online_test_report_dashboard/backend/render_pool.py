@@ -0,0 +1,124 @@
+"""
+PDF rendering process pool.
+
+ReportLab layout is CPU-bound, so rendering a long report inside an async
+handler freezes the event loop. `RenderPool` runs `generate_pdf_report` in a
+bounded pool of worker processes that import ReportLab once at start-up.
+Requests beyond the queue limit are rejected instead of piling up, and a render
+that takes longer than the timeout is abandoned by the caller.
+
+Settings (environment):
+    REPORT_RENDER_WORKERS      worker processes (default: CPU count)
+    REPORT_RENDER_QUEUE_LIMIT  renders queued or running before new ones are refused (default: 4 x workers)
+    REPORT_RENDER_TIMEOUT_S    seconds to wait for one render (default: 60)
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+REPORT_RENDER_WORKERS = int(os.getenv("REPORT_RENDER_WORKERS", str(os.cpu_count() or 2)))
+REPORT_RENDER_QUEUE_LIMIT = int(os.getenv("REPORT_RENDER_QUEUE_LIMIT", str(REPORT_RENDER_WORKERS * 4)))
+REPORT_RENDER_TIMEOUT_S = float(os.getenv("REPORT_RENDER_TIMEOUT_S", "60"))
+
+
+class RenderQueueFull(Exception):
+    """Too many renders are already queued."""
+
+
+class RenderTimeout(Exception):
+    """A render did not finish within the timeout."""
+
+
+def _init_worker():
+    # Pay for the ReportLab imports (and font setup) once per worker, not per report
+    import report_generator  # noqa: F401
+
+
+def _warm():
+    return os.getpid()
+
+
+def _render(data: dict, out_path: str) -> int:
+    """Runs in a worker process: render the PDF and return its size in bytes."""
+    from report_generator import generate_pdf_report
+    generate_pdf_report(data, out_path)
+    return os.path.getsize(out_path)
+
+
+class RenderPool:
+    def __init__(self, workers: int = REPORT_RENDER_WORKERS, queue_limit: int = REPORT_RENDER_QUEUE_LIMIT,
+                 timeout_s: float = REPORT_RENDER_TIMEOUT_S):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout_s = timeout_s
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+        self.rendered = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    async def start(self):
+        self._executor = self._new_executor()
+        # Start every worker now so the first reports don't pay for process start-up and imports
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(*(loop.run_in_executor(self._executor, _warm) for _ in range(self.workers)))
+        logger.info(f"PDF render pool ready: {len(set(pids))} workers, queue limit {self.queue_limit}")
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def render(self, data: dict, out_path: str) -> int:
+        """Render `data` to `out_path` in a worker process; returns the PDF size in bytes."""
+        if self.pending >= self.queue_limit:
+            self.rejected += 1
+            raise RenderQueueFull(f"{self.pending} reports are already being rendered")
+        if self._executor is None:
+            self._executor = self._new_executor()
+        executor = self._executor
+        loop = asyncio.get_running_loop()
+        try:
+            future = executor.submit(_render, data, out_path)
+            # Counted until the worker is really done, even after the caller gave up on it
+            self.pending += 1
+            future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._finished))
+            size = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout_s)
+            self.rendered += 1
+            return size
+        except asyncio.TimeoutError:
+            # A queued render is cancelled; a running one finishes in its worker, unawaited
+            self.timeouts += 1
+            raise RenderTimeout(f"Rendering took longer than {self.timeout_s:g}s")
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); later renders get a fresh pool
+            self.failures += 1
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def _finished(self):
+        self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "timeout_s": self.timeout_s,
+            "pending": self.pending,
+            "rendered": self.rendered,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+        }
@@ -6,84 +6,49 @@ from reportlab.platypus import Table, TableStyle, Paragraph, SimpleDocTemplate,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from datetime import datetime
-from reportlab.graphics.shapes import Drawing
+from reportlab.graphics.shapes import Circle, Drawing
 from reportlab.graphics.charts.piecharts import Pie
 from reportlab.graphics import renderPDF
 import os
+import threading
+from typing import NamedTuple
 
-def _create_pie_chart(title, obtained, max_marks, color_hex='#4F46E5', dummy_arg=None):
-    """Create a clean pie chart drawing without overlapping labels."""
-    remaining = max(0, max_marks - obtained)
+# Professional color scheme
+PRIMARY_COLOR = '#1e3a5f'  # Deep navy blue
+SECONDARY_COLOR = '#2d5a87'  # Medium blue
+ACCENT_COLOR = '#0ea5e9'  # Sky blue accent
+SUCCESS_COLOR = '#059669'  # Emerald green
+DANGER_COLOR = '#dc2626'  # Red
+TEXT_DARK = '#1f2937'  # Dark gray
+TEXT_LIGHT = '#6b7280'  # Medium gray
+BG_LIGHT = '#f8fafc'  # Light gray background
+BG_MEDIUM = '#e2e8f0'  # Medium gray background
+BORDER_COLOR = '#cbd5e1'  # Border gray
 
-    # Create drawing with proper dimensions for 3-column layout
-    drawing = Drawing(150, 80)
 
-    # Donut-style pie chart - no labels on the chart itself
-    pie = Pie()
-    pie.x = 15
-    pie.y = 5
-    pie.width = 80
-    pie.height = 80
-    pie.data = [obtained, remaining]
-    # Remove all labels from pie chart - they'll be shown below
-    pie.labels = ["", ""]
-    # Turn off sideLabels completely
-    try:
-        pie.sideLabels = False
-        pie.labelRadius = 0
-    except Exception:
-        pass
-    
-    # Professional styling
-    pie.slices[0].fillColor = colors.HexColor(color_hex)
-    pie.slices[1].fillColor = colors.HexColor('#e2e8f0')
-    pie.slices[0].strokeColor = colors.HexColor('#ffffff')
-    pie.slices[1].strokeColor = colors.HexColor('#ffffff')
-    pie.slices[0].strokeWidth = 2
-    pie.slices[1].strokeWidth = 2
-
-    drawing.add(pie)
+# ========== TEMPLATES ==========
+# Paragraph and table styles are the same for every report, so they are built
+# once per process rather than on every call. Treat them as read-only:
+# Paragraph and Table.setStyle only read them.
 
-    # Create donut effect with white center circle
-    try:
-        from reportlab.graphics.shapes import Circle
-        cx = pie.x + pie.width / 2
-        cy = pie.y + pie.height / 2
-        # Donut hole - 40% of radius
-        r = min(pie.width, pie.height) * 0.40
-        hole = Circle(cx, cy, r, fillColor=colors.white, strokeColor=colors.white)
-        drawing.add(hole)
-    except Exception:
-        pass
+class ReportTemplates(NamedTuple):
+    title_style: ParagraphStyle
+    heading_style: ParagraphStyle
+    normal_style: ParagraphStyle
+    label_style: ParagraphStyle
+    footer_style: ParagraphStyle
+    header_table: TableStyle
+    info_table: TableStyle
+    columns_table: TableStyle
+    scores_table: TableStyle
+    chart_table: TableStyle
+    options_table: TableStyle
+    proctoring_table: TableStyle
 
-    return drawing
 
-def generate_pdf_report(data, out_path):
-    """Generate a comprehensive PDF report with full dashboard details"""
-    # Allow natural page breaks - content can flow to multiple pages
-    doc = SimpleDocTemplate(
-        out_path, 
-        pagesize=A4, 
-        topMargin=12*mm, 
-        bottomMargin=12*mm, 
-        leftMargin=12*mm, 
-        rightMargin=12*mm
-    )
+def _build_templates():
     styles = getSampleStyleSheet()
-    story = []
-    
-    # Professional color scheme
-    PRIMARY_COLOR = '#1e3a5f'  # Deep navy blue
-    SECONDARY_COLOR = '#2d5a87'  # Medium blue
-    ACCENT_COLOR = '#0ea5e9'  # Sky blue accent
-    SUCCESS_COLOR = '#059669'  # Emerald green
-    DANGER_COLOR = '#dc2626'  # Red
-    TEXT_DARK = '#1f2937'  # Dark gray
-    TEXT_LIGHT = '#6b7280'  # Medium gray
-    BG_LIGHT = '#f8fafc'  # Light gray background
-    BG_MEDIUM = '#e2e8f0'  # Medium gray background
-    BORDER_COLOR = '#cbd5e1'  # Border gray
-    
+
     # Custom styles
     title_style = ParagraphStyle(
         'CustomTitle',
@@ -95,7 +60,7 @@ def generate_pdf_report(data, out_path):
         fontName='Helvetica-Bold',
         letterSpacing=0.5
     )
-    
+
     heading_style = ParagraphStyle(
         'CustomHeading',
         parent=styles['Heading2'],
@@ -106,7 +71,7 @@ def generate_pdf_report(data, out_path):
         fontName='Helvetica-Bold',
         letterSpacing=0.8
     )
-    
+
     normal_style = ParagraphStyle(
         'CustomNormal',
         parent=styles['Normal'],
@@ -124,7 +89,179 @@ def generate_pdf_report(data, out_path):
         alignment=TA_CENTER,
         textColor=colors.HexColor(TEXT_DARK)
     )
-    
+
+    footer_style = ParagraphStyle(
+        'Footer',
+        parent=normal_style,
+        fontSize=7,
+        textColor=colors.HexColor(TEXT_LIGHT),
+        alignment=TA_CENTER
+    )
+
+    return ReportTemplates(
+        title_style=title_style,
+        heading_style=heading_style,
+        normal_style=normal_style,
+        label_style=label_style,
+        footer_style=footer_style,
+        header_table=TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor(PRIMARY_COLOR)),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('TOPPADDING', (0, 0), (-1, -1), 12),
+            ('BOX', (0, 0), (-1, -1), 0, colors.HexColor(PRIMARY_COLOR)),
+        ]),
+        # Candidate info (label | value)
+        info_table=TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor(BG_MEDIUM)),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor(PRIMARY_COLOR)),
+            ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor(TEXT_DARK)),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 7),
+            ('TOPPADDING', (0, 0), (-1, -1), 7),
+            ('LEFTPADDING', (0, 0), (-1, -1), 8),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor(BORDER_COLOR)),
+            ('LINEBELOW', (0, -1), (-1, -1), 0.5, colors.HexColor(BORDER_COLOR)),
+        ]),
+        # Two tables side by side
+        columns_table=TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]),
+        scores_table=TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(PRIMARY_COLOR)),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor(BG_MEDIUM)),
+            ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor(PRIMARY_COLOR)),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('LEFTPADDING', (0, 0), (-1, -1), 4),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor(BORDER_COLOR)),
+            ('LINEBELOW', (0, 0), (-1, 0), 1, colors.HexColor(PRIMARY_COLOR)),
+        ]),
+        chart_table=TableStyle([
+            ('ALIGN',(0,0),(-1,-1),'CENTER'),
+            ('VALIGN',(0,0),(-1,0),'MIDDLE'),  # Charts centered vertically
+            ('VALIGN',(0,2),(-1,2),'TOP'),     # Labels aligned to top
+            ('LEFTPADDING',(0,0),(-1,-1),3),
+            ('RIGHTPADDING',(0,0),(-1,-1),3),
+            ('TOPPADDING',(0,0),(-1,0),6),     # Increased top padding for charts
+            ('BOTTOMPADDING',(0,0),(-1,0),6),  # Increased bottom padding for charts
+            ('TOPPADDING',(0,2),(-1,2),2),     # Increased top padding for labels
+        ]),
+        options_table=TableStyle([
+            ('FONTSIZE', (0, 0), (-1, -1), 7),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('TOPPADDING', (0, 0), (-1, -1), 3),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+            ('LEFTPADDING', (0, 0), (-1, -1), 4),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+        ]),
+        proctoring_table=TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor(BG_MEDIUM)),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor(PRIMARY_COLOR)),
+            ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor(TEXT_DARK)),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 7),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('LEFTPADDING', (0, 0), (-1, -1), 8),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor(BORDER_COLOR)),
+        ]),
+    )
+
+
+TEMPLATES = _build_templates()
+
+
+def _new_donut(color_hex):
+    """Donut chart skeleton: a pie with no labels and a white hole. The data is set per report."""
+    # Create drawing with proper dimensions for 3-column layout
+    drawing = Drawing(150, 80)
+
+    # Donut-style pie chart - no labels on the chart itself
+    pie = Pie()
+    pie.x = 15
+    pie.y = 5
+    pie.width = 80
+    pie.height = 80
+    pie.data = [1, 0]
+    # Remove all labels from pie chart - they'll be shown below
+    pie.labels = ["", ""]
+    # Turn off sideLabels completely
+    try:
+        pie.sideLabels = False
+        pie.labelRadius = 0
+    except Exception:
+        pass
+
+    # Professional styling
+    pie.slices[0].fillColor = colors.HexColor(color_hex)
+    pie.slices[1].fillColor = colors.HexColor('#e2e8f0')
+    pie.slices[0].strokeColor = colors.HexColor('#ffffff')
+    pie.slices[1].strokeColor = colors.HexColor('#ffffff')
+    pie.slices[0].strokeWidth = 2
+    pie.slices[1].strokeWidth = 2
+
+    drawing.add(pie)
+
+    # Create donut effect with white center circle
+    cx = pie.x + pie.width / 2
+    cy = pie.y + pie.height / 2
+    # Donut hole - 40% of radius
+    r = min(pie.width, pie.height) * 0.40
+    hole = Circle(cx, cy, r, fillColor=colors.white, strokeColor=colors.white)
+    drawing.add(hole)
+
+    return drawing, pie
+
+
+# Donut drawings are reused from report to report with only the data swapped.
+# They are kept per thread, since a report holds on to its drawings until doc.build().
+_donuts = threading.local()
+
+
+def _create_pie_chart(title, obtained, max_marks, color_hex='#4F46E5', dummy_arg=None):
+    """Clean donut chart without overlapping labels; one reused drawing per color."""
+    charts = getattr(_donuts, 'charts', None)
+    if charts is None:
+        charts = _donuts.charts = {}
+    if color_hex not in charts:
+        charts[color_hex] = _new_donut(color_hex)
+    drawing, pie = charts[color_hex]
+    pie.data = [obtained, max(0, max_marks - obtained)]
+    return drawing
+
+def generate_pdf_report(data, out_path):
+    """Generate a comprehensive PDF report with full dashboard details"""
+    # Allow natural page breaks - content can flow to multiple pages
+    doc = SimpleDocTemplate(
+        out_path,
+        pagesize=A4,
+        topMargin=12*mm,
+        bottomMargin=12*mm,
+        leftMargin=12*mm,
+        rightMargin=12*mm
+    )
+    story = []
+
+    t = TEMPLATES
+    title_style = t.title_style
+    heading_style = t.heading_style
+    normal_style = t.normal_style
+    label_style = t.label_style
+
     cand = data.get('candidate', {})
     mcq = data.get('mcq', {})
     coding = data.get('coding', {})
@@ -159,15 +296,7 @@ def generate_pdf_report(data, out_path):
     # ========== HEADER ==========
     # Add a professional header with border
     header_table = Table([[Paragraph("EXAMINATION REPORT", title_style)]], colWidths=[186*mm])
-    header_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor(PRIMARY_COLOR)),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 12),
-        ('BOX', (0, 0), (-1, -1), 0, colors.HexColor(PRIMARY_COLOR)),
-    ]))
+    header_table.setStyle(t.header_table)
     story.append(header_table)
     story.append(Spacer(1, 8))
     
@@ -187,28 +316,12 @@ def generate_pdf_report(data, out_path):
     t_left = Table(cand_info_left, colWidths=[35*mm, 55*mm])
     t_right = Table(cand_info_right, colWidths=[35*mm, 55*mm])
     
-    table_style = TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor(BG_MEDIUM)),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor(PRIMARY_COLOR)),
-        ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor(TEXT_DARK)),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 7),
-        ('TOPPADDING', (0, 0), (-1, -1), 7),
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor(BORDER_COLOR)),
-        ('LINEBELOW', (0, -1), (-1, -1), 0.5, colors.HexColor(BORDER_COLOR)),
-    ])
-    t_left.setStyle(table_style)
-    t_right.setStyle(table_style)
+    t_left.setStyle(t.info_table)
+    t_right.setStyle(t.info_table)
     
     # Combine in two columns
     cand_table = Table([[t_left, t_right]], colWidths=[95*mm, 95*mm])
-    cand_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
+    cand_table.setStyle(t.columns_table)
     story.append(cand_table)
     story.append(Spacer(1, 6))
     
@@ -250,22 +363,7 @@ def generate_pdf_report(data, out_path):
         scores.append(["TOTAL", str(total_marks), str(total_obtained), total_pct])
     # Scores table with proper spacing
     st = Table(scores, colWidths=[45*mm, 45*mm, 45*mm, 45*mm])
-    st.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(PRIMARY_COLOR)),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor(BG_MEDIUM)),
-        ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor(PRIMARY_COLOR)),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('LEFTPADDING', (0, 0), (-1, -1), 4),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor(BORDER_COLOR)),
-        ('LINEBELOW', (0, 0), (-1, 0), 1, colors.HexColor(PRIMARY_COLOR)),
-    ]))
+    st.setStyle(t.scores_table)
     story.append(st)
     story.append(Spacer(1, 20))  # Increased spacing between table and charts
 
@@ -329,16 +427,7 @@ def generate_pdf_report(data, out_path):
         chart_rows = [charts_to_show, [Spacer(1, 8) for _ in charts_to_show], labels_to_show]
         chart_table = Table(chart_rows, colWidths=chart_widths, rowHeights=[32*mm, 5*mm, 18*mm])
         
-        chart_table.setStyle(TableStyle([
-            ('ALIGN',(0,0),(-1,-1),'CENTER'),
-            ('VALIGN',(0,0),(-1,0),'MIDDLE'),  # Charts centered vertically
-            ('VALIGN',(0,2),(-1,2),'TOP'),     # Labels aligned to top
-            ('LEFTPADDING',(0,0),(-1,-1),3),
-            ('RIGHTPADDING',(0,0),(-1,-1),3),
-            ('TOPPADDING',(0,0),(-1,0),6),     # Increased top padding for charts
-            ('BOTTOMPADDING',(0,0),(-1,0),6),  # Increased bottom padding for charts
-            ('TOPPADDING',(0,2),(-1,2),2),     # Increased top padding for labels
-        ]))
+        chart_table.setStyle(t.chart_table)
         
         story.append(chart_table)
         story.append(Spacer(1, 12))  # Increased spacing after charts
@@ -407,14 +496,7 @@ def generate_pdf_report(data, out_path):
                     marker = " ✗"
                 options_data.append([f"{chr(64+idx)}.", f"{opt}{marker}"])
             opt_table = Table(options_data, colWidths=[12*mm, 158*mm])
-            opt_table.setStyle(TableStyle([
-                ('FONTSIZE', (0, 0), (-1, -1), 7),
-                ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-                ('TOPPADDING', (0, 0), (-1, -1), 3),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-                ('LEFTPADDING', (0, 0), (-1, -1), 4),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-            ]))
+            opt_table.setStyle(t.options_table)
             story.append(opt_table)
             story.append(Spacer(1, 5))
     
@@ -435,37 +517,17 @@ def generate_pdf_report(data, out_path):
         
         pt_left = Table(proc_data_left, colWidths=[45*mm, 45*mm])
         pt_right = Table(proc_data_right, colWidths=[45*mm, 45*mm])
-        proc_style = TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor(BG_MEDIUM)),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor(PRIMARY_COLOR)),
-            ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor(TEXT_DARK)),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 7),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor(BORDER_COLOR)),
-        ])
-        pt_left.setStyle(proc_style)
-        pt_right.setStyle(proc_style)
+        pt_left.setStyle(t.proctoring_table)
+        pt_right.setStyle(t.proctoring_table)
         
         proc_table = Table([[pt_left, pt_right]], colWidths=[95*mm, 95*mm])
-        proc_table.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP')]))
+        proc_table.setStyle(t.columns_table)
         story.append(proc_table)
         story.append(Spacer(1, 4))
     
     # ========== FOOTER ==========
     story.append(Spacer(1, 8))
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=normal_style,
-        fontSize=7,
-        textColor=colors.HexColor(TEXT_LIGHT),
-        alignment=TA_CENTER
-    )
     footer_text = f"© 2025 Online Test Platform | Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-    story.append(Paragraph(footer_text, footer_style))
+    story.append(Paragraph(footer_text, t.footer_style))
     
     doc.build(story)
@@ -0,0 +1,171 @@
+"""
+Report jobs.
+
+`POST /api/report` queues a job and returns at once; a few worker tasks take
+jobs off the queue, render the PDF through the render pool and save the
+report. Clients poll `GET /api/report/jobs/{id}` until it redirects to the file.
+
+Jobs are keyed by a hash of their payload. Submitting a payload that is already
+queued, being rendered, or already rendered (with the PDF still on disk) returns
+the existing job, so the same report is never rendered twice at once.
+
+Jobs live in memory. Queued jobs are lost on restart, while finished PDFs are
+kept in the report store (see report_store.py). Settings (environment):
+    REPORT_JOB_WORKERS      jobs rendered at the same time (default: render pool workers)
+    REPORT_JOB_QUEUE_LIMIT  queued jobs before new ones are refused (default: 1000)
+    REPORT_JOBS_KEPT        finished jobs remembered for polling and dedup (default: 5000)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from render_pool import RenderPool
+from report_store import ReportStore, candidate_key
+
+logger = logging.getLogger(__name__)
+
+REPORT_JOB_QUEUE_LIMIT = int(os.getenv("REPORT_JOB_QUEUE_LIMIT", "1000"))
+REPORT_JOBS_KEPT = int(os.getenv("REPORT_JOBS_KEPT", "5000"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueueFull(Exception):
+    """Too many report jobs are waiting."""
+
+
+def payload_hash(data: dict) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")).hexdigest()
+
+
+class ReportJob:
+    def __init__(self, data: dict, key: str):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.data = data
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.path: Optional[str] = None
+        self.size: Optional[int] = None
+        self.report_id = None
+        self.error: Optional[str] = None
+
+    @property
+    def filename(self) -> str:
+        return f"{(self.data.get('candidate') or {}).get('name') or 'report'}.pdf"
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "payload_hash": self.key,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "size": self.size,
+            "report_id": self.report_id,
+            "error": self.error,
+        }
+
+
+class ReportJobs:
+    def __init__(self, render_pool: RenderPool, store: ReportStore, save: Callable, workers: Optional[int] = None,
+                 queue_limit: int = REPORT_JOB_QUEUE_LIMIT, kept: int = REPORT_JOBS_KEPT):
+        """`save(data, path, size)` stores a rendered report and returns its report id (or None)."""
+        self.render_pool = render_pool
+        self.store = store
+        self.save = save
+        self.workers = workers or int(os.getenv("REPORT_JOB_WORKERS", str(render_pool.workers)))
+        self.queue_limit = queue_limit
+        self.kept = kept
+        self._jobs: "OrderedDict[str, ReportJob]" = OrderedDict()
+        self._by_key: Dict[str, ReportJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self.deduplicated = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        return self._jobs.get(job_id)
+
+    def submit(self, data: dict) -> ReportJob:
+        """Queue a render of `data`, or return the job that already covers it."""
+        key = payload_hash(data)
+        existing = self._by_key.get(key)
+        if existing and (existing.status in (QUEUED, RUNNING) or
+                         (existing.status == DONE and self.store.get(existing.id) is not None)):
+            self.deduplicated += 1
+            return existing
+        if self._queue.qsize() >= self.queue_limit:
+            raise JobQueueFull(f"{self._queue.qsize()} report jobs are already queued")
+        job = ReportJob(data, key)
+        self._jobs[job.id] = job
+        self._by_key[key] = job
+        self._queue.put_nowait(job)
+        self._forget_old()
+        return job
+
+    def _forget_old(self):
+        while len(self._jobs) > self.kept:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.status in (QUEUED, RUNNING):
+                break
+            del self._jobs[oldest.id]
+            if self._by_key.get(oldest.key) is oldest:
+                del self._by_key[oldest.key]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: ReportJob):
+        job.status = RUNNING
+        try:
+            path = self.store.path_for(job.id)
+            job.size = await self.render_pool.render(job.data, path)
+            job.path = path
+            await run_in_threadpool(self.store.add, job.id, path, candidate_key(job.data))
+            job.report_id = await run_in_threadpool(self.save, job.data, path, job.size)
+            job.status = DONE
+            logger.info(f"Report job {job.id} done: {path} ({job.size} bytes)")
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e) or type(e).__name__
+            logger.error(f"Report job {job.id} failed: {job.error}")
+        finally:
+            job.finished_at = time.time()
+            # Only the PDF is needed from here on
+            job.data = {"candidate": {"name": (job.data.get("candidate") or {}).get("name")}}
+
+    def stats(self) -> dict:
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "jobs": counts,
+            "deduplicated": self.deduplicated,
+        }
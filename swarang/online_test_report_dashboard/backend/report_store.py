@@ -0,0 +1,264 @@
+"""
+Report storage.
+
+Rendered PDFs live under `reports/`, spread over 256 subdirectories by the
+first two hex characters of their key (`reports/ab/report_ab12....pdf`), so no
+single directory keeps growing. A SQLite index next to them
+records the path, size, candidate, creation time and SHA-256 of every file;
+"latest" and "latest for a candidate" are single index lookups instead of a
+glob plus a stat per file.
+
+Compaction runs in the background: PDFs older than REPORT_COMPRESS_AFTER_DAYS
+are gzipped in place (they are served decompressed), and PDFs older than
+REPORT_RETENTION_DAYS are deleted along with their index rows. PDFs left in
+the flat `reports/` folder by older versions are indexed at start-up.
+
+Settings (environment):
+    REPORT_INDEX_PATH           SQLite index file (default: reports/index.sqlite3)
+    REPORT_COMPRESS_AFTER_DAYS  gzip PDFs older than this, 0 to disable (default: 7)
+    REPORT_RETENTION_DAYS       delete PDFs older than this, 0 to keep forever (default: 180)
+    REPORT_COMPACT_INTERVAL_S   seconds between compaction runs (default: 3600)
+"""
+
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+REPORT_COMPRESS_AFTER_DAYS = float(os.getenv("REPORT_COMPRESS_AFTER_DAYS", "7"))
+REPORT_RETENTION_DAYS = float(os.getenv("REPORT_RETENTION_DAYS", "180"))
+REPORT_COMPACT_INTERVAL_S = float(os.getenv("REPORT_COMPACT_INTERVAL_S", "3600"))
+
+DAY_S = 86400
+# Rows handled per compaction query, so a large backlog doesn't hold the lock for long
+COMPACT_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    candidate TEXT,
+    created_at REAL NOT NULL,
+    content_hash TEXT NOT NULL,
+    compressed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_reports_created ON reports(created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_candidate_created ON reports(candidate, created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_compressed_created ON reports(compressed, created_at);
+"""
+
+COLUMNS = "key, path, size, candidate, created_at, content_hash, compressed"
+
+
+def candidate_key(data: dict) -> Optional[str]:
+    """What reports are looked up by: the candidate's email, else their id."""
+    cand = data.get("candidate") or {}
+    key = cand.get("email") or cand.get("id")
+    return str(key).strip().lower() if key else None
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ReportStore:
+    def __init__(self, root: str, index_path: Optional[str] = None,
+                 compress_after_days: float = REPORT_COMPRESS_AFTER_DAYS,
+                 retention_days: float = REPORT_RETENTION_DAYS,
+                 compact_interval_s: float = REPORT_COMPACT_INTERVAL_S):
+        self.root = root
+        self.index_path = index_path or os.getenv("REPORT_INDEX_PATH") or os.path.join(root, "index.sqlite3")
+        self.compress_after_days = compress_after_days
+        self.retention_days = retention_days
+        self.compact_interval_s = compact_interval_s
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.last_compaction: Optional[dict] = None
+
+    def open(self):
+        os.makedirs(self.root, exist_ok=True)
+        conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        self._conn = conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def path_for(self, key: str) -> str:
+        """Where the PDF for `key` (a hex id) should be written; creates its shard directory."""
+        shard = os.path.join(self.root, key[:2])
+        os.makedirs(shard, exist_ok=True)
+        return os.path.join(shard, f"report_{key}.pdf")
+
+    def abspath(self, entry: dict) -> str:
+        return os.path.join(self.root, entry["path"])
+
+    def add(self, key: str, path: str, candidate: Optional[str], created_at: Optional[float] = None) -> dict:
+        """Index a PDF that has been written to `path`."""
+        entry = {
+            "key": key,
+            "path": os.path.relpath(path, self.root),
+            "size": os.path.getsize(path),
+            "candidate": candidate,
+            "created_at": created_at if created_at is not None else time.time(),
+            "content_hash": _file_hash(path),
+            "compressed": 0,
+        }
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO reports ({COLUMNS}) VALUES (:key, :path, :size, :candidate, :created_at, :content_hash, :compressed)",
+                entry,
+            )
+        return entry
+
+    def _one(self, query: str, params: tuple) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        return dict(row) if row else None
+
+    def get(self, key: str) -> Optional[dict]:
+        return self._one(f"SELECT {COLUMNS} FROM reports WHERE key = ?", (key,))
+
+    def latest(self, candidate: Optional[str] = None) -> Optional[dict]:
+        """Newest report overall, or for one candidate (email or id)."""
+        if candidate is None:
+            return self._one(f"SELECT {COLUMNS} FROM reports ORDER BY created_at DESC LIMIT 1", ())
+        return self._one(
+            f"SELECT {COLUMNS} FROM reports WHERE candidate = ? ORDER BY created_at DESC LIMIT 1",
+            (candidate.strip().lower(),),
+        )
+
+    def read_chunks(self, entry: dict, chunk_size: int = 64 * 1024):
+        """The PDF's bytes, decompressed if compaction gzipped it."""
+        opener = gzip.open if entry["compressed"] else open
+        with opener(self.abspath(entry), "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                yield chunk
+
+    def import_unindexed(self) -> int:
+        """Index PDFs left directly in the reports folder by earlier versions."""
+        imported = 0
+        with os.scandir(self.root) as entries:
+            for item in entries:
+                if not (item.is_file() and item.name.endswith(".pdf")):
+                    continue
+                key = item.name[:-4]
+                if self.get(key) is None:
+                    self.add(key, item.path, None, created_at=item.stat().st_mtime)
+                    imported += 1
+        if imported:
+            logger.info(f"Indexed {imported} existing reports in {self.root}")
+        return imported
+
+    def _batch(self, query: str, params: tuple) -> list:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params + (COMPACT_BATCH,)).fetchall()]
+
+    def compact(self, now: Optional[float] = None) -> dict:
+        """Delete reports past retention, then gzip the ones past the compression age."""
+        now = now if now is not None else time.time()
+        pruned = compressed = freed = 0
+
+        if self.retention_days > 0:
+            cutoff = now - self.retention_days * DAY_S
+            while True:
+                rows = self._batch(f"SELECT {COLUMNS} FROM reports WHERE created_at < ? ORDER BY created_at LIMIT ?", (cutoff,))
+                if not rows:
+                    break
+                for entry in rows:
+                    try:
+                        os.remove(self.abspath(entry))
+                    except FileNotFoundError:
+                        pass
+                    freed += entry["size"]
+                with self._lock, self._conn:
+                    self._conn.executemany("DELETE FROM reports WHERE key = ?", [(entry["key"],) for entry in rows])
+                pruned += len(rows)
+
+        if self.compress_after_days > 0:
+            cutoff = now - self.compress_after_days * DAY_S
+            while True:
+                rows = self._batch(
+                    f"SELECT {COLUMNS} FROM reports WHERE compressed = 0 AND created_at < ? ORDER BY created_at LIMIT ?",
+                    (cutoff,),
+                )
+                if not rows:
+                    break
+                for entry in rows:
+                    freed += self._compress(entry)
+                    compressed += 1
+
+        self.last_compaction = {"at": now, "pruned": pruned, "compressed": compressed, "bytes_freed": freed}
+        if pruned or compressed:
+            logger.info(f"Report compaction: {pruned} pruned, {compressed} compressed, {freed} bytes freed")
+        return self.last_compaction
+
+    def _compress(self, entry: dict) -> int:
+        src = self.abspath(entry)
+        dst = src + ".gz"
+        if not os.path.exists(src):
+            # Gone from disk: drop the row rather than retrying it forever
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM reports WHERE key = ?", (entry["key"],))
+            return 0
+        with open(src, "rb") as f_in, gzip.open(dst + ".tmp", "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.replace(dst + ".tmp", dst)
+        size = os.path.getsize(dst)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE reports SET path = ?, size = ?, compressed = 1 WHERE key = ?",
+                (os.path.relpath(dst, self.root), size, entry["key"]),
+            )
+        os.remove(src)
+        return entry["size"] - size
+
+    async def start(self):
+        await run_in_threadpool(self.open)
+        await run_in_threadpool(self.import_unindexed)
+        self._task = asyncio.create_task(self._compact_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.close()
+
+    async def _compact_periodically(self):
+        while True:
+            try:
+                await run_in_threadpool(self.compact)
+            except Exception as e:
+                logger.error(f"Report compaction failed: {e}")
+            await asyncio.sleep(self.compact_interval_s)
+
+    def stats(self) -> dict:
+        return {
+            "index": self.index_path,
+            "compress_after_days": self.compress_after_days,
+            "retention_days": self.retention_days,
+            "last_compaction": self.last_compaction,
+        }
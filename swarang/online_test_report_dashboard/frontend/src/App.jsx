@@ -3,6 +3,7 @@ import React, { useEffect, useState } from "react";
 import { Doughnut } from "react-chartjs-2";
 import { Chart as ChartJS, ArcElement, Tooltip, Legend } from "chart.js";
 import axios from "axios";
+import { requestReportPdf } from "./reportApi";
 import "./App.css";
 
 ChartJS.register(ArcElement, Tooltip, Legend);
@@ -167,13 +168,8 @@ export default function App(){
       };
 
       // Generate new PDF with current data
-      const resp = await axios.post(
-        "http://localhost:8000/api/report",
-        payload,
-        { responseType: "blob" }
-      );
-      
-      const blob = new Blob([resp.data], {type: "application/pdf"});
+      const pdf = await requestReportPdf(payload);
+      const blob = new Blob([pdf], { type: "application/pdf" });
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement("a");
       a.href = url;
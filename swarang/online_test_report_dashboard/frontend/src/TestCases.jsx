@@ -1,7 +1,7 @@
 import React, { useState } from "react";
 import { Doughnut } from "react-chartjs-2";
 import { Chart as ChartJS, ArcElement, Tooltip, Legend } from "chart.js";
-import axios from "axios";
+import { requestReportPdf } from "./reportApi";
 import "./App.css";
 
 ChartJS.register(ArcElement, Tooltip, Legend);
@@ -394,11 +394,8 @@ const TestCases = () => {
         include_proctoring: includeProctoring
       };
 
-      const resp = await axios.post("http://localhost:8000/api/report", payload, {
-        responseType: "blob"
-      });
-
-      const blob = new Blob([resp.data], { type: "application/pdf" });
+      const pdf = await requestReportPdf(payload);
+      const blob = new Blob([pdf], { type: "application/pdf" });
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement("a");
       a.href = url;
@@ -0,0 +1,26 @@
+import axios from "axios";
+
+const API_BASE = "http://localhost:8000";
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Queue a PDF report and wait for it. POST /api/report answers 202 with a
+// status_url; polling it returns the job as JSON until the PDF is ready, then
+// redirects to the file. Resolves with the PDF blob.
+export async function requestReportPdf(payload, { intervalMs = 500, timeoutMs = 120000 } = {}) {
+  const { data: job } = await axios.post(`${API_BASE}/api/report`, payload);
+  const deadline = Date.now() + timeoutMs;
+
+  while (Date.now() < deadline) {
+    const resp = await axios.get(`${API_BASE}${job.status_url}`, { responseType: "blob" });
+    if ((resp.headers["content-type"] || "").includes("application/pdf")) {
+      return resp.data;
+    }
+    const status = JSON.parse(await resp.data.text());
+    if (status.status === "failed") {
+      throw new Error(status.error || "Report generation failed");
+    }
+    await sleep(intervalMs);
+  }
+  throw new Error("Timed out waiting for the report");
+}